@@ -0,0 +1,123 @@
+"""
+Benchmark: simultaneous quiz saves against the configured database.
+
+Many threads store generated quizzes at the same time, like workers
+finishing createQuiz jobs together, and each also writes to the JWT
+token blacklist. Reports completed saves, "database is locked" failures
+and throughput.
+
+For SQLite, it compares SQLite's default settings with the tuned ones
+(WAL, synchronous=NORMAL, busy timeout, BEGIN IMMEDIATE). Each
+configuration runs in a child process on its own temporary database
+file. With DB_ENGINE=postgres, it runs once against a throwaway test
+database.
+
+Usage:
+    python -m benchmarks.bench_concurrent_saves [--threads 16] [--saves 20]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_quiz_persistence import build_payload
+
+
+def run_saves(threads: int, saves: int) -> None:
+    """
+    Runs the concurrent saves in this process and prints one result line.
+    """
+    from django.contrib.auth.models import User
+    from django.db import OperationalError, connection, connections
+    from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from quizzes.persistence import create_quiz_from_payload
+
+    owner = User.objects.create_user(username="bench")
+    payload = build_payload()
+    results = {"ok": 0, "locked": 0, "other": 0}
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(saves):
+            try:
+                create_quiz_from_payload(payload, owner, "https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+                # What logout does: a refresh token goes on the blacklist
+                token = OutstandingToken.objects.get(jti=RefreshToken.for_user(owner)["jti"])
+                BlacklistedToken.objects.create(token=token)
+                outcome = "ok"
+            except OperationalError as e:
+                outcome = "locked" if "locked" in str(e) else "other"
+            with lock:
+                results[outcome] += 1
+
+        connections.close_all()
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    label = connection.vendor
+    if connection.vendor == "sqlite":
+        label = "tuned" if os.environ.get("SQLITE_TUNED", "True") == "True" else "default"
+
+    print(f"{label:<10} {results['ok']:>6} {results['locked']:>8} {results['other']:>6} "
+          f"{elapsed:>8.2f} {results['ok'] / elapsed:>8.1f}", flush=True)
+
+
+def child(threads: int, saves: int) -> None:
+    """
+    Entry point of a child process: migrates its SQLite file and runs the saves.
+    """
+    import django
+    from django.core.management import call_command
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "quizly_backend.settings")
+    django.setup()
+    call_command("migrate", verbosity=0)
+    run_saves(threads, saves)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16, help="Concurrent writers.")
+    parser.add_argument("--saves", type=int, default=20, help="Quizzes saved per writer.")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.threads, args.saves)
+        return
+
+    print(f"{'database':<10} {'saved':>6} {'locked':>8} {'other':>6} {'seconds':>8} {'saves/s':>8}", flush=True)
+
+    if os.environ.get("DB_ENGINE", "sqlite") != "sqlite":
+        from benchmarks.django_setup import setup_django
+
+        teardown = setup_django()
+        try:
+            run_saves(args.threads, args.saves)
+        finally:
+            teardown()
+        return
+
+    for tuned in ("False", "True"):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {**os.environ, "SQLITE_TUNED": tuned, "SQLITE_PATH": os.path.join(tmp, "bench.sqlite3")}
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_concurrent_saves", "--child",
+                 "--threads", str(args.threads), "--saves", str(args.saves)],
+                env=env,
+                check=True
+            )
+
+
+if __name__ == "__main__":
+    main()
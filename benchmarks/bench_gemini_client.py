@@ -0,0 +1,66 @@
+"""
+Benchmark: a new Gemini client per call vs the shared pooled client.
+
+Sends requests to the local fake Gemini server (no network, no API quota)
+from several threads and reports wall time and the number of TCP
+connections the server had to accept.
+
+Usage:
+    python -m benchmarks.bench_gemini_client [--requests 200] [--threads 8] [--latency 0.05]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+
+
+MODEL = "gemini-2.5-flash"
+PROMPT = "Create a quiz about the transcript."
+
+
+def run(label, call, requests, threads, server):
+    server.connections = 0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda _: call(), range(requests)))
+    elapsed = time.perf_counter() - start
+
+    print(f"{label:<8} {elapsed:>8.2f} {requests / elapsed:>10.1f} {server.connections:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per strategy.")
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent callers.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake server answer delay in seconds.")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "quizly_backend.settings")
+    django.setup()
+
+    from google import genai
+    from google.genai import types
+    from quizzes.fake_gemini import FakeGeminiServer
+    from quizzes.llm import GeminiClient
+
+    with FakeGeminiServer(latency=args.latency) as server:
+        def fresh_client():
+            # What generate_quiz_json used to do: a new client for every call
+            client = genai.Client(api_key="bench", http_options=types.HttpOptions(base_url=server.base_url))
+            client.models.generate_content(model=MODEL, contents=PROMPT)
+            client.close()
+
+        pooled = GeminiClient("bench", base_url=server.base_url, max_concurrency=args.threads)
+
+        print(f"{'client':<8} {'seconds':>8} {'req/s':>10} {'connections':>12}")
+        run("fresh", fresh_client, args.requests, args.threads, server)
+        run("pooled", lambda: pooled.generate_content(model=MODEL, contents=PROMPT), args.requests, args.threads, server)
+
+        pooled.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: reading quizzes with question rows vs JSON question storage.
+
+Seeds --quizzes quizzes of 10 questions with 4 options each as rows and
+times what the quiz endpoints do: load a quiz (or a page of 20) and
+serialize it with QuizSerializer. The quizzes are then converted with
+convert_to_json and the same reads are repeated with
+QUIZ_QUESTION_STORAGE=json. Reports SQL queries and ms per read.
+
+Usage:
+    python -m benchmarks.bench_question_storage [--quizzes 2000] [--repeat 200]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.bench_quiz_persistence import build_payload
+from benchmarks.django_setup import setup_django
+
+
+def measure(label: str, read, repeat: int) -> None:
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    # The seeding filled the query log
+    reset_queries()
+    with CaptureQueriesContext(connection) as ctx:
+        read()
+    queries = len(ctx.captured_queries)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        read()
+    elapsed = time.perf_counter() - start
+
+    print(f"{label:<16} {queries:>8} {elapsed / repeat * 1000:>12.3f}")
+
+
+def run_reads(storage: str, quiz_ids: list, repeat: int) -> None:
+    from django.test import override_settings
+    from quizzes.api.serializers import QuizSerializer
+    from quizzes.api.views import quizzes_with_questions
+
+    rng = random.Random(1)
+
+    def detail():
+        return QuizSerializer(quizzes_with_questions().get(id=rng.choice(quiz_ids))).data
+
+    def page():
+        quizzes = quizzes_with_questions().order_by("-created_at", "-id")[:20]
+        return QuizSerializer(quizzes, many=True).data
+
+    with override_settings(QUIZ_QUESTION_STORAGE=storage):
+        measure(f"{storage} detail", detail, repeat)
+        measure(f"{storage} page of 20", page, repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quizzes", type=int, default=2000, help="Seeded quizzes.")
+    parser.add_argument("--repeat", type=int, default=200, help="Reads per measurement.")
+    args = parser.parse_args()
+
+    teardown = setup_django()
+    try:
+        from django.contrib.auth.models import User
+        from quizzes.models import Quiz
+        from quizzes.persistence import convert_to_json, create_quiz_from_payload
+
+        owner = User.objects.create_user(username="bench", password="bench")
+        data = build_payload()
+        quiz_ids = [
+            create_quiz_from_payload(data, owner, "https://www.youtube.com/watch?v=dQw4w9WgXcQ").id
+            for _ in range(args.quizzes)
+        ]
+
+        print(f"{'read':<16} {'queries':>8} {'ms per read':>12}")
+        run_reads("rows", quiz_ids, args.repeat)
+
+        start = time.perf_counter()
+        converted = convert_to_json(Quiz.objects.all())
+        print(f"\nConverted {converted} quizzes to JSON in {time.perf_counter() - start:.1f}s\n")
+
+        run_reads("json", quiz_ids, args.repeat)
+    finally:
+        teardown()
+
+
+if __name__ == "__main__":
+    main()
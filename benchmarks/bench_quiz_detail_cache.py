@@ -0,0 +1,71 @@
+"""
+Benchmark: GET /api/quizzes/{id}/ without cache, from the response cache
+and revalidated with If-None-Match (304).
+
+Runs the full Django request cycle through the test client against a
+throwaway database holding one 10-question quiz, and reports SQL queries
+and ms per request for each case.
+
+Usage:
+    python -m benchmarks.bench_quiz_detail_cache [--requests 500]
+"""
+import argparse
+import time
+
+from benchmarks.bench_quiz_persistence import build_payload
+from benchmarks.django_setup import setup_django
+
+
+def measure(label: str, get, requests: int, before=None) -> None:
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    if before:
+        before()
+    reset_queries()
+    with CaptureQueriesContext(connection) as ctx:
+        status_code = get().status_code
+    queries = len(ctx.captured_queries)
+
+    elapsed = 0.0
+    for _ in range(requests):
+        if before:
+            before()
+        start = time.perf_counter()
+        get()
+        elapsed += time.perf_counter() - start
+
+    print(f"{label:<12} {status_code:>6} {queries:>8} {elapsed / requests * 1000:>8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per case.")
+    args = parser.parse_args()
+
+    teardown = setup_django()
+    try:
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        from quizzes.api.response_cache import quiz_cache
+        from quizzes.persistence import create_quiz_from_payload
+
+        owner = User.objects.create_user(username="bench", password="bench")
+        quiz = create_quiz_from_payload(build_payload(), owner, "https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+        url = f"/api/quizzes/{quiz.id}/"
+
+        client = APIClient()
+        client.force_authenticate(owner)
+
+        etag = client.get(url)["ETag"]
+
+        print(f"{'request':<12} {'status':>6} {'queries':>8} {'ms':>8}")
+        measure("uncached", lambda: client.get(url), args.requests, before=quiz_cache().clear)
+        measure("cached", lambda: client.get(url), args.requests)
+        measure("304", lambda: client.get(url, HTTP_IF_NONE_MATCH=etag), args.requests)
+    finally:
+        teardown()
+
+
+if __name__ == "__main__":
+    main()
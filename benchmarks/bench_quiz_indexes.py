@@ -0,0 +1,162 @@
+"""
+Benchmark: quiz schema with only foreign key indexes vs the composite indexes.
+
+Seeds a throwaway database with --quizzes quizzes of 10 questions with 4
+options each (the default of 20,000 quizzes gives about 1M rows). It then
+times the hot read queries twice: with the original schema, which has only
+the implicit FK indexes, and with the indexes and constraints of migration
+0009.
+
+Queries:
+    listing  newest 20 quizzes of a user (filter(owner=...) by -created_at)
+    video    quizzes of one video (dedup / cache lookups)
+    detail   questions and options of one quiz, in position order
+
+Usage:
+    python -m benchmarks.bench_quiz_indexes [--quizzes 20000] [--users 200] [--repeat 200]
+"""
+import argparse
+import random
+import time
+from datetime import timedelta
+
+from benchmarks.django_setup import setup_django
+
+
+def seed(quizzes: int, users: int) -> None:
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from quizzes.models import Question, QuestionOption, Quiz
+
+    owners = User.objects.bulk_create([User(username=f"bench-{i}") for i in range(users)])
+    videos = [f"video{i:06d}" for i in range(quizzes // 4)]
+    start = timezone.now() - timedelta(days=365)
+
+    batch = 2000
+    for first in range(0, quizzes, batch):
+        ids = range(first + 1, min(first + batch, quizzes) + 1)
+        # Explicit ids, so questions and options can be linked without reading them back
+        Quiz.objects.bulk_create([
+            Quiz(
+                id=quiz_id,
+                title=f"Quiz {quiz_id}",
+                video_url=f"https://www.youtube.com/watch?v={videos[quiz_id % len(videos)]}",
+                video_id=videos[quiz_id % len(videos)],
+                owner=owners[quiz_id % users]
+            )
+            for quiz_id in ids
+        ])
+        Quiz.objects.filter(id__in=ids).update(created_at=start)
+        Question.objects.bulk_create([
+            Question(id=quiz_id * 10 + q, quiz_id=quiz_id, position=q, question_title=f"Question {q}", answer="A")
+            for quiz_id in ids
+            for q in range(10)
+        ])
+        QuestionOption.objects.bulk_create([
+            QuestionOption(question_id=quiz_id * 10 + q, position=o, option_text="ABCD"[o])
+            for quiz_id in ids
+            for q in range(10)
+            for o in range(4)
+        ], batch_size=10000)
+
+    # Spread creation times so the listing has something to sort
+    for quiz_id in range(1, quizzes + 1, 97):
+        Quiz.objects.filter(id=quiz_id).update(created_at=start + timedelta(minutes=quiz_id))
+
+
+def schema_indexes():
+    from django.db import models
+    from quizzes.models import Question, QuestionOption, Quiz
+
+    new = [
+        (Quiz, Quiz._meta.indexes),
+        (Question, Question._meta.constraints),
+        (QuestionOption, QuestionOption._meta.constraints),
+    ]
+    fk_only = [
+        (Quiz, [models.Index(fields=["owner"], name="bench_quiz_owner")]),
+        (Question, [models.Index(fields=["quiz"], name="bench_question_quiz")]),
+        (QuestionOption, [models.Index(fields=["question"], name="bench_option_question")]),
+    ]
+    return new, fk_only
+
+
+def swap(remove: list, add: list) -> None:
+    from django.db import connection, models
+
+    with connection.schema_editor() as editor:
+        for model, items in remove:
+            for item in items:
+                if isinstance(item, models.Index):
+                    editor.remove_index(model, item)
+                else:
+                    editor.remove_constraint(model, item)
+        for model, items in add:
+            for item in items:
+                if isinstance(item, models.Index):
+                    editor.add_index(model, item)
+                else:
+                    editor.add_constraint(model, item)
+
+    if connection.vendor in ("sqlite", "postgresql"):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+
+def timed(query, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        query()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run_queries(repeat: int, quizzes: int) -> dict:
+    from django.contrib.auth.models import User
+    from quizzes.models import Question, Quiz
+
+    owner_ids = list(User.objects.filter(username__startswith="bench-").values_list("id", flat=True))
+    rng = random.Random(1)
+
+    return {
+        "listing": timed(lambda: list(
+            Quiz.objects.filter(owner_id=rng.choice(owner_ids)).order_by("-created_at", "-id")[:20]
+        ), repeat),
+        "video": timed(lambda: list(
+            Quiz.objects.filter(video_id=f"video{rng.randrange(quizzes // 4):06d}").values_list("id", flat=True)
+        ), repeat),
+        "detail": timed(lambda: list(
+            Question.objects.filter(quiz_id=rng.randrange(1, quizzes + 1)).prefetch_related("question_options")
+        ), repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quizzes", type=int, default=20000, help="Seeded quizzes (51 rows each).")
+    parser.add_argument("--users", type=int, default=200, help="Quiz owners.")
+    parser.add_argument("--repeat", type=int, default=200, help="Runs per query.")
+    args = parser.parse_args()
+
+    teardown = setup_django()
+    try:
+        start = time.perf_counter()
+        seed(args.quizzes, args.users)
+        print(f"Seeded {args.quizzes * 51} rows in {time.perf_counter() - start:.1f}s")
+
+        new, fk_only = schema_indexes()
+
+        swap(remove=new, add=fk_only)
+        before = run_queries(args.repeat, args.quizzes)
+
+        swap(remove=fk_only, add=new)
+        after = run_queries(args.repeat, args.quizzes)
+
+        print(f"{'query':<10} {'FK only ms':>11} {'indexed ms':>11} {'speedup':>8}")
+        for name in before:
+            print(f"{name:<10} {before[name]:>11.3f} {after[name]:>11.3f} {before[name] / after[name]:>7.1f}x")
+    finally:
+        teardown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: per-row vs bulk persistence of a generated quiz.
+
+Counts the SQL round trips and wall time needed to store a 10-question,
+4-option quiz the old way (one create() per row) and with the bulk
+persistence service.
+
+Usage:
+    python -m benchmarks.bench_quiz_persistence [--quizzes 200]
+"""
+import argparse
+import time
+
+from benchmarks.django_setup import setup_django
+
+
+def build_payload(questions: int = 10, options: int = 4) -> dict:
+    return {
+        "title": "Benchmark quiz",
+        "description": "Generated for the persistence benchmark",
+        "questions": [
+            {
+                "question_title": f"Question {i}",
+                "question_options": [f"Option {j}" for j in range(options)],
+                "answer": "Option 0"
+            }
+            for i in range(questions)
+        ]
+    }
+
+
+def save_per_row(data, owner, video_url):
+    """
+    The original save block of create_quiz: one INSERT per row.
+    """
+    from django.db import transaction
+    from quizzes.models import Quiz, Question, QuestionOption
+
+    with transaction.atomic():
+        quiz = Quiz.objects.create(
+            title=data["title"],
+            description=data["description"],
+            video_url=video_url,
+            owner=owner
+        )
+
+        for position, q in enumerate(data["questions"]):
+            question = Question.objects.create(
+                quiz=quiz,
+                position=position,
+                question_title=q["question_title"],
+                answer=q["answer"]
+            )
+
+            for option_position, opt in enumerate(q["question_options"]):
+                QuestionOption.objects.create(
+                    question=question,
+                    position=option_position,
+                    option_text=opt
+                )
+
+    return quiz
+
+
+def measure(label, save, data, owner, runs):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as ctx:
+        save(data, owner, "https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+    queries = len(ctx.captured_queries)
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        save(data, owner, "https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+    elapsed = time.perf_counter() - start
+
+    print(f"{label:<10} {queries:>8} {elapsed / runs * 1000:>14.2f}")
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quizzes", type=int, default=200, help="Quizzes saved per strategy.")
+    args = parser.parse_args()
+
+    teardown = setup_django()
+    try:
+        from django.contrib.auth.models import User
+        from quizzes.persistence import create_quiz_from_payload
+
+        owner = User.objects.create_user(username="bench", password="bench")
+        data = build_payload()
+
+        print(f"{'strategy':<10} {'queries':>8} {'ms per quiz':>14}")
+        per_row = measure("per-row", save_per_row, data, owner, args.quizzes)
+        bulk = measure("bulk", create_quiz_from_payload, data, owner, args.quizzes)
+        print(f"\nRound trips saved per quiz: {per_row - bulk}")
+    finally:
+        teardown()
+
+
+if __name__ == "__main__":
+    main()
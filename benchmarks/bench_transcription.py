@@ -0,0 +1,70 @@
+"""
+Benchmark: single-call vs chunked parallel Whisper transcription.
+
+Transcribes a local audio file once with a single transcribe() call and
+once with the chunked process pool, and prints the wall times.
+The chunked time includes loading the model in every worker process.
+
+Usage:
+    python -m benchmarks.bench_transcription lecture.mp3 [--model base] [--workers 4]
+    python -m benchmarks.bench_transcription lecture.mp3 \
+        --backend quizzes.transcription.FasterWhisperBackend --compute-type int8
+"""
+import argparse
+import os
+import time
+
+from quizzes.transcription import (
+    SAMPLE_RATE,
+    build_backend,
+    load_audio,
+    stitch_transcripts,
+    transcribe_chunked
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio", help="Path to a local audio/video file.")
+    parser.add_argument("--backend", default="quizzes.transcription.WhisperBackend")
+    parser.add_argument("--model", default="base", help="Whisper model name.")
+    parser.add_argument("--compute-type", default="", help="e.g. float32, int8.")
+    parser.add_argument("--language", default=None, help="Force a language, e.g. en.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes.")
+    parser.add_argument("--chunk-seconds", type=float, default=300)
+    parser.add_argument("--overlap-seconds", type=float, default=1.0)
+    parser.add_argument("--strategy", choices=["silence", "fixed"], default="silence")
+    args = parser.parse_args()
+
+    audio = load_audio(args.audio)
+    print(f"Audio duration: {len(audio) / SAMPLE_RATE:.1f} s")
+
+    backend = build_backend(args.backend, args.model, compute_type=args.compute_type)
+    start = time.perf_counter()
+    single = backend.transcribe(audio, language=args.language)
+    single_time = time.perf_counter() - start
+    del backend
+
+    start = time.perf_counter()
+    chunked = transcribe_chunked(
+        audio,
+        args.backend,
+        args.model,
+        compute_type=args.compute_type,
+        language=args.language,
+        strategy=args.strategy,
+        chunk_seconds=args.chunk_seconds,
+        overlap_seconds=args.overlap_seconds,
+        workers=args.workers
+    )
+    chunked_time = time.perf_counter() - start
+
+    single_words = len(stitch_transcripts([single]).split())
+    print(f"{'mode':<10} {'wall s':>8} {'words':>7}")
+    print(f"{'single':<10} {single_time:>8.1f} {single_words:>7}")
+    print(f"{'chunked':<10} {chunked_time:>8.1f} {len(chunked.split()):>7}")
+    print(f"\nSpeed-up: {single_time / chunked_time:.2f}x with {args.workers} workers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Bootstrap helper for the benchmark scripts.
+Configures Django and creates a throwaway test database, so benchmarks
+never touch db.sqlite3.
+"""
+import os
+
+import django
+
+
+def setup_django(keepdb: bool = False):
+    """
+    Sets up Django with the project settings and a fresh test database.
+
+    Returns:
+        callable: Teardown function that destroys the test database.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "quizly_backend.settings")
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, keepdb=keepdb)
+
+    def teardown():
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+
+    return teardown
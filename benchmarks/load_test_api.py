@@ -0,0 +1,129 @@
+"""
+Load test: how many waiting clients a server process can hold, WSGI vs ASGI.
+
+Opens --streams job event streams (/api/jobs/{id}/events/) that stay open,
+like browsers following a long job, and meanwhile sends --requests job
+status polls with --concurrency callers. Reports how many streams were
+accepted and the throughput and latency of the polls.
+
+Start the server under test first, with the same database settings as
+this script (a user and a running job are created in that database and
+removed afterwards), e.g.:
+
+    gunicorn quizly_backend.wsgi -w 2 --threads 8 -b 127.0.0.1:8000
+    API_ASYNC_VIEWS=True uvicorn quizly_backend.asgi:application --workers 2 --port 8000
+
+Usage:
+    python -m benchmarks.load_test_api --url http://127.0.0.1:8000 [--streams 200] [--requests 2000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+
+import django
+
+
+async def hold_stream(client, url: str, opened: list) -> None:
+    """
+    Opens one event stream and keeps reading it until the test cancels it.
+    """
+    try:
+        async with client.stream("GET", url, headers={"Accept": "text/event-stream"}) as response:
+            if response.status_code != 200:
+                return
+            async for _chunk in response.aiter_text():
+                if url not in opened:
+                    opened.append(url)
+    except Exception:
+        pass
+
+
+async def poll(client, url: str, count: int, latencies: list, errors: list) -> None:
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            response = await client.get(url)
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors.append(response.status_code)
+        except Exception as e:
+            errors.append(e.__class__.__name__)
+
+
+async def run(base_url: str, token: str, job_id: int, args) -> None:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.streams + args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+
+    async with httpx.AsyncClient(base_url=base_url, cookies={"access_token": token}, limits=limits, timeout=timeout) as client:
+        opened = []
+        streams = [
+            # Distinct query strings tell the streams apart in `opened`
+            asyncio.create_task(hold_stream(client, f"/api/jobs/{job_id}/events/?stream={i}", opened))
+            for i in range(args.streams)
+        ]
+        # Give the streams time to connect before measuring
+        await asyncio.sleep(args.warmup)
+
+        latencies, errors = [], []
+        per_caller = args.requests // args.concurrency
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            poll(client, f"/api/jobs/{job_id}/", per_caller, latencies, errors)
+            for _ in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+
+        for task in streams:
+            task.cancel()
+        await asyncio.gather(*streams, return_exceptions=True)
+
+    latencies.sort()
+    print(f"streams open       {len(opened)} / {args.streams}")
+    print(f"status requests    {len(latencies)} ok, {len(errors)} failed in {elapsed:.2f}s")
+    if latencies:
+        print(f"throughput         {len(latencies) / elapsed:.1f} req/s")
+        print(f"latency p50 / p95  {statistics.median(latencies) * 1000:.0f} / "
+              f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the server under test.")
+    parser.add_argument("--streams", type=int, default=200, help="Event streams held open.")
+    parser.add_argument("--requests", type=int, default=2000, help="Job status requests.")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent status callers.")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds to let the streams connect.")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Request timeout in seconds.")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "quizly_backend.settings")
+    django.setup()
+
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from rest_framework_simplejwt.tokens import AccessToken
+    from quizzes.models import QuizJob
+
+    user = User.objects.create_user(username=f"loadtest-{uuid.uuid4().hex[:8]}")
+    # A job that looks busy, so the streams wait and the dispatcher leaves it alone
+    job = QuizJob.objects.create(
+        owner=user,
+        video_url="https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        status=QuizJob.Status.GENERATING,
+        started_at=timezone.now()
+    )
+
+    try:
+        asyncio.run(run(args.url, str(AccessToken.for_user(user)), job.id, args))
+    finally:
+        user.delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quizly_backend.settings')
 
 application = get_asgi_application()
+
+# Starts queued jobs and keeps this process's running jobs alive (heartbeat)
+from quizzes.jobs import start_dispatcher  # noqa: E402
+
+start_dispatcher()
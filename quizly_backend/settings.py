@@ -87,12 +87,85 @@ WSGI_APPLICATION = 'quizly_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE selects the backend:
+# "sqlite"   (default) file database, tuned for concurrent writers: WAL journal
+#            (readers never block the writer), synchronous=NORMAL, a busy timeout
+#            instead of failing with "database is locked", and write transactions
+#            that take the lock up front (BEGIN IMMEDIATE). SQLITE_TUNED=False
+#            restores SQLite's defaults.
+# "postgres" PostgreSQL via psycopg. DB_POOL=True uses Django's native
+#            connection pool (needs psycopg[pool]); otherwise connections are
+#            kept for DB_CONN_MAX_AGE seconds and health-checked before reuse.
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgres":
+    DB_POOL = os.getenv("DB_POOL", "False") == "True"
+
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv("DB_NAME", "quizly"),
+            'USER': os.getenv("DB_USER", "quizly"),
+            'PASSWORD': os.getenv("DB_PASSWORD", ""),
+            'HOST': os.getenv("DB_HOST", "localhost"),
+            'PORT': os.getenv("DB_PORT", "5432"),
+            # Pooled connections are returned to the pool after each request
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv("DB_CONN_MAX_AGE", "60")),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+                    'max_size': int(os.getenv("DB_POOL_MAX_SIZE", "20")),
+                    'timeout': float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                },
+            } if DB_POOL else {},
+        }
     }
+else:
+    SQLITE_TUNED = os.getenv("SQLITE_TUNED", "True") == "True"
+
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv("SQLITE_PATH", str(BASE_DIR / 'db.sqlite3')),
+            'OPTIONS': {
+                # Seconds to wait for a lock (SQLite's busy_timeout)
+                'timeout': float(os.getenv("SQLITE_BUSY_TIMEOUT", "20")),
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    "PRAGMA journal_mode=WAL;"
+                    "PRAGMA synchronous=NORMAL;"
+                ),
+            } if SQLITE_TUNED else {},
+        }
+    }
+
+
+# Caches
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+# "default" holds the rate limit buckets. "quiz_responses" holds serialized
+# quizzes for GET /api/quizzes/{id}/, keyed by quiz id and updated_at:
+# QUIZ_RESPONSE_CACHE=locmem (default) keeps them per process, "file" shares
+# them between the worker processes of a host through QUIZ_RESPONSE_CACHE_DIR.
+QUIZ_RESPONSE_CACHE = os.getenv("QUIZ_RESPONSE_CACHE", "locmem")
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "quiz_responses": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("QUIZ_RESPONSE_CACHE_DIR", str(BASE_DIR / "cache" / "quiz_responses")),
+    } if QUIZ_RESPONSE_CACHE == "file" else {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "quiz-responses",
+    },
 }
+CACHES["quiz_responses"].update({
+    "TIMEOUT": int(os.getenv("QUIZ_RESPONSE_CACHE_TIMEOUT", "3600")),
+    "OPTIONS": {"MAX_ENTRIES": int(os.getenv("QUIZ_RESPONSE_CACHE_MAX_ENTRIES", "5000"))},
+})
 
 
 # Password validation
@@ -166,4 +239,243 @@ CORS_ALLOWED_ORIGINS = os.getenv(
     "http://127.0.0.1:5500,http://localhost:5500"
 ).split(",")
 
-CORS_ALLOW_CREDENTIALS = True
\ No newline at end of file
+CORS_ALLOW_CREDENTIALS = True
+
+# Quiz generation jobs
+# createQuiz hands the AI pipeline to a local thread pool and returns a job id.
+# QUIZ_JOBS_EAGER runs jobs inline instead (useful for tests and debugging).
+
+QUIZ_JOB_WORKERS = int(os.getenv("QUIZ_JOB_WORKERS", "2"))
+
+QUIZ_JOBS_EAGER = os.getenv("QUIZ_JOBS_EAGER", "False") == "True"
+
+# Whisper and Gemini are loaded on first use. QUIZ_JOB_WARM_UP loads them in
+# the worker pool as soon as the process starts.
+QUIZ_JOB_WARM_UP = os.getenv("QUIZ_JOB_WARM_UP", "False") == "True"
+
+# A running job that has not changed for this long is treated as lost
+# (crashed worker), so requests for its video start a new run.
+QUIZ_JOB_STALE_SECONDS = int(os.getenv("QUIZ_JOB_STALE_SECONDS", "7200"))
+
+# Every process that serves requests or runs jobs also dispatches on a timer
+# (started by wsgi.py / asgi.py and create_quizzes), so queued jobs start after
+# a restart, and it refreshes updated_at of its running jobs (heartbeat).
+# A dispatched job without a heartbeat for QUIZ_JOB_LOST_SECONDS belonged to a
+# process that is gone and is put back in the queue.
+# QUIZ_DISPATCH_INTERVAL_SECONDS=0 turns the timer, and with it requeueing, off.
+QUIZ_DISPATCH_INTERVAL_SECONDS = int(os.getenv("QUIZ_DISPATCH_INTERVAL_SECONDS", "30"))
+
+QUIZ_JOB_LOST_SECONDS = int(os.getenv("QUIZ_JOB_LOST_SECONDS", "120"))
+
+# Per-stage concurrency limits, shared by all jobs of a process. Batches
+# (/api/createQuizBatch/, `manage.py create_quizzes`) run in a pool with one
+# thread per slot, so downloads, transcriptions and generations overlap.
+QUIZ_DOWNLOAD_CONCURRENCY = int(os.getenv("QUIZ_DOWNLOAD_CONCURRENCY", "4"))
+
+QUIZ_TRANSCRIBE_CONCURRENCY = int(os.getenv("QUIZ_TRANSCRIBE_CONCURRENCY", "2"))
+
+QUIZ_GENERATE_CONCURRENCY = int(os.getenv("QUIZ_GENERATE_CONCURRENCY", "4"))
+
+# Maximum number of videos (after playlist expansion and deduplication) per batch
+QUIZ_BATCH_MAX_ITEMS = int(os.getenv("QUIZ_BATCH_MAX_ITEMS", "100"))
+
+# How quizzes store their own questions:
+# "rows" (default) one Question row per question and one QuestionOption row per option
+# "json"           all questions and options in the quiz's question_data column,
+#                  read together with the quiz (no joins, no extra queries).
+# After switching, `manage.py convert_quiz_storage --to json|rows` moves existing quizzes.
+QUIZ_QUESTION_STORAGE = os.getenv("QUIZ_QUESTION_STORAGE", "rows")
+
+# Admission control
+# createQuiz / createQuizBatch are rate limited per user with a token bucket
+# (QUIZ_CREATE_BURST requests, refilled at QUIZ_CREATE_RATE_PER_MINUTE; 0 = off).
+# At most QUIZ_MAX_QUEUED_JOBS jobs wait for a worker; beyond that requests get
+# 429 with Retry-After. The dispatcher runs QUIZ_MAX_RUNNING_JOBS jobs at once
+# across all processes sharing the database, QUIZ_MAX_RUNNING_JOBS_PER_USER per
+# user, taking turns between users. Each process only claims a job when one of
+# its pool threads is idle (QUIZ_JOB_WORKERS, or the stage slots for batches),
+# so with N processes the effective limit is min(QUIZ_MAX_RUNNING_JOBS,
+# N * QUIZ_JOB_WORKERS + batch threads).
+QUIZ_CREATE_RATE_PER_MINUTE = float(os.getenv("QUIZ_CREATE_RATE_PER_MINUTE", "6"))
+
+QUIZ_CREATE_BURST = int(os.getenv("QUIZ_CREATE_BURST", "10"))
+
+QUIZ_MAX_QUEUED_JOBS = int(os.getenv("QUIZ_MAX_QUEUED_JOBS", "200"))
+
+QUIZ_QUEUE_RETRY_AFTER_SECONDS = int(os.getenv("QUIZ_QUEUE_RETRY_AFTER_SECONDS", "60"))
+
+QUIZ_MAX_RUNNING_JOBS = int(os.getenv("QUIZ_MAX_RUNNING_JOBS", "8"))
+
+QUIZ_MAX_RUNNING_JOBS_PER_USER = int(os.getenv("QUIZ_MAX_RUNNING_JOBS_PER_USER", "2"))
+
+# Batch jobs are counted separately, so a user's batch can keep every stage busy
+QUIZ_MAX_RUNNING_BATCH_JOBS_PER_USER = int(os.getenv("QUIZ_MAX_RUNNING_BATCH_JOBS_PER_USER", "6"))
+
+
+# Transcript cache
+# Whisper transcripts are cached on disk per (video ID, model, language).
+# WHISPER_LANGUAGE forces a transcription language; empty means auto-detect.
+
+WHISPER_LANGUAGE = os.getenv("WHISPER_LANGUAGE") or None
+
+TRANSCRIPT_CACHE_DIR = os.getenv("TRANSCRIPT_CACHE_DIR", str(BASE_DIR / "cache" / "transcripts"))
+
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "500")) * 1024 * 1024
+
+TRANSCRIPT_CACHE_MAX_AGE_DAYS = int(os.getenv("TRANSCRIPT_CACHE_MAX_AGE_DAYS", "90"))
+
+
+# Long-video transcription
+# Audio longer than WHISPER_CHUNK_MIN_SECONDS is split into chunks ("silence" or
+# "fixed" windows) that are transcribed in parallel worker processes.
+# WHISPER_CHUNK_WORKERS=1 disables chunking.
+
+WHISPER_CHUNK_MIN_SECONDS = int(os.getenv("WHISPER_CHUNK_MIN_SECONDS", "600"))
+
+WHISPER_CHUNK_SECONDS = int(os.getenv("WHISPER_CHUNK_SECONDS", "300"))
+
+WHISPER_CHUNK_OVERLAP_SECONDS = float(os.getenv("WHISPER_CHUNK_OVERLAP_SECONDS", "1.0"))
+
+WHISPER_CHUNK_STRATEGY = os.getenv("WHISPER_CHUNK_STRATEGY", "silence")
+
+WHISPER_CHUNK_WORKERS = int(os.getenv("WHISPER_CHUNK_WORKERS", str(os.cpu_count() or 1)))
+
+
+# Transcription backend
+# quizzes.transcription.WhisperBackend       openai-whisper (PyTorch, fp32 on CPU)
+# quizzes.transcription.FasterWhisperBackend faster-whisper / CTranslate2 (int8 by default)
+# quizzes.transcription.DummyBackend         no model, placeholder text (tests, development)
+# WHISPER_COMPUTE_TYPE: e.g. float32, float16, int8 (engine dependent; empty = engine default)
+# WHISPER_THREADS: CPU threads per model, 0 = engine default
+
+TRANSCRIPTION_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "quizzes.transcription.WhisperBackend")
+
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "")
+
+WHISPER_THREADS = int(os.getenv("WHISPER_THREADS", "0"))
+
+
+# Shared transcription server
+# With TRANSCRIPTION_SERVER_ADDRESS set (e.g. /run/quizly/transcription.sock),
+# workers send audio to `manage.py run_transcription_server`, which owns the model.
+# TRANSCRIPTION_SERVER_FALLBACK transcribes in-process when the server is down.
+
+TRANSCRIPTION_SERVER_ADDRESS = os.getenv("TRANSCRIPTION_SERVER_ADDRESS", "")
+
+TRANSCRIPTION_SERVER_FALLBACK = os.getenv("TRANSCRIPTION_SERVER_FALLBACK", "True") == "True"
+
+TRANSCRIPTION_SERVER_AUTHKEY = os.getenv("TRANSCRIPTION_SERVER_AUTHKEY") or SECRET_KEY or ""
+
+TRANSCRIPTION_SERVER_CONCURRENCY = int(os.getenv("TRANSCRIPTION_SERVER_CONCURRENCY", "1"))
+
+
+# Audio ingestion
+# "file":   yt-dlp downloads the audio and converts it to mp3 (decoded again for Whisper)
+# "stream": yt-dlp output is piped into ffmpeg and decoded once to 16 kHz float PCM
+# AUDIO_STREAM_BUFFER ("memory" or "mmap") sets where streamed PCM is kept.
+
+AUDIO_INGEST_MODE = os.getenv("AUDIO_INGEST_MODE", "file")
+
+AUDIO_STREAM_BUFFER = os.getenv("AUDIO_STREAM_BUFFER", "memory")
+
+
+# Pipeline media scratch space
+# Each job downloads/decodes into its own directory, removed when the job ends.
+# MEDIA_KEEP_AUDIO retains downloaded audio per video for re-transcription;
+# retained audio is evicted (least recently used first) above MEDIA_SCRATCH_MAX_MB.
+
+MEDIA_SCRATCH_DIR = os.getenv("MEDIA_SCRATCH_DIR", str(BASE_DIR / "cache" / "media"))
+
+MEDIA_SCRATCH_MAX_BYTES = int(os.getenv("MEDIA_SCRATCH_MAX_MB", "2048")) * 1024 * 1024
+
+MEDIA_KEEP_AUDIO = os.getenv("MEDIA_KEEP_AUDIO", "False") == "True"
+
+
+# Pipeline metrics and logging
+# Stage timings are exported at /api/metrics/ (Prometheus text format) and
+# logged as one JSON line per stage by the "quizzes.metrics" logger.
+# With METRICS_TOKEN set, scrapers must send "Authorization: Bearer <token>".
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+PIPELINE_LOG_LEVEL = os.getenv("PIPELINE_LOG_LEVEL", "INFO")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "quizzes.metrics": {
+            "handlers": ["console"],
+            "level": PIPELINE_LOG_LEVEL,
+            "propagate": False,
+        },
+    },
+}
+
+
+# Gemini client
+# One pooled client per process: keep-alive connections, a cap on concurrent
+# requests and retries with jittered exponential backoff on 429/5xx/network errors.
+# GEMINI_BASE_URL overrides the API endpoint (e.g. `manage.py run_fake_gemini`).
+
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "")
+
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "120"))
+
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "10"))
+
+GEMINI_KEEPALIVE_SECONDS = float(os.getenv("GEMINI_KEEPALIVE_SECONDS", "30"))
+
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "4"))
+
+GEMINI_RETRY_BASE_DELAY = float(os.getenv("GEMINI_RETRY_BASE_DELAY", "1.0"))
+
+GEMINI_RETRY_MAX_DELAY = float(os.getenv("GEMINI_RETRY_MAX_DELAY", "30"))
+
+
+# Streaming generation
+# GEMINI_STREAMING parses the quiz while Gemini streams it and saves each
+# question as soon as it is complete; /api/jobs/{id}/events/ pushes them
+# to the client as server-sent events.
+
+GEMINI_STREAMING = os.getenv("GEMINI_STREAMING", "False") == "True"
+
+JOB_EVENTS_POLL_SECONDS = float(os.getenv("JOB_EVENTS_POLL_SECONDS", "0.5"))
+
+JOB_EVENTS_TIMEOUT_SECONDS = int(os.getenv("JOB_EVENTS_TIMEOUT_SECONDS", "900"))
+
+# Async views
+# Under an ASGI server (e.g. `uvicorn quizly_backend.asgi:application`),
+# API_ASYNC_VIEWS serves job status, job event streams and quiz reads from
+# async views, so waiting clients do not hold a thread each.
+API_ASYNC_VIEWS = os.getenv("API_ASYNC_VIEWS", "False") == "True"
+
+
+# Prompt budgeting
+# Transcripts over PROMPT_MAX_TRANSCRIPT_TOKENS are split into chunks of
+# PROMPT_CHUNK_TOKENS, condensed by Gemini in parallel (PROMPT_MAP_CONCURRENCY
+# calls at once) and the quiz is generated from the condensed notes.
+# Tokens are counted with tiktoken's PROMPT_TOKEN_ENCODING.
+
+PROMPT_MAX_TRANSCRIPT_TOKENS = int(os.getenv("PROMPT_MAX_TRANSCRIPT_TOKENS", "12000"))
+
+PROMPT_CHUNK_TOKENS = int(os.getenv("PROMPT_CHUNK_TOKENS", "6000"))
+
+PROMPT_MAP_CONCURRENCY = int(os.getenv("PROMPT_MAP_CONCURRENCY", "4"))
+
+PROMPT_TOKEN_ENCODING = os.getenv("PROMPT_TOKEN_ENCODING", "cl100k_base")
+
+
+# Structured output
+# GEMINI_JSON_MODE requests application/json constrained by the quiz schema
+# (10 questions, 4 options each). Replies are still validated strictly and
+# invalid parts are repaired with one extra request.
+
+GEMINI_JSON_MODE = os.getenv("GEMINI_JSON_MODE", "True") == "True"
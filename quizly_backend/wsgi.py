@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quizly_backend.settings')
 
 application = get_wsgi_application()
+
+# Starts queued jobs and keeps this process's running jobs alive (heartbeat)
+from quizzes.jobs import start_dispatcher  # noqa: E402
+
+start_dispatcher()
@@ -1,6 +1,9 @@
 from django.contrib import admin
-from .models import Quiz, Question, QuestionOption
+from .models import Quiz, Question, QuestionOption, QuizJob, QuizTemplate, Transcript
 
 admin.site.register(Quiz)
 admin.site.register(Question)
 admin.site.register(QuestionOption)
+admin.site.register(QuizJob)
+admin.site.register(Transcript)
+admin.site.register(QuizTemplate)
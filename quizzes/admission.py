@@ -0,0 +1,207 @@
+"""
+Admission control for the quiz pipeline.
+Protects Whisper CPU and Gemini quota from being taken by a single user:
+- token buckets limit how fast a user can submit quizzes (kept in Django's
+  cache, see api/throttling.py);
+- the queue of jobs waiting for a worker is bounded, and new work is turned
+  away with a Retry-After hint once it is full;
+- the dispatcher starts at most QUIZ_MAX_RUNNING_JOBS jobs at once, at most
+  QUIZ_MAX_RUNNING_JOBS_PER_USER interactive and QUIZ_MAX_RUNNING_BATCH_JOBS_PER_USER
+  batch jobs per user, always picking the oldest job of the user with the
+  fewest running jobs (fair across users).
+
+Queue and running jobs are read from the QuizJob table, so the limits hold
+for every process sharing the database. Jobs claimed by a process that has
+died are put back in the queue once their heartbeat stops.
+"""
+import time
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import ACTIVE_JOB_STATUSES, Quiz, QuizJob
+
+
+class QueueFull(Exception):
+    """
+    Raised when no more jobs may wait for a worker. retry_after is in seconds.
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# ========== Token buckets ==========
+
+_bucket_lock = threading.Lock()
+
+
+def take_token(key: str, rate_per_minute: float, burst: int) -> float:
+    """
+    Takes one token from the bucket stored under `key`. Buckets hold up to
+    `burst` tokens and refill at `rate_per_minute`.
+
+    Returns:
+        float: 0 if a token was taken, otherwise seconds until one is available.
+    """
+    rate = rate_per_minute / 60
+    now = time.time()
+    # A bucket left alone this long is full again, the same as a missing one
+    timeout = int(burst / rate) + 1
+
+    # Read-modify-write is atomic per process (the cache is process-local)
+    with _bucket_lock:
+        tokens, updated = cache.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+
+        if tokens < 1:
+            cache.set(key, (tokens, now), timeout=timeout)
+            return (1 - tokens) / rate
+
+        cache.set(key, (tokens - 1, now), timeout=timeout)
+        return 0
+
+
+# ========== Queue ==========
+
+def waiting_jobs():
+    """
+    Leader jobs that have not been handed to a worker yet.
+    """
+    return QuizJob.objects.filter(leader__isnull=True, status=QuizJob.Status.QUEUED, started_at__isnull=True)
+
+
+def running_jobs():
+    """
+    Dispatched jobs that are still running. Jobs that have not moved for
+    QUIZ_JOB_STALE_SECONDS are left out, their worker is assumed lost.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.QUIZ_JOB_STALE_SECONDS)
+    return QuizJob.objects.filter(
+        leader__isnull=True,
+        status__in=ACTIVE_JOB_STATUSES,
+        started_at__isnull=False,
+        updated_at__gte=cutoff
+    )
+
+
+def lost_jobs():
+    """
+    Dispatched jobs without a heartbeat for QUIZ_JOB_LOST_SECONDS: the
+    process that claimed them is gone (see jobs.dispatch_tick).
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.QUIZ_JOB_LOST_SECONDS)
+    return QuizJob.objects.filter(
+        leader__isnull=True,
+        status__in=ACTIVE_JOB_STATUSES,
+        started_at__isnull=False,
+        updated_at__lt=cutoff
+    )
+
+
+def requeue_lost_jobs() -> int:
+    """
+    Puts lost jobs back in the queue, so they run again instead of holding
+    running slots until QUIZ_JOB_STALE_SECONDS. A partially streamed quiz
+    is deleted; the next run starts it over. Returns the number of jobs.
+    """
+    requeued = 0
+
+    for job_id, quiz_id in lost_jobs().values_list("id", "quiz_id"):
+        # The job may have sent a heartbeat since it was read
+        if lost_jobs().filter(id=job_id).update(
+            status=QuizJob.Status.QUEUED,
+            started_at=None,
+            quiz=None,
+            updated_at=timezone.now()
+        ):
+            if quiz_id is not None:
+                Quiz.objects.filter(id=quiz_id).delete()
+            requeued += 1
+
+    return requeued
+
+
+def check_queue_capacity(count: int = 1) -> None:
+    """
+    Raises QueueFull if `count` more jobs would not fit into the queue.
+    The check is not atomic with the insert, so the bound is a soft one.
+    """
+    if waiting_jobs().count() + count > settings.QUIZ_MAX_QUEUED_JOBS:
+        raise QueueFull("Too many quizzes are waiting to be generated", settings.QUIZ_QUEUE_RETRY_AFTER_SECONDS)
+
+
+# ========== Dispatcher ==========
+
+def _user_limit(batch: bool) -> int:
+    if batch:
+        return settings.QUIZ_MAX_RUNNING_BATCH_JOBS_PER_USER
+
+    return settings.QUIZ_MAX_RUNNING_JOBS_PER_USER
+
+
+def claim_next_job(batch: bool | None = None, job_ids=None) -> QuizJob | None:
+    """
+    Picks the next job to run and marks it as started, or returns None when
+    the global or every waiting user's concurrency limit is reached.
+    `batch` restricts the pick to batch or interactive jobs (the pool with
+    a free thread); None considers both. `job_ids` restricts it to the given
+    jobs (a process that only runs its own).
+
+    A user's interactive and batch jobs have separate limits, so a batch
+    can keep every pipeline stage busy without blocking the user's own
+    createQuiz requests.
+
+    Fairness: among users with waiting jobs and a free slot, the user with
+    the fewest running jobs goes first; ties go to the oldest waiting job.
+    """
+    running = dict(
+        ((owner_id, is_batch), n)
+        for owner_id, is_batch, n in running_jobs().values("owner_id", "batch").annotate(
+            n=Count("id")
+        ).values_list("owner_id", "batch", "n")
+    )
+    if sum(running.values()) >= settings.QUIZ_MAX_RUNNING_JOBS:
+        return None
+
+    per_user = {}
+    for (owner_id, _is_batch), n in running.items():
+        per_user[owner_id] = per_user.get(owner_id, 0) + n
+
+    waiting = waiting_jobs()
+    if batch is not None:
+        waiting = waiting.filter(batch=batch)
+    if job_ids is not None:
+        waiting = waiting.filter(id__in=job_ids)
+
+    while True:
+        heads = [
+            (per_user.get(owner_id, 0), first_id)
+            for owner_id, is_batch, first_id in waiting.values("owner_id", "batch").annotate(
+                first_id=Min("id")
+            ).values_list("owner_id", "batch", "first_id")
+            if running.get((owner_id, is_batch), 0) < _user_limit(is_batch)
+        ]
+        if not heads:
+            return None
+
+        _running, job_id = min(heads)
+
+        # Another dispatcher may have claimed it first. updated_at restarts
+        # the stale clock: the time spent waiting is not a lost worker.
+        now = timezone.now()
+        if waiting_jobs().filter(id=job_id).update(started_at=now, updated_at=now):
+            return QuizJob.objects.get(id=job_id)
+
+
+def release_job(job_id: int) -> None:
+    """
+    Undoes a claim whose job could not be handed to a worker, so it waits
+    for the next dispatcher instead of counting as running.
+    """
+    QuizJob.objects.filter(id=job_id, status=QuizJob.Status.QUEUED).update(started_at=None, updated_at=timezone.now())
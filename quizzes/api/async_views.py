@@ -0,0 +1,189 @@
+"""
+Async (ASGI) versions of the quiz API views.
+Under an ASGI server these endpoints wait without holding a thread: job
+polling and quiz reads use Django's async ORM, and the server-sent event
+streams sleep on the event loop between polls, so one process can keep
+hundreds of clients waiting. Writes (PATCH/DELETE) fall back to the
+synchronous DRF views, which run in a worker thread.
+
+Served instead of their synchronous counterparts when API_ASYNC_VIEWS
+is enabled (see urls.py).
+"""
+import time
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+
+from . import response_cache, views
+from .authentication import CookieJWTAuthentication
+from .serializers import QuestionSerializer, QuizSerializer, QuizJobSerializer
+from ..models import Question, Quiz, QuizJob
+
+
+def _error(detail, status_code: int) -> JsonResponse:
+    return JsonResponse(detail if isinstance(detail, dict) else {"detail": detail}, status=status_code)
+
+
+def async_api_view(methods: list):
+    """
+    Async counterpart of @api_view + IsAuthenticated for plain Django views:
+    checks the HTTP method and authenticates the JWT cookie.
+    """
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return _error(f'Method "{request.method}" not allowed.', status.HTTP_405_METHOD_NOT_ALLOWED)
+
+            try:
+                result = await sync_to_async(CookieJWTAuthentication().authenticate)(request)
+            except AuthenticationFailed as e:
+                return _error(e.detail, e.status_code)
+
+            if result is None:
+                return _error("Authentication credentials were not provided.", status.HTTP_401_UNAUTHORIZED)
+
+            request.user = result[0]
+            return await view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@async_api_view(['GET'])
+async def job_status(request, job_id):
+    """
+    Returns the current stage of a quiz generation job and, once done, the quiz id.
+    """
+    job = await QuizJob.objects.filter(id=job_id).afirst()
+
+    if job is None:
+        return _error("No QuizJob matches the given query.", status.HTTP_404_NOT_FOUND)
+
+    if job.owner_id != request.user.id:
+        return _error("Access denied - job does not belong to user", status.HTTP_403_FORBIDDEN)
+
+    return JsonResponse(QuizJobSerializer(job).data)
+
+
+async def _job_events(job: QuizJob):
+    """
+    Async twin of views._job_events: the same events, but the wait between
+    polls does not block a thread.
+    """
+    last_status = None
+    last_question_id = 0
+    sent_positions = set()
+    deadline = time.monotonic() + settings.JOB_EVENTS_TIMEOUT_SECONDS
+
+    while True:
+        await job.arefresh_from_db(fields=["status", "quiz", "error"])
+
+        if job.status != last_status:
+            last_status = job.status
+            yield views._sse("status", {"status": job.status})
+
+        if job.status == QuizJob.Status.FAILED:
+            yield views._sse("failed", {"error": job.error})
+            return
+
+        if job.quiz_id is not None:
+            question_data = await Quiz.objects.filter(id=job.quiz_id).values_list("question_data", flat=True).afirst()
+
+            if question_data is not None:
+                for question in views._unsent_questions(question_data, sent_positions):
+                    yield views._sse("question", question)
+            else:
+                new_questions = Question.objects.filter(
+                    quiz_id=job.quiz_id, id__gt=last_question_id
+                ).prefetch_related("question_options").order_by("id")
+
+                async for question in new_questions:
+                    last_question_id = question.id
+                    yield views._sse("question", QuestionSerializer(question).data)
+
+        if job.status == QuizJob.Status.DONE:
+            quiz = await Quiz.objects.select_related("template").aget(id=job.quiz_id)
+            # Quizzes served from the generation cache have no rows to stream
+            if quiz.template_id is not None:
+                for question in QuizSerializer(quiz).data["questions"]:
+                    yield views._sse("question", question)
+
+            yield views._sse("done", {"quiz": job.quiz_id})
+            return
+
+        if time.monotonic() > deadline:
+            yield views._sse("timeout", {"status": job.status})
+            return
+
+        # Comment line: keeps proxies from closing an idle connection
+        yield ": waiting\n\n"
+        await asyncio.sleep(settings.JOB_EVENTS_POLL_SECONDS)
+
+
+@async_api_view(['GET'])
+async def job_events(request, job_id):
+    """
+    Streams a job's progress and its questions as server-sent events.
+    """
+    job = await QuizJob.objects.filter(id=job_id).afirst()
+
+    if job is None:
+        return _error("No QuizJob matches the given query.", status.HTTP_404_NOT_FOUND)
+
+    if job.owner_id != request.user.id:
+        return _error("Access denied - job does not belong to user", status.HTTP_403_FORBIDDEN)
+
+    response = StreamingHttpResponse(_job_events(job), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@async_api_view(['GET'])
+async def _get_quiz(request, quiz_id):
+    """
+    Async twin of views._get_quiz: conditional GET and the response cache.
+    """
+    version = await Quiz.objects.filter(id=quiz_id).values("owner_id", "updated_at").afirst()
+
+    if version is None:
+        return _error("No Quiz matches the given query.", status.HTTP_404_NOT_FOUND)
+
+    if version["owner_id"] != request.user.id:
+        return _error("Access denied - quiz does not belong to user", status.HTTP_403_FORBIDDEN)
+
+    updated_at = version["updated_at"]
+    not_modified = response_cache.not_modified(request, quiz_id, updated_at)
+    if not_modified is not None:
+        return not_modified
+
+    body = await response_cache.quiz_cache().aget(response_cache.cache_key(quiz_id, updated_at))
+
+    if body is None:
+        rendered = await sync_to_async(views.render_quiz)(quiz_id)
+        if rendered is None:
+            return _error("No Quiz matches the given query.", status.HTTP_404_NOT_FOUND)
+        updated_at, body = rendered
+
+    return response_cache.quiz_response(body, quiz_id, updated_at)
+
+
+@csrf_exempt
+async def quiz_detail(request, quiz_id):
+    """
+    Reads a quiz with the async ORM; PATCH and DELETE are handled by the
+    synchronous view (copy-on-write and deletes run in transactions).
+    """
+    if request.method == "GET":
+        return await _get_quiz(request, quiz_id)
+
+    return await sync_to_async(views.quiz_detail)(request, quiz_id=quiz_id)
@@ -0,0 +1,21 @@
+"""
+Pagination classes for the Quizly API.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class QuizCursorPagination(CursorPagination):
+    """
+    Cursor pagination for quiz listings, newest first.
+
+    DRF's cursor keys on created_at only: a page starts with a range filter
+    on created_at (served by quiz_owner_created_idx), plus an offset that
+    skips quizzes sharing the boundary timestamp. -id only makes the order
+    deterministic; it is not part of the cursor. Since created_at rarely
+    repeats, the offset stays tiny and deep pages cost about as much as
+    the first one.
+    """
+    ordering = ("-created_at", "-id")
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
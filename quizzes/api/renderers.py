@@ -0,0 +1,19 @@
+"""
+Custom renderers for the Quizly API.
+"""
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets views answer `Accept: text/event-stream` (EventSource) requests.
+    Streaming responses bypass rendering; error responses are sent as JSON.
+    """
+    media_type = "text/event-stream"
+    format = "event-stream"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode(self.charset)
@@ -0,0 +1,72 @@
+"""
+Response cache and conditional GET for quiz reads.
+The serialized quiz JSON is stored in the "quiz_responses" cache under the
+quiz id and its updated_at, so every change to a quiz (edits, new questions,
+storage conversion) gets a new key; PATCH and DELETE also drop the previous
+entry. Responses carry a strong ETag and Last-Modified derived from the same
+version, so clients revalidating with If-None-Match / If-Modified-Since get
+304 Not Modified without the quiz being loaded or serialized.
+"""
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+
+
+CACHE_ALIAS = "quiz_responses"
+
+
+def quiz_cache():
+    return caches[CACHE_ALIAS]
+
+
+def _version(updated_at) -> int:
+    return int(updated_at.timestamp() * 1_000_000)
+
+
+def cache_key(quiz_id: int, updated_at) -> str:
+    return f"quizly:quiz:{quiz_id}:{_version(updated_at)}"
+
+
+def quiz_etag(quiz_id: int, updated_at) -> str:
+    return f'"{quiz_id}-{_version(updated_at)}"'
+
+
+def add_validators(response, quiz_id: int, updated_at):
+    """
+    Sets ETag and Last-Modified. Responses are per user and must be
+    revalidated before reuse.
+    """
+    response["ETag"] = quiz_etag(quiz_id, updated_at)
+    response["Last-Modified"] = http_date(updated_at.timestamp())
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def not_modified(request, quiz_id: int, updated_at) -> HttpResponse | None:
+    """
+    Returns a 304 (or 412) response when the request's conditional headers
+    match the quiz version, None when the quiz has to be sent.
+    """
+    response = get_conditional_response(
+        request,
+        etag=quiz_etag(quiz_id, updated_at),
+        last_modified=int(updated_at.timestamp())
+    )
+    return response and add_validators(response, quiz_id, updated_at)
+
+
+def render(data) -> bytes:
+    return JSONRenderer().render(data)
+
+
+def quiz_response(body: bytes, quiz_id: int, updated_at) -> HttpResponse:
+    return add_validators(HttpResponse(body, content_type="application/json"), quiz_id, updated_at)
+
+
+def invalidate(quiz_id: int, updated_at) -> None:
+    """
+    Drops the cached response of a quiz version that is being changed or deleted.
+    """
+    quiz_cache().delete(cache_key(quiz_id, updated_at))
@@ -4,7 +4,20 @@ Handles the conversion between Quiz/Question models and JSON format,
 including nested options and questions.
 """
 from rest_framework import serializers
-from ..models import Quiz, Question, QuestionOption
+from ..models import Quiz, Question, QuestionOption, QuizJob
+from ..utils import extract_video_id, normalize_youtube_url
+
+class DynamicFieldsMixin:
+    """
+    Lets callers limit the serialized fields by passing `fields=[...]`.
+    """
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
 
 class QuestionSerializer(serializers.ModelSerializer):
     """
@@ -12,7 +25,10 @@ class QuestionSerializer(serializers.ModelSerializer):
     
     Includes 'question_options' as a list of strings using SlugRelatedField,
     providing a flat representation of available choices.
+    'id' is the question's position in its quiz (0, 1, 2, ...), the same
+    for every way a quiz stores its questions.
     """
+    id = serializers.IntegerField(source="position", read_only=True)
     question_options = serializers.SlugRelatedField(
         many=True,
         read_only=True,
@@ -29,14 +45,27 @@ class QuestionSerializer(serializers.ModelSerializer):
         ]
 
 
-class QuizSerializer(serializers.ModelSerializer):
+def question_from_data(q: dict, position: int) -> dict:
     """
-    Serializer for the Quiz model.
-    
-    Nested Relationship:
-    Includes all related 'questions' using the QuestionSerializer.
+    API representation of a question stored as JSON (template or question_data),
+    matching QuestionSerializer.
+    """
+    return {
+        "id": position,
+        "question_title": q["question_title"],
+        "question_options": q["question_options"],
+        "answer": q["answer"],
+    }
+
+
+class QuizSummarySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """
+    Lightweight serializer for quiz listings.
+
+    Omits the nested questions and reports only how many there are
+    (the denormalized Quiz.question_count, or the template's length).
     """
-    questions = QuestionSerializer(many=True, read_only=True)
+    question_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Quiz
@@ -47,5 +76,72 @@ class QuizSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
             "video_url",
-            "questions"
+            "question_count"
+        ]
+
+    def get_question_count(self, quiz):
+        if quiz.template_id is not None:
+            return len(quiz.template.questions)
+
+        return quiz.question_count
+
+
+class QuizSerializer(QuizSummarySerializer):
+    """
+    Serializer for the Quiz model.
+    
+    Nested Relationship:
+    Includes all related 'questions' using the QuestionSerializer.
+    Quizzes still backed by a shared template read their questions from it,
+    quizzes with JSON storage from their question_data (no queries).
+    Also reports question_count, so summary fields can be expanded with
+    the questions. A changed video_url must be a YouTube video and updates
+    the quiz's video_id.
+    """
+    questions = serializers.SerializerMethodField()
+
+    class Meta(QuizSummarySerializer.Meta):
+        fields = QuizSummarySerializer.Meta.fields + ["questions"]
+
+    def validate_video_url(self, value):
+        try:
+            return normalize_youtube_url(value)
+        except ValueError:
+            raise serializers.ValidationError("Invalid YouTube URL")
+
+    def update(self, instance, validated_data):
+        # video_id backs ?video_id= filtering and dedup, it follows the URL
+        if "video_url" in validated_data:
+            instance.video_id = extract_video_id(validated_data["video_url"])
+
+        return super().update(instance, validated_data)
+
+    def get_questions(self, quiz):
+        if quiz.template_id is not None:
+            return [question_from_data(q, i) for i, q in enumerate(quiz.template.questions)]
+
+        if quiz.question_data is not None:
+            return [question_from_data(q, q["position"]) for q in quiz.question_data]
+
+        return QuestionSerializer(quiz.questions.all(), many=True).data
+
+
+class QuizJobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the QuizJob model.
+
+    Exposes the current pipeline stage and, once done, the id of the created quiz
+    and how many bytes of media the job wrote to scratch space.
+    """
+    class Meta:
+        model = QuizJob
+        fields = [
+            "id",
+            "status",
+            "video_url",
+            "quiz",
+            "error",
+            "media_bytes",
+            "created_at",
+            "updated_at",
         ]
@@ -0,0 +1,31 @@
+"""
+Request throttling for the Quizly API.
+"""
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from ..admission import take_token
+
+
+class QuizCreationThrottle(BaseThrottle):
+    """
+    Token bucket per user for the endpoints that start pipeline work:
+    QUIZ_CREATE_BURST requests at once, refilled at QUIZ_CREATE_RATE_PER_MINUTE.
+    DRF answers rejected requests with 429 and a Retry-After header.
+    """
+
+    def allow_request(self, request, view):
+        self.wait_seconds = 0
+
+        if settings.QUIZ_CREATE_RATE_PER_MINUTE <= 0:
+            return True
+
+        self.wait_seconds = take_token(
+            f"quizly:create-quiz:{request.user.pk}",
+            settings.QUIZ_CREATE_RATE_PER_MINUTE,
+            settings.QUIZ_CREATE_BURST
+        )
+        return self.wait_seconds == 0
+
+    def wait(self):
+        return self.wait_seconds
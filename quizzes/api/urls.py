@@ -2,15 +2,29 @@
 URL configuration for the quizzes app.
 
 Defines endpoints for:
-- Creating new quizzes with their questions.
+- Creating new quizzes with their questions, one video or a batch.
+- Polling the status of background quiz generation jobs.
+- Streaming job progress and questions as server-sent events.
 - Listing all available quizzes.
 - Retrieving detailed information about a specific quiz.
+- Exporting pipeline metrics for Prometheus.
+
+With API_ASYNC_VIEWS, job status, job events and quiz reads are served by
+the async views (for ASGI deployments).
 """
+from django.conf import settings
 from django.urls import path
-from quizzes.api.views import create_quiz, list_quizzes, quiz_detail
+from quizzes.api import async_views, views
+from quizzes.api.views import create_quiz, create_quiz_batch, list_quizzes, metrics
+
+waiting_views = async_views if settings.API_ASYNC_VIEWS else views
 
 urlpatterns = [
     path("createQuiz/", create_quiz),
+    path("createQuizBatch/", create_quiz_batch),
+    path("jobs/<int:job_id>/", waiting_views.job_status),
+    path("jobs/<int:job_id>/events/", waiting_views.job_events),
     path("quizzes/", list_quizzes),
-    path("quizzes/<int:quiz_id>/", quiz_detail),   
+    path("quizzes/<int:quiz_id>/", waiting_views.quiz_detail),   
+    path("metrics/", metrics),
 ]
@@ -1,37 +1,64 @@
 """
 API Views for the Quizzes application.
-Handles the logic for creating, listing, and managing quizzes, 
+Handles the logic for creating, listing, and managing quizzes,
 integrating the AI processing pipeline with the Django database.
 """
+import hmac
+import json
+import time
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import (
+    api_view,
+    authentication_classes,
+    permission_classes,
+    renderer_classes,
+    throttle_classes
+)
+from rest_framework.exceptions import Throttled
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework import status
-from ..models import Quiz
-
-from .serializers import QuizSerializer
-from ..utils import (
-    normalize_youtube_url,
-    download_audio,
-    transcribe_audio,
-    build_prompt,
-    generate_quiz_json
+
+from . import response_cache
+from .pagination import QuizCursorPagination
+from .renderers import EventStreamRenderer
+from .serializers import (
+    QuestionSerializer,
+    QuizJobSerializer,
+    QuizSerializer,
+    QuizSummarySerializer,
+    question_from_data
 )
-from ..models import Quiz, Question, QuestionOption
-from django.db import transaction
+from .throttling import QuizCreationThrottle
+from ..admission import QueueFull
+from ..utils import normalize_youtube_url
+from ..batch import BatchTooLarge, submit_quiz_batch
+from ..jobs import IdempotencyKeyReused, submit_quiz_job
+from ..metrics import render_metrics
+from ..quiz_cache import detach_template
+from ..models import Question, Quiz, QuizJob
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([QuizCreationThrottle])
 def create_quiz(request):
     """
     Main endpoint to generate a quiz from a YouTube URL.
-    
+
     Pipeline:
     1. Validates and normalizes the YouTube URL.
-    2. Downloads audio and transcribes it.
-    3. Requests a JSON-structured quiz.
-    4. Saves the quiz, questions, and options in a single atomic transaction.
+    2. Queues a background job that downloads, transcribes and generates the quiz,
+       or attaches to the job already running for the same video.
+    3. Returns 202 Accepted with the job id; progress is polled via /api/jobs/{id}/.
+       A repeated request (same Idempotency-Key, or the user's own running job
+       for the video) returns the existing job with 200 OK.
+
+    Too many requests from the user, or a full job queue, are answered with
+    429 Too Many Requests and a Retry-After header.
     """
     url = request.data.get("url")
 
@@ -44,49 +71,317 @@ def create_quiz(request):
     except ValueError:
         return Response({"detail": "Invalid YouTube URL"}, status=400)
 
-    # AI FLOW
-    audio_path = download_audio(clean_url)
-    transcript = transcribe_audio(audio_path)
-    prompt = build_prompt(transcript)
-    quiz_data = generate_quiz_json(prompt)
-
-    # SAVE
-    with transaction.atomic():
-        quiz = Quiz.objects.create(
-            title=quiz_data["title"],
-            description=quiz_data["description"],
-            video_url=clean_url,
-            owner=request.user
+    idempotency_key = request.headers.get("Idempotency-Key", "").strip()
+    if len(idempotency_key) > 255:
+        return Response({"detail": "Idempotency-Key must be at most 255 characters"}, status=400)
+
+    # AI FLOW (runs in the background worker pool, once per video at a time)
+    try:
+        job, created = submit_quiz_job(request.user, clean_url, idempotency_key)
+    except IdempotencyKeyReused as e:
+        return Response({"detail": str(e)}, status=status.HTTP_409_CONFLICT)
+    except QueueFull as e:
+        raise Throttled(wait=e.retry_after, detail=str(e))
+    job.refresh_from_db()
+
+    serializer = QuizJobSerializer(job)
+    return Response(
+        serializer.data,
+        status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK
+    )
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([QuizCreationThrottle])
+def create_quiz_batch(request):
+    """
+    Generates quizzes for many YouTube URLs and/or playlists at once.
+    Repeated videos are submitted once; the jobs are pipelined in the batch
+    worker pool. Returns one result per video with its job.
+    """
+    urls = request.data.get("urls") or []
+    playlists = request.data.get("playlists") or []
+
+    if not isinstance(urls, list) or not isinstance(playlists, list):
+        return Response({"detail": "urls and playlists must be lists"}, status=400)
+
+    if not urls and not playlists:
+        return Response({"detail": "URLs or playlists required"}, status=400)
+
+    try:
+        items = submit_quiz_batch(request.user, urls, playlists)
+    except BatchTooLarge as e:
+        return Response({"detail": str(e)}, status=400)
+    except QueueFull as e:
+        raise Throttled(wait=e.retry_after, detail=str(e))
+
+    for item in items:
+        if item["job"] is not None:
+            item["job"].refresh_from_db()
+            item["job"] = QuizJobSerializer(item["job"]).data
+
+    created = any(item["result"] == "created" for item in items)
+    return Response(
+        {"items": items},
+        status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def job_status(request, job_id):
+    """
+    Returns the current stage of a quiz generation job and, once done, the quiz id.
+    """
+    job = get_object_or_404(QuizJob, id=job_id)
+
+    if job.owner != request.user:
+        return Response(
+            {"detail": "Access denied - job does not belong to user"},
+            status=status.HTTP_403_FORBIDDEN
         )
 
-        for q in quiz_data["questions"]:
-            question = Question.objects.create(
-                quiz=quiz,
-                question_title=q["question_title"],
-                answer=q["answer"]
-            )
+    serializer = QuizJobSerializer(job)
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _unsent_questions(question_data: list, sent: set) -> list:
+    """
+    Questions of a quiz with JSON storage that have not been streamed yet.
+    Tracks positions rather than a count: repaired questions fill gaps.
+    """
+    new = [q for q in question_data if q["position"] not in sent]
+    sent.update(q["position"] for q in new)
+    return [question_from_data(q, q["position"]) for q in new]
+
+
+def _job_events(job: QuizJob):
+    """
+    Yields server-sent events for a job until it is done or failed:
+    "status" on every stage change, "question" for each saved question
+    and finally "done" (with the quiz id) or "failed" (with the error).
+    Polls the database, so it works whichever process runs the job.
+    """
+    last_status = None
+    last_question_id = 0
+    sent_positions = set()
+    deadline = time.monotonic() + settings.JOB_EVENTS_TIMEOUT_SECONDS
+
+    while True:
+        job.refresh_from_db(fields=["status", "quiz", "error"])
+
+        if job.status != last_status:
+            last_status = job.status
+            yield _sse("status", {"status": job.status})
 
-            for opt in q["question_options"]:
-                QuestionOption.objects.create(
-                    question=question,
-                    option_text=opt
-                )
+        if job.status == QuizJob.Status.FAILED:
+            yield _sse("failed", {"error": job.error})
+            return
 
-    serializer = QuizSerializer(quiz)
-    return Response(serializer.data, status=201)
+        if job.quiz_id is not None:
+            question_data = Quiz.objects.filter(id=job.quiz_id).values_list("question_data", flat=True).first()
+
+            if question_data is not None:
+                for question in _unsent_questions(question_data, sent_positions):
+                    yield _sse("question", question)
+            else:
+                new_questions = Question.objects.filter(
+                    quiz_id=job.quiz_id, id__gt=last_question_id
+                ).prefetch_related("question_options").order_by("id")
+
+                for question in new_questions:
+                    last_question_id = question.id
+                    yield _sse("question", QuestionSerializer(question).data)
+
+        if job.status == QuizJob.Status.DONE:
+            quiz = Quiz.objects.select_related("template").get(id=job.quiz_id)
+            # Quizzes served from the generation cache have no rows to stream
+            if quiz.template_id is not None:
+                for question in QuizSerializer(quiz).data["questions"]:
+                    yield _sse("question", question)
+
+            yield _sse("done", {"quiz": job.quiz_id})
+            return
+
+        if time.monotonic() > deadline:
+            yield _sse("timeout", {"status": job.status})
+            return
+
+        # Comment line: keeps proxies from closing an idle connection
+        yield ": waiting\n\n"
+        time.sleep(settings.JOB_EVENTS_POLL_SECONDS)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([EventStreamRenderer, JSONRenderer])
+def job_events(request, job_id):
+    """
+    Streams a job's progress and its questions as server-sent events
+    (text/event-stream), for use with the browser's EventSource.
+    """
+    job = get_object_or_404(QuizJob, id=job_id)
+
+    if job.owner != request.user:
+        return Response(
+            {"detail": "Access denied - job does not belong to user"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    response = StreamingHttpResponse(_job_events(job), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def metrics(request):
+    """
+    Pipeline stage histograms in the Prometheus text format.
+    When METRICS_TOKEN is set, scrapers must send it as a Bearer token.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        expected = f"Bearer {token}"
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), expected):
+            return Response({"detail": "Invalid metrics token"}, status=status.HTTP_403_FORBIDDEN)
+
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def quizzes_with_questions():
+    """
+    Quiz queryset that loads templates, questions and options up front,
+    so serializing any number of quizzes takes a constant number of queries.
+    With JSON storage the questions come with the quiz rows; quizzes not
+    yet converted (convert_quiz_storage) then load their rows one by one.
+    """
+    quizzes = Quiz.objects.select_related("template")
+
+    if settings.QUIZ_QUESTION_STORAGE == "json":
+        return quizzes
+
+    return quizzes.prefetch_related("questions__question_options")
+
+
+def _csv_param(request, name: str) -> set:
+    """
+    Parses a comma-separated query parameter such as ?fields=id,title.
+    """
+    value = request.query_params.get(name, "")
+    return {item.strip() for item in value.split(",") if item.strip()}
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def list_quizzes(request):
     """
-    Returns a list of all quizzes owned by the currently authenticated user.
+    Returns the quizzes owned by the currently authenticated user, newest first,
+    one cursor-paginated page at a time (?cursor=..., ?page_size=...).
+
+    Field selection:
+    - ?view=summary returns id/title/description/dates and question counts only.
+    - ?fields=id,title limits the returned fields.
+    - ?expand=questions adds the nested questions to a summary/fields selection.
+    Questions are only loaded from the database when they are returned.
+
+    ?video_id=<YouTube video ID> only returns the quizzes of that video.
     """
-    quizzes = Quiz.objects.filter(owner=request.user)
-    serializer = QuizSerializer(quizzes, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    fields = _csv_param(request, "fields")
+    expand = _csv_param(request, "expand")
+
+    if request.query_params.get("view") == "summary" and not fields:
+        fields = set(QuizSummarySerializer.Meta.fields)
+    if fields and "questions" in expand:
+        fields.add("questions")
+
+    with_questions = not fields or "questions" in fields
+    serializer_class = QuizSerializer if with_questions else QuizSummarySerializer
+
+    unknown = fields - set(serializer_class.Meta.fields)
+    if unknown:
+        return Response(
+            {"detail": f"Unknown fields: {', '.join(sorted(unknown))}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if with_questions:
+        quizzes = quizzes_with_questions().filter(owner=request.user)
+    else:
+        quizzes = (
+            Quiz.objects.filter(owner=request.user)
+            .select_related("template")
+            .defer("question_data")
+        )
+
+    video_id = request.query_params.get("video_id")
+    if video_id:
+        quizzes = quizzes.filter(video_id=video_id)
+
+    paginator = QuizCursorPagination()
+    page = paginator.paginate_queryset(quizzes, request)
+    serializer = serializer_class(page, many=True, fields=fields or None)
+    return paginator.get_paginated_response(serializer.data)
+
+
+def render_quiz(quiz_id):
+    """
+    Loads and serializes a quiz and stores the JSON in the response cache,
+    under the version actually serialized.
+    Synchronous: quizzes not converted to JSON storage may load their rows
+    lazily, so the async view runs this in a worker thread.
+
+    Returns:
+        tuple | None: (updated_at, body), or None if the quiz is gone.
+    """
+    quiz = quizzes_with_questions().filter(id=quiz_id).first()
+    if quiz is None:
+        return None
+
+    body = response_cache.render(QuizSerializer(quiz).data)
+    response_cache.quiz_cache().set(response_cache.cache_key(quiz_id, quiz.updated_at), body)
+    return quiz.updated_at, body
 
 
+def _get_quiz(request, quiz_id):
+    """
+    GET of quiz_detail: answers conditional requests from the quiz's version
+    alone and serves the serialized quiz from the response cache, so only a
+    miss loads and serializes the questions.
+    """
+    version = Quiz.objects.filter(id=quiz_id).values("owner_id", "updated_at").first()
+
+    if version is None:
+        raise Http404("No Quiz matches the given query.")
+
+    if version["owner_id"] != request.user.id:
+        return Response(
+            {"detail": "Access denied - quiz does not belong to user"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    updated_at = version["updated_at"]
+    not_modified = response_cache.not_modified(request, quiz_id, updated_at)
+    if not_modified is not None:
+        return not_modified
+
+    body = response_cache.quiz_cache().get(response_cache.cache_key(quiz_id, updated_at))
+
+    if body is None:
+        rendered = render_quiz(quiz_id)
+        if rendered is None:
+            raise Http404("No Quiz matches the given query.")
+        updated_at, body = rendered
+
+    return response_cache.quiz_response(body, quiz_id, updated_at)
+
 
 @api_view(['GET', 'PATCH', 'DELETE'])
 @permission_classes([IsAuthenticated])
@@ -95,26 +390,30 @@ def quiz_detail(request, quiz_id):
     Retrieve, update, or delete a specific quiz.
     Includes ownership verification (403 Forbidden if accessing someone else's quiz).
     """
-    quiz = get_object_or_404(Quiz, id=quiz_id)
+# GET: Return full quiz details including questions (cached, with ETag)
+    if request.method == 'GET':
+        return _get_quiz(request, quiz_id)
+
+    quiz = get_object_or_404(quizzes_with_questions(), id=quiz_id)
 # Ownership check
-    if quiz.owner != request.user:
+    if quiz.owner_id != request.user.id:
         return Response(
             {"detail": "Access denied - quiz does not belong to user"},
             status=status.HTTP_403_FORBIDDEN
         )
 
-# GET: Return full quiz details including questions
-    if request.method == 'GET':
-        serializer = QuizSerializer(quiz)
-        return Response(serializer.data)
  # PATCH: Partial update of quiz fields (title, description, etc.)
     if request.method == 'PATCH':
         serializer = QuizSerializer(quiz, data=request.data, partial=True)
         if serializer.is_valid():
+            response_cache.invalidate(quiz.id, quiz.updated_at)
+            # Copy-on-write: the user's quiz stops sharing the cached template
+            detach_template(quiz)
             serializer.save()
-            return Response(serializer.data)
+            return response_cache.add_validators(Response(serializer.data), quiz.id, quiz.updated_at)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 # DELETE: Permanently remove the quiz from the database
     if request.method == 'DELETE':
+        response_cache.invalidate(quiz.id, quiz.updated_at)
         quiz.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
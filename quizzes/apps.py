@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class QuizzesConfig(AppConfig):
     name = 'quizzes'
+
+    def ready(self):
+        # Models are loaded lazily; worker deployments can opt into loading
+        # them at start-up instead of on the first job.
+        if settings.QUIZ_JOB_WARM_UP:
+            from .jobs import warm_up_workers
+            warm_up_workers()
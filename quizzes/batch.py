@@ -0,0 +1,95 @@
+"""
+Batch quiz creation for Quizly.
+Takes a list of YouTube URLs and/or playlists, drops repeated videos and
+submits one job per video to the batch worker pool. The per-stage slots in
+jobs.py pipeline those jobs, so a batch of lectures is not processed one
+whole pipeline after the other.
+"""
+from django.conf import settings
+
+from .admission import QueueFull, check_queue_capacity
+from .jobs import submit_quiz_job
+from .utils import extract_video_id, list_playlist_videos, normalize_youtube_url
+
+
+class BatchTooLarge(ValueError):
+    """
+    Raised when a batch holds more videos than QUIZ_BATCH_MAX_ITEMS.
+    """
+
+
+def _item(url: str, result: str, video_id: str = "", job=None, error: str = "") -> dict:
+    return {"url": url, "video_id": video_id, "result": result, "job": job, "error": error}
+
+
+def collect_batch(urls=(), playlists=()) -> list:
+    """
+    Expands playlists and resolves the video ID of every URL, in order.
+    Every input yields one item; videos seen before are marked "duplicate"
+    and URLs that are not YouTube videos (or unreadable playlists) "invalid".
+    Items still to be submitted have the result "pending".
+    """
+    sources = list(urls)
+    items = []
+
+    for playlist in playlists:
+        try:
+            sources.extend(list_playlist_videos(playlist))
+        except RuntimeError as e:
+            items.append(_item(playlist, "invalid", error=str(e)))
+
+    seen = set()
+    for url in sources:
+        try:
+            video_id = extract_video_id(url)
+        except (TypeError, ValueError):
+            items.append(_item(url, "invalid", error="Invalid YouTube URL"))
+            continue
+
+        if video_id in seen:
+            items.append(_item(url, "duplicate", video_id))
+        else:
+            seen.add(video_id)
+            items.append(_item(url, "pending", video_id))
+
+    return items
+
+
+def submit_quiz_batch(owner, urls=(), playlists=()) -> list:
+    """
+    Submits one quiz job per distinct video of the batch.
+
+    Returns one item per input video (see collect_batch), with result
+    "created" (new job), "existing" (joined the user's running job),
+    "duplicate" (same job as an earlier item) or "rejected" (the queue
+    filled up meanwhile), and the job in "job".
+    Nothing is submitted when the batch exceeds QUIZ_BATCH_MAX_ITEMS
+    (BatchTooLarge) or does not fit into the job queue (QueueFull).
+    """
+    items = collect_batch(urls, playlists)
+
+    pending = [item for item in items if item["result"] == "pending"]
+    if len(pending) > settings.QUIZ_BATCH_MAX_ITEMS:
+        raise BatchTooLarge(
+            f"Batch has {len(pending)} videos, at most {settings.QUIZ_BATCH_MAX_ITEMS} are allowed"
+        )
+    check_queue_capacity(len(pending))
+
+    jobs = {}
+    for item in pending:
+        try:
+            job, created = submit_quiz_job(owner, normalize_youtube_url(item["url"]), batch=True)
+        except QueueFull as e:
+            item["result"] = "rejected"
+            item["error"] = str(e)
+            continue
+
+        jobs[item["video_id"]] = job
+        item["job"] = job
+        item["result"] = "created" if created else "existing"
+
+    for item in items:
+        if item["result"] == "duplicate":
+            item["job"] = jobs.get(item["video_id"])
+
+    return items
@@ -0,0 +1,226 @@
+"""
+Local fake of the Gemini generateContent API for tests and benchmarks.
+Answers every request with a valid quiz (or a configured text) after an
+optional delay, in one piece or streamed as server-sent events. It can be
+told to fail the next requests with a given status and counts requests,
+TCP connections and concurrent requests, so connection reuse and
+concurrency limits can be checked without network access.
+
+Point the app at it with GEMINI_BASE_URL=http://127.0.0.1:<port>
+(see `python manage.py run_fake_gemini`).
+"""
+import re
+import json
+import time
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+GENERATE_PATH = re.compile(r"^/v1beta/models/(?P<model>[^/:]+):(?P<method>generateContent|streamGenerateContent)(\?.*)?$")
+
+# Google API status names sent with injected failures
+ERROR_STATUS = {
+    400: "INVALID_ARGUMENT",
+    429: "RESOURCE_EXHAUSTED",
+    500: "INTERNAL",
+    503: "UNAVAILABLE",
+    504: "DEADLINE_EXCEEDED",
+}
+
+
+def sample_quiz(question_count: int = 10) -> dict:
+    """
+    A valid quiz payload in the shape Quizly asks Gemini for.
+    """
+    return {
+        "title": "Sample Quiz",
+        "description": "Generated by the fake Gemini server.",
+        "questions": [
+            {
+                "question_title": f"Question {i + 1}?",
+                "question_options": ["Option A", "Option B", "Option C", "Option D"],
+                "answer": "Option A"
+            }
+            for i in range(question_count)
+        ]
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open between requests
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.fake.record_connection()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status_code: int, payload: dict, headers: dict | None = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        fake = self.server.fake
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        match = GENERATE_PATH.match(self.path)
+        if match is None:
+            self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+            return
+
+        with fake.in_flight():
+            fake.requests.append(request)
+            if fake.latency:
+                time.sleep(fake.latency)
+
+            failure = fake.pop_failure()
+            if failure is not None:
+                status_code, headers = failure
+                self._send_json(status_code, {
+                    "error": {"code": status_code, "message": "Injected failure", "status": ERROR_STATUS.get(status_code, "UNKNOWN")}
+                }, headers)
+                return
+
+            text = fake.next_response_text()
+            if match.group("method") == "streamGenerateContent":
+                self._send_stream(request, text)
+            else:
+                self._send_json(200, _response(request, text))
+
+    def _send_stream(self, request: dict, text: str):
+        """
+        Sends the answer as server-sent events of `chunk_size` characters.
+        """
+        fake = self.server.fake
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        pieces = [text[i:i + fake.chunk_size] for i in range(0, len(text), fake.chunk_size)]
+        for i, piece in enumerate(pieces):
+            if i and fake.chunk_delay:
+                time.sleep(fake.chunk_delay)
+            event = f"data: {json.dumps(_response(request, piece, final=i == len(pieces) - 1))}\r\n\r\n"
+            data = event.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def _response(request: dict, text: str, final: bool = True) -> dict:
+    response = {
+        "candidates": [{
+            "content": {"role": "model", "parts": [{"text": text}]}
+        }],
+        "usageMetadata": {
+            "promptTokenCount": len(json.dumps(request)) // 4,
+            "candidatesTokenCount": len(text) // 4
+        }
+    }
+    if final:
+        response["candidates"][0]["finishReason"] = "STOP"
+
+    return response
+
+
+class FakeGeminiServer:
+    """
+    Threaded HTTP server speaking enough of the Gemini REST API for the SDK.
+    Binds on creation (port 0 picks a free port); usable as a context manager.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        response_text: str | None = None,
+        chunk_size: int = 64,
+        chunk_delay: float = 0.0
+    ):
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.response_text = response_text or json.dumps(sample_quiz())
+        self.requests = []
+        self.connections = 0
+        self.max_in_flight = 0
+
+        self._in_flight = 0
+        self._failures = []
+        self._responses = []
+        self._lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self
+        self.base_url = f"http://{host}:{self.httpd.server_port}"
+        self._thread = None
+
+    def fail_next(self, status_code: int, count: int = 1, retry_after: float | None = None) -> None:
+        """
+        Makes the next `count` requests fail with the given HTTP status.
+        """
+        headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+        with self._lock:
+            self._failures.extend([(status_code, headers)] * count)
+
+    def queue_response(self, text: str) -> None:
+        """
+        Answers the next request with `text`; later ones get response_text again.
+        """
+        with self._lock:
+            self._responses.append(text)
+
+    def next_response_text(self) -> str:
+        with self._lock:
+            return self._responses.pop(0) if self._responses else self.response_text
+
+    def pop_failure(self):
+        with self._lock:
+            return self._failures.pop(0) if self._failures else None
+
+    def record_connection(self) -> None:
+        with self._lock:
+            self.connections += 1
+
+    @contextmanager
+    def in_flight(self):
+        with self._lock:
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def start(self) -> "FakeGeminiServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self.httpd.serve_forever()
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,658 @@
+"""
+Background job runner for Quizly.
+Runs the AI pipeline (download -> transcribe -> generate -> save) in a local
+thread pool, so the createQuiz endpoint can answer immediately with a job id.
+Identical requests for a video that is already being processed share that
+run instead of starting another one (single flight).
+Every stage holds a slot of its own concurrency limit, so jobs submitted
+in batches are pipelined: one downloads while another is transcribed and
+a third is generating its quiz.
+Jobs wait in a bounded queue until the dispatcher (admission.py) starts
+them, within global and per-user limits and fairly across users.
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .admission import check_queue_capacity, claim_next_job, release_job, requeue_lost_jobs
+from .media import find_retained_audio, job_workspace
+from .metrics import stage_span
+from .models import ACTIVE_JOB_STATUSES, Quiz, QuizJob, QuizTemplate
+from .persistence import (
+    QUIZ_QUESTION_COUNT,
+    initial_question_data,
+    question_errors,
+    question_payloads,
+    save_questions
+)
+from .prompt_budget import build_quiz_prompt
+from .quiz_cache import find_template, get_or_generate_template, store_template
+from .quiz_repair import ensure_valid_quiz
+from .transcripts import get_cached_transcript, store_transcript
+from .transcription import SAMPLE_RATE, get_transcript_cache_name
+from .utils import (
+    extract_video_id,
+    download_audio,
+    stream_audio,
+    stream_quiz_json,
+    transcribe_audio,
+    warm_up
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+# ================= WORKER POOL =================
+
+_executor = None
+_batch_executor = None
+_executor_lock = threading.Lock()
+
+# Setting that limits how many jobs can be in each stage at the same time
+STAGE_CONCURRENCY_SETTINGS = {
+    "download": "QUIZ_DOWNLOAD_CONCURRENCY",
+    "transcribe": "QUIZ_TRANSCRIBE_CONCURRENCY",
+    "generate": "QUIZ_GENERATE_CONCURRENCY",
+}
+
+_stage_slots = {}
+_stage_slots_lock = threading.Lock()
+
+_dispatch_lock = threading.Lock()
+# Jobs handed to each pool (key: job.batch) and not finished yet
+_in_flight = {False: 0, True: 0}
+# Ids of those jobs, kept alive by the dispatcher's heartbeat
+_running_here = set()
+_ticker = None
+# Jobs this process may claim: None for any waiting job, or the ids of the
+# jobs it submitted itself (see dispatch_own_jobs_only)
+_dispatch_scope = None
+
+
+def _pool_size(batch: bool) -> int:
+    if batch:
+        return sum(getattr(settings, name) for name in STAGE_CONCURRENCY_SETTINGS.values())
+
+    return settings.QUIZ_JOB_WORKERS
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Returns the process-wide worker pool, creating it on first use.
+    """
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.QUIZ_JOB_WORKERS,
+                thread_name_prefix="quiz-job"
+            )
+
+    return _executor
+
+
+def get_batch_executor() -> ThreadPoolExecutor:
+    """
+    Returns the pool for batch jobs. It has one thread per stage slot, so
+    every stage can be busy at once; the slots, not the pool, set the limits.
+    """
+    global _batch_executor
+
+    with _executor_lock:
+        if _batch_executor is None:
+            _batch_executor = ThreadPoolExecutor(
+                max_workers=_pool_size(batch=True),
+                thread_name_prefix="quiz-batch"
+            )
+
+    return _batch_executor
+
+
+@contextmanager
+def stage_slot(stage: str):
+    """
+    Waits for a free slot of the stage (QUIZ_<STAGE>_CONCURRENCY) and holds
+    it while the stage runs. The limits are shared by all jobs in the process.
+    """
+    with _stage_slots_lock:
+        slot = _stage_slots.get(stage)
+        if slot is None:
+            slot = _stage_slots[stage] = threading.BoundedSemaphore(
+                getattr(settings, STAGE_CONCURRENCY_SETTINGS[stage])
+            )
+
+    with slot:
+        yield
+
+
+def reset_stage_slots() -> None:
+    """
+    Forgets the stage slots, so changed limits apply (tests).
+    """
+    with _stage_slots_lock:
+        _stage_slots.clear()
+
+
+def warm_up_workers() -> None:
+    """
+    Starts the worker pool and loads the models in it ahead of the first job.
+    Meant for worker process start-up (gunicorn post_fork, QUIZ_JOB_WARM_UP).
+    """
+    get_executor().submit(warm_up)
+
+
+def enqueue_quiz_job(job: QuizJob) -> None:
+    """
+    Puts a job in line for the pipeline: the dispatcher runs once the
+    surrounding transaction commits. With QUIZ_JOBS_EAGER enabled (tests,
+    debugging) the job runs inline instead.
+    """
+    if settings.QUIZ_JOBS_EAGER:
+        run_quiz_job(job.id)
+        return
+
+    with _dispatch_lock:
+        if _dispatch_scope is not None:
+            _dispatch_scope.add(job.id)
+
+    transaction.on_commit(dispatch_jobs)
+
+
+def dispatch_jobs() -> None:
+    """
+    Hands waiting jobs to the worker pools (batch jobs to the batch pool)
+    while the admission limits allow and the pool has an idle thread, so
+    claimed jobs start right away instead of queueing inside the executor.
+    Runs after every submission, whenever a job finishes (a freed slot
+    goes to the next job in line) and on the dispatcher timer.
+    """
+    with _dispatch_lock:
+        while True:
+            free = [batch for batch in (False, True) if _in_flight[batch] < _pool_size(batch)]
+            if not free:
+                return
+
+            job = claim_next_job(batch=free[0] if len(free) == 1 else None, job_ids=_dispatch_scope)
+            if job is None:
+                return
+
+            _in_flight[job.batch] += 1
+            _running_here.add(job.id)
+            executor = get_batch_executor() if job.batch else get_executor()
+
+            try:
+                executor.submit(_run_in_worker, job.id, job.batch)
+            except RuntimeError as e:
+                # The pool is shutting down (interpreter exit): hand the job back
+                _in_flight[job.batch] -= 1
+                _running_here.discard(job.id)
+                release_job(job.id)
+                logger.warning(f"Could not start job {job.id}, returned it to the queue: {e}")
+                return
+
+
+def dispatch_tick() -> None:
+    """
+    One round of the dispatcher timer: refreshes updated_at of the jobs
+    running in this process (heartbeat), requeues jobs whose process has
+    stopped sending heartbeats and starts waiting jobs.
+    """
+    with _dispatch_lock:
+        running_here = list(_running_here)
+
+    if running_here:
+        QuizJob.objects.filter(id__in=running_here, status__in=ACTIVE_JOB_STATUSES).update(updated_at=timezone.now())
+
+    requeued = requeue_lost_jobs()
+    if requeued:
+        logger.warning(f"Requeued {requeued} job(s) of lost worker processes")
+
+    dispatch_jobs()
+
+
+def _tick_forever(interval: int) -> None:
+    while True:
+        try:
+            dispatch_tick()
+        except Exception as e:
+            # e.g. the database is not reachable (yet); the next tick retries
+            logger.error(f"Dispatcher tick failed: {e}")
+        finally:
+            connection.close()
+
+        time.sleep(interval)
+
+
+def start_dispatcher() -> None:
+    """
+    Starts the dispatcher timer of this process (once), which runs
+    dispatch_tick every QUIZ_DISPATCH_INTERVAL_SECONDS, right away first.
+    Queued jobs thus start after a restart without waiting for a request.
+    Every process that runs jobs needs it for the heartbeat: the WSGI/ASGI
+    entry points and `manage.py create_quizzes` call it.
+    """
+    global _ticker
+
+    interval = settings.QUIZ_DISPATCH_INTERVAL_SECONDS
+    if interval <= 0 or settings.QUIZ_JOBS_EAGER:
+        return
+
+    with _dispatch_lock:
+        # A timer inherited through fork() is not running in this process
+        if _ticker is None or not _ticker.is_alive():
+            _ticker = threading.Thread(
+                target=_tick_forever,
+                args=(interval,),
+                name="quiz-dispatcher",
+                daemon=True
+            )
+            _ticker.start()
+
+
+def dispatch_own_jobs_only() -> None:
+    """
+    Limits the dispatcher of this process to the jobs it submits itself.
+    For short-lived processes (`manage.py create_quizzes`), which must not
+    take jobs of the API and abandon them when they exit.
+    """
+    global _dispatch_scope
+
+    with _dispatch_lock:
+        if _dispatch_scope is None:
+            _dispatch_scope = set()
+
+
+def reset_dispatcher() -> None:
+    """
+    Forgets the jobs handed to the pools and the dispatch scope (tests).
+    """
+    global _dispatch_scope
+
+    with _dispatch_lock:
+        _in_flight.update({False: 0, True: 0})
+        _running_here.clear()
+        _dispatch_scope = None
+
+
+def _run_in_worker(job_id: int, batch: bool = False) -> None:
+    """
+    Worker thread entry point. Starts the next waiting job and releases the
+    thread's DB connection afterwards.
+    """
+    try:
+        run_quiz_job(job_id)
+    finally:
+        with _dispatch_lock:
+            _in_flight[batch] -= 1
+            _running_here.discard(job_id)
+        dispatch_jobs()
+        connection.close()
+
+
+# ================= PIPELINE =================
+
+def _set_status(job: QuizJob, new_status: str) -> None:
+    job.status = new_status
+    job.save(update_fields=["status", "updated_at"])
+
+    # Followers report the leader's progress
+    job.followers.filter(status__in=ACTIVE_JOB_STATUSES).update(status=new_status, updated_at=timezone.now())
+
+
+def _save_quiz(job: QuizJob, template: QuizTemplate) -> Quiz:
+    """
+    Creates the user's quiz as a reference to the shared template.
+    """
+    return Quiz.objects.create(
+        title=template.title,
+        description=template.description,
+        video_url=job.video_url,
+        video_id=extract_video_id(job.video_url),
+        owner=job.owner,
+        template=template,
+        question_data=initial_question_data()
+    )
+
+
+def _audio_attributes(audio) -> dict:
+    """
+    Span attributes describing a downloaded file or decoded PCM array.
+    """
+    if isinstance(audio, str):
+        try:
+            return {"payload_bytes": os.path.getsize(audio)}
+        except OSError:
+            return {}
+
+    return {"payload_bytes": audio.nbytes, "audio_seconds": round(len(audio) / SAMPLE_RATE, 1)}
+
+
+def _transcribe_video(job: QuizJob, video_id: str, language: str | None) -> str:
+    """
+    Fetches the audio into the job's scratch workspace and transcribes it.
+    The workspace is removed afterwards, also when a stage fails.
+    """
+    with job_workspace(job.id) as workspace:
+        retained = find_retained_audio(video_id) if settings.MEDIA_KEEP_AUDIO else None
+
+        with stage_slot("download"), \
+                stage_span("download", job_id=job.id, mode=settings.AUDIO_INGEST_MODE) as span:
+            _set_status(job, QuizJob.Status.DOWNLOADING)
+            if retained is not None:
+                audio = retained
+                span.set(mode="retained")
+            elif settings.AUDIO_INGEST_MODE == "stream":
+                mmap_path = workspace.file("audio.f32") if settings.AUDIO_STREAM_BUFFER == "mmap" else None
+                audio = stream_audio(job.video_url, mmap_path=mmap_path)
+            else:
+                audio = download_audio(job.video_url, dest_dir=str(workspace.path))
+
+            span.set(**_audio_attributes(audio))
+
+        with stage_slot("transcribe"), \
+                stage_span("transcribe", job_id=job.id, **_audio_attributes(audio)) as span:
+            _set_status(job, QuizJob.Status.TRANSCRIBING)
+            transcript = transcribe_audio(audio, language=language)
+            span.set(transcript_chars=len(transcript))
+
+        if settings.MEDIA_KEEP_AUDIO and retained is None and isinstance(audio, str):
+            workspace.retain(audio, video_id)
+
+    job.media_bytes = workspace.bytes_written
+    job.save(update_fields=["media_bytes", "updated_at"])
+    return transcript
+
+
+def _get_transcript(job: QuizJob) -> str:
+    """
+    Returns the transcript for the job's video.
+    On a cache hit, yt-dlp and Whisper are skipped completely.
+    """
+    video_id = extract_video_id(job.video_url)
+    language = settings.WHISPER_LANGUAGE
+    model_name = get_transcript_cache_name()
+
+    transcript = get_cached_transcript(video_id, model_name, language)
+    if transcript is not None:
+        return transcript
+
+    transcript = _transcribe_video(job, video_id, language)
+
+    store_transcript(video_id, model_name, language, transcript)
+    return transcript
+
+
+def _streamed_quiz(job: QuizJob, header: dict) -> Quiz:
+    """
+    Returns the job's quiz, creating it when the first question arrives.
+    """
+    if job.quiz is None:
+        job.quiz = Quiz.objects.create(
+            title=header["title"] or "Generating quiz",
+            description=header["description"],
+            video_url=job.video_url,
+            video_id=extract_video_id(job.video_url),
+            owner=job.owner,
+            question_data=initial_question_data()
+        )
+        job.save(update_fields=["quiz", "updated_at"])
+
+    return job.quiz
+
+
+def _generate_streaming(job: QuizJob, transcript: str) -> Quiz:
+    """
+    Streams the quiz from Gemini and saves every valid question as soon as
+    it has been parsed, so clients following /api/jobs/{id}/events/ see the
+    first questions long before the whole response is complete.
+    Invalid or missing questions are repaired once the stream has ended.
+    The finished quiz is stored as a template for later cache hits.
+    """
+    prompt = build_quiz_prompt(transcript)
+
+    header = {"title": "", "description": ""}
+    questions = []
+    saved = set()
+
+    with stage_span("generate", job_id=job.id, transcript_chars=len(transcript), streaming=True):
+        try:
+            for event, value in stream_quiz_json(prompt):
+                if event != "question":
+                    header[event] = value
+                    continue
+
+                # Extra questions would be cut by ensure_valid_quiz, after being saved
+                if len(questions) >= QUIZ_QUESTION_COUNT:
+                    continue
+
+                if not question_errors(value):
+                    save_questions(_streamed_quiz(job, header), [value], positions=[len(questions)])
+                    saved.add(len(questions))
+                questions.append(value)
+
+        except ValueError as e:
+            # Truncated or malformed stream: repair what is missing below
+            logger.warning(f"Quiz stream for job {job.id} ended early: {e}")
+
+        quiz_data = ensure_valid_quiz({**header, "questions": questions}, prompt)
+
+    with stage_span("save", job_id=job.id, questions=len(quiz_data["questions"])):
+        quiz = _streamed_quiz(job, header)
+        remaining = [i for i in range(len(quiz_data["questions"])) if i not in saved]
+        save_questions(quiz, [quiz_data["questions"][i] for i in remaining], positions=remaining)
+
+        quiz.title = quiz_data["title"]
+        quiz.description = quiz_data.get("description", "")
+        quiz.save(update_fields=["title", "description", "updated_at"])
+        store_template(transcript, quiz_data)
+
+    return quiz
+
+
+def run_quiz_job(job_id: int) -> None:
+    """
+    Executes the full AI pipeline for a queued job, recording each stage.
+    Any failure marks the job as failed with a short error message.
+    """
+    job = QuizJob.objects.select_related("owner").get(id=job_id)
+
+    try:
+        transcript = _get_transcript(job)
+
+        with stage_slot("generate"):
+            _set_status(job, QuizJob.Status.GENERATING)
+            if settings.GEMINI_STREAMING and find_template(transcript) is None:
+                job.quiz = _generate_streaming(job, transcript)
+                template = None
+            else:
+                template = get_or_generate_template(transcript)
+
+        if template is not None:
+            _set_status(job, QuizJob.Status.SAVING)
+            with stage_span("save", job_id=job.id, questions=len(template.questions)):
+                job.quiz = _save_quiz(job, template)
+
+        job.status = QuizJob.Status.DONE
+        job.save(update_fields=["quiz", "status", "updated_at"])
+
+    except Exception as e:
+        logger.error(f"Quiz job {job_id} failed: {e}")
+
+        # Drop a partially streamed quiz
+        if job.quiz is not None:
+            job.quiz.delete()
+            job.quiz = None
+
+        job.status = QuizJob.Status.FAILED
+        job.error = str(e) or e.__class__.__name__
+        job.save(update_fields=["quiz", "status", "error", "updated_at"])
+
+    for follower_id in job.followers.filter(status__in=ACTIVE_JOB_STATUSES).values_list("id", flat=True):
+        _resolve_follower(follower_id, job)
+
+
+# ================= SINGLE FLIGHT =================
+
+class IdempotencyKeyReused(ValueError):
+    """
+    Raised when an Idempotency-Key is sent again with a different video.
+    """
+
+
+def _share_quiz(job: QuizJob, source: Quiz) -> Quiz:
+    """
+    Gives a follower its own quiz with the leader's questions: a reference
+    to the shared template, or a copy when the leader's quiz has its own.
+    """
+    if source.template_id is not None:
+        return _save_quiz(job, source.template)
+
+    questions = question_payloads(source)
+
+    with transaction.atomic():
+        quiz = Quiz.objects.create(
+            title=source.title,
+            description=source.description,
+            video_url=job.video_url,
+            video_id=extract_video_id(job.video_url),
+            owner=job.owner,
+            question_data=initial_question_data()
+        )
+        save_questions(quiz, questions)
+
+    return quiz
+
+
+def _resolve_follower(follower_id: int, leader: QuizJob) -> None:
+    """
+    Finishes a follower with its leader's result. The conditional UPDATE
+    claims the follower, so it is finished exactly once even if the leader
+    and a late-attaching request both try.
+    """
+    claimed = QuizJob.objects.filter(id=follower_id, status__in=ACTIVE_JOB_STATUSES).update(
+        status=QuizJob.Status.SAVING,
+        updated_at=timezone.now()
+    )
+    if not claimed:
+        return
+
+    follower = QuizJob.objects.select_related("owner").get(id=follower_id)
+
+    try:
+        if leader.status != QuizJob.Status.DONE or leader.quiz is None:
+            raise RuntimeError(leader.error or "Quiz generation failed")
+
+        follower.quiz = _share_quiz(follower, leader.quiz)
+        follower.status = QuizJob.Status.DONE
+    except Exception as e:
+        follower.status = QuizJob.Status.FAILED
+        follower.error = str(e) or e.__class__.__name__
+
+    follower.save(update_fields=["quiz", "status", "error", "updated_at"])
+
+
+def _active_leader(video_id: str) -> QuizJob | None:
+    """
+    Returns the job currently running the pipeline for the video. A leader
+    that was started but has not moved for QUIZ_JOB_STALE_SECONDS is assumed
+    lost with its worker; it is failed (with its followers) so new requests
+    start over.
+    """
+    leader = QuizJob.objects.filter(
+        video_id=video_id, leader__isnull=True, status__in=ACTIVE_JOB_STATUSES
+    ).first()
+
+    if leader is None:
+        return None
+
+    # Jobs still waiting for the dispatcher are in the queue, not lost
+    started = leader.started_at is not None or leader.status != QuizJob.Status.QUEUED
+    if started and leader.updated_at < timezone.now() - timedelta(seconds=settings.QUIZ_JOB_STALE_SECONDS):
+        leader.status = QuizJob.Status.FAILED
+        leader.error = "Worker lost"
+        leader.save(update_fields=["status", "error", "updated_at"])
+
+        for follower_id in leader.followers.filter(status__in=ACTIVE_JOB_STATUSES).values_list("id", flat=True):
+            _resolve_follower(follower_id, leader)
+        return None
+
+    return leader
+
+
+def submit_quiz_job(owner, video_url: str, idempotency_key: str = "", batch: bool = False) -> tuple:
+    """
+    Creates (or finds) the job for a quiz request, with single-flight
+    coalescing per video:
+    - a repeated Idempotency-Key returns the job created for it;
+    - without a key, the user's own running job for the video is returned
+      (double submits);
+    - otherwise, if another job is already running the pipeline for the
+      video, the new job follows it and shares its result; if not, the new
+      job becomes the leader and is enqueued (to the batch pool for batches).
+
+    Raises QueueFull (admission.py) when a new leader would not fit into
+    the queue.
+
+    Returns:
+        tuple: (job, created)
+    """
+    if idempotency_key:
+        existing = QuizJob.objects.filter(owner=owner, idempotency_key=idempotency_key).first()
+        if existing is not None:
+            if existing.video_url != video_url:
+                raise IdempotencyKeyReused("Idempotency-Key was already used for another video")
+            return existing, False
+
+    video_id = extract_video_id(video_url)
+
+    if not idempotency_key:
+        running = QuizJob.objects.filter(
+            owner=owner, video_id=video_id, status__in=ACTIVE_JOB_STATUSES
+        ).order_by("-id").first()
+        if running is not None:
+            return running, False
+
+    for _attempt in range(3):
+        leader = _active_leader(video_id)
+        if leader is None:
+            check_queue_capacity()
+
+        try:
+            with transaction.atomic():
+                job = QuizJob.objects.create(
+                    owner=owner,
+                    video_url=video_url,
+                    video_id=video_id,
+                    idempotency_key=idempotency_key,
+                    leader=leader,
+                    batch=batch
+                )
+            break
+        except IntegrityError:
+            # Lost the race: another request became the leader, or sent the same key
+            if idempotency_key:
+                existing = QuizJob.objects.filter(owner=owner, idempotency_key=idempotency_key).first()
+                if existing is not None:
+                    return existing, False
+    else:
+        raise RuntimeError("Could not register the quiz job")
+
+    if leader is None:
+        enqueue_quiz_job(job)
+    else:
+        # The leader may have finished between the lookup and the insert
+        leader.refresh_from_db()
+        if not leader.is_active:
+            _resolve_follower(job.id, leader)
+
+    return job, True
@@ -0,0 +1,126 @@
+"""
+Incremental parser for quiz JSON streamed by Gemini.
+Text chunks are fed in as they arrive; the parser tracks strings, escapes
+and nesting so it can report the quiz title and description and every
+question object as soon as its closing brace has been received, long
+before the whole payload is complete. Markdown fences around the JSON
+are ignored.
+"""
+import json
+
+
+class QuizStreamParser:
+    """
+    Feeds on chunks of a quiz payload ({"title", "description", "questions": [...]})
+    and returns (event, value) pairs:
+        ("title", str), ("description", str), ("question", dict)
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._started = False
+        self._finished = False
+        self._start = 0
+        self._end = 0
+
+        # One entry per open container: [kind, expecting_key, current_key]
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._questions_depth = None
+        self._question_start = None
+
+    def feed(self, chunk: str) -> list:
+        self.buffer += chunk
+        events = []
+
+        while self._pos < len(self.buffer) and not self._finished:
+            char = self.buffer[self._pos]
+
+            if not self._started:
+                # Skip markdown fences / text before the JSON object
+                if char == "{":
+                    self._started = True
+                    self._start = self._pos
+                    self._stack.append(["{", True, None])
+                self._pos += 1
+                continue
+
+            if self._in_string:
+                self._consume_string_char(char, events)
+            else:
+                self._consume_char(char, events)
+
+            self._pos += 1
+
+        return events
+
+    def _consume_string_char(self, char: str, events: list) -> None:
+        if self._escape:
+            self._escape = False
+        elif char == "\\":
+            self._escape = True
+        elif char == '"':
+            self._in_string = False
+            self._on_string(json.loads(self.buffer[self._string_start:self._pos + 1]), events)
+
+    def _on_string(self, value: str, events: list) -> None:
+        frame = self._stack[-1]
+
+        if frame[0] == "{" and frame[1]:
+            # Object key; the value follows after ':'
+            frame[2] = value
+            frame[1] = False
+        elif len(self._stack) == 1 and frame[2] in ("title", "description"):
+            events.append((frame[2], value))
+
+    def _consume_char(self, char: str, events: list) -> None:
+        if char == '"':
+            self._in_string = True
+            self._string_start = self._pos
+
+        elif char in "{[":
+            parent = self._stack[-1]
+            if (
+                char == "["
+                and len(self._stack) == 1
+                and parent[2] == "questions"
+            ):
+                self._questions_depth = len(self._stack) + 1
+            elif char == "{" and len(self._stack) == self._questions_depth:
+                self._question_start = self._pos
+
+            self._stack.append([char, char == "{", None])
+
+        elif char in "}]":
+            self._stack.pop()
+
+            if char == "}" and len(self._stack) == self._questions_depth and self._question_start is not None:
+                question = json.loads(self.buffer[self._question_start:self._pos + 1])
+                self._question_start = None
+                events.append(("question", question))
+            elif not self._stack:
+                self._finished = True
+                self._end = self._pos + 1
+
+        elif char == "," and self._stack[-1][0] == "{":
+            self._stack[-1][1] = True
+
+    @property
+    def finished(self) -> bool:
+        """
+        True once the top-level object has been closed.
+        """
+        return self._finished
+
+    def result(self) -> dict:
+        """
+        Parses the complete payload once the stream has ended.
+        Raises ValueError if the JSON object was never closed.
+        """
+        if not self._finished:
+            raise ValueError("Quiz JSON stream ended before the payload was complete")
+
+        return json.loads(self.buffer[self._start:self._end])
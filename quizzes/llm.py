@@ -0,0 +1,219 @@
+"""
+Shared LLM client layer for Quizly.
+One Gemini client per process, backed by a pooled keep-alive HTTP connection
+pool, with a cap on concurrent requests, request timeouts and retries with
+jittered exponential backoff on rate limits (429), server errors (5xx) and
+network failures.
+
+Every setting is read from Django settings (GEMINI_*), and GEMINI_BASE_URL
+points the client at another endpoint such as the local fake server in
+quizzes/fake_gemini.py, which tests and benchmarks use.
+"""
+import os
+import time
+import random
+import logging
+import threading
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(RuntimeError):
+    """
+    Raised when Gemini could not be reached or kept failing after all retries.
+    """
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    "Full jitter" backoff: a random delay between 0 and base * 2^attempt
+    (capped), so many workers retrying at once do not hit the API in lockstep.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _retry_after(error) -> float | None:
+    """
+    Returns the Retry-After header of a failed response in seconds, if present.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class GeminiClient:
+    """
+    Thread-safe wrapper around google-genai's Client.
+
+    The underlying httpx pool keeps up to `max_connections` connections alive
+    for `keepalive_seconds`, so consecutive calls skip the TCP/TLS handshake.
+    At most `max_concurrency` requests are in flight at once; further callers
+    wait for a free slot.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "",
+        timeout: float = 120,
+        max_concurrency: int = 4,
+        max_connections: int = 10,
+        keepalive_seconds: float = 30,
+        max_retries: int = 4,
+        retry_base_delay: float = 1.0,
+        retry_max_delay: float = 30.0
+    ):
+        import httpx
+        from google import genai
+        from google.genai import types
+
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+        http_options = types.HttpOptions(
+            base_url=base_url or None,
+            # milliseconds
+            timeout=int(timeout * 1000),
+            client_args={
+                "limits": httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                    keepalive_expiry=keepalive_seconds
+                )
+            }
+        )
+        self.client = genai.Client(api_key=api_key, http_options=http_options)
+
+    def _is_retryable(self, error: Exception) -> bool:
+        import httpx
+        from google.genai import errors
+
+        if isinstance(error, errors.APIError):
+            return error.code in RETRYABLE_STATUS_CODES
+
+        return isinstance(error, httpx.TransportError)
+
+    def _call(self, func, *args, **kwargs):
+        """
+        Runs one API call inside a concurrency slot, retrying transient failures.
+        """
+        def call():
+            with self._slots:
+                return func(*args, **kwargs)
+
+        return self._retry(call)
+
+    def _retry(self, call):
+        attempt = 0
+
+        while True:
+            try:
+                return call()
+
+            except Exception as e:
+                if not self._is_retryable(e):
+                    raise
+                if attempt >= self.max_retries:
+                    raise LLMError(f"Gemini request failed after {attempt + 1} attempts: {e}") from e
+
+                delay = backoff_delay(attempt, self.retry_base_delay, self.retry_max_delay)
+                # Never retry sooner than the server asked us to
+                delay = max(delay, min(_retry_after(e) or 0, self.retry_max_delay))
+
+                logger.warning(f"Gemini request failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def generate_content(self, model: str, contents, config=None):
+        return self._call(self.client.models.generate_content, model=model, contents=contents, config=config)
+
+    def generate_content_stream(self, model: str, contents, config=None):
+        """
+        Yields response chunks as Gemini produces them. Failures before the
+        first chunk are retried like generate_content; once text has been
+        handed out, a retry would repeat it, so later errors are raised.
+        The concurrency slot is held until the stream is exhausted or closed.
+        """
+        def open_stream():
+            self._slots.acquire()
+            try:
+                chunks = self.client.models.generate_content_stream(model=model, contents=contents, config=config)
+                return chunks, next(chunks, None)
+            except BaseException:
+                self._slots.release()
+                raise
+
+        chunks, first = self._retry(open_stream)
+
+        try:
+            if first is not None:
+                yield first
+            yield from chunks
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def build_gemini_client(**overrides) -> GeminiClient:
+    """
+    Creates a client from the GEMINI_* settings; keyword arguments override them.
+    """
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("Missing GEMINI_API_KEY in environment variables")
+
+    options = {
+        "base_url": settings.GEMINI_BASE_URL,
+        "timeout": settings.GEMINI_TIMEOUT_SECONDS,
+        "max_concurrency": settings.GEMINI_MAX_CONCURRENCY,
+        "max_connections": settings.GEMINI_MAX_CONNECTIONS,
+        "keepalive_seconds": settings.GEMINI_KEEPALIVE_SECONDS,
+        "max_retries": settings.GEMINI_MAX_RETRIES,
+        "retry_base_delay": settings.GEMINI_RETRY_BASE_DELAY,
+        "retry_max_delay": settings.GEMINI_RETRY_MAX_DELAY,
+    }
+    options.update(overrides)
+
+    return GeminiClient(api_key, **options)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_gemini_client() -> GeminiClient:
+    """
+    Returns the process-wide Gemini client, creating it on first use.
+    """
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = build_gemini_client()
+
+    return _client
+
+
+def reset_gemini_client() -> None:
+    """
+    Closes and forgets the process-wide client (after settings changes, in tests).
+    """
+    global _client
+
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
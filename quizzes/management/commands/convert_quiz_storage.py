@@ -0,0 +1,46 @@
+"""
+Management command that moves quizzes between question rows and JSON storage.
+"""
+from django.core.management.base import BaseCommand
+
+from quizzes.models import Quiz
+from quizzes.persistence import convert_to_json, convert_to_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Converts existing quizzes to the given question storage "
+        "(set QUIZ_QUESTION_STORAGE to match for new quizzes)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--to",
+            choices=["json", "rows"],
+            required=True,
+            help="Target storage: one JSON column per quiz, or Question/QuestionOption rows."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Quizzes converted per transaction."
+        )
+
+    def handle(self, *args, **options):
+        to_json = options["to"] == "json"
+        convert = convert_to_json if to_json else convert_to_rows
+        batch_size = options["batch_size"]
+
+        ids = list(
+            Quiz.objects.filter(question_data__isnull=to_json).order_by("id").values_list("id", flat=True)
+        )
+        converted = 0
+
+        for start in range(0, len(ids), batch_size):
+            converted += convert(Quiz.objects.filter(id__in=ids[start:start + batch_size]))
+            self.stdout.write(f"{converted}/{len(ids)}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Converted {converted} quiz(zes) to {options['to']} storage."
+        ))
@@ -0,0 +1,76 @@
+"""
+Management command that generates quizzes for many videos or playlists.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from quizzes.admission import QueueFull
+from quizzes.batch import BatchTooLarge, submit_quiz_batch
+from quizzes.jobs import dispatch_own_jobs_only, start_dispatcher
+from quizzes.models import ACTIVE_JOB_STATUSES, QuizJob
+
+
+class Command(BaseCommand):
+    help = "Creates quizzes for a batch of YouTube URLs and/or playlists and waits for them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("urls", nargs="*", help="YouTube video URLs.")
+        parser.add_argument(
+            "--playlist",
+            action="append",
+            default=[],
+            help="YouTube playlist URL (can be repeated)."
+        )
+        parser.add_argument("--user", required=True, help="Username that will own the quizzes.")
+        parser.add_argument(
+            "--poll-seconds",
+            type=float,
+            default=2.0,
+            help="How often job progress is checked."
+        )
+
+    def handle(self, *args, **options):
+        if not options["urls"] and not options["playlist"]:
+            raise CommandError("Pass at least one URL or --playlist.")
+
+        try:
+            owner = get_user_model().objects.get(username=options["user"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Unknown user {options['user']!r}")
+
+        # Run only this batch here (API jobs stay with the web processes),
+        # with a heartbeat for them, see start_dispatcher
+        dispatch_own_jobs_only()
+        start_dispatcher()
+
+        try:
+            items = submit_quiz_batch(owner, options["urls"], options["playlist"])
+        except (BatchTooLarge, QueueFull) as e:
+            raise CommandError(str(e))
+
+        for item in items:
+            job = f"job {item['job'].id}" if item["job"] is not None else item["error"]
+            self.stdout.write(f"{item['result']:<9} {item['url']}  {job}")
+
+        # The jobs run in this process's worker pool: wait until all are finished
+        job_ids = {item["job"].id for item in items if item["job"] is not None}
+        last_statuses = {}
+
+        while True:
+            statuses = dict(QuizJob.objects.filter(id__in=job_ids).values_list("id", "status"))
+
+            for job_id, job_status in sorted(statuses.items()):
+                if last_statuses.get(job_id) != job_status:
+                    self.stdout.write(f"job {job_id}: {job_status}")
+            last_statuses = statuses
+
+            if not any(job_status in ACTIVE_JOB_STATUSES for job_status in statuses.values()):
+                break
+            time.sleep(options["poll_seconds"])
+
+        done = sum(job_status == QuizJob.Status.DONE for job_status in statuses.values())
+        failed = len(statuses) - done
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style(f"{done} quizzes created, {failed} failed."))
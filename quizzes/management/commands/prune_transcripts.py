@@ -0,0 +1,35 @@
+"""
+Management command that evicts old and least recently used cached transcripts.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from quizzes.transcripts import prune_transcripts
+
+
+class Command(BaseCommand):
+    help = "Evicts cached transcripts by age and total cache size."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-age-days",
+            type=int,
+            default=settings.TRANSCRIPT_CACHE_MAX_AGE_DAYS,
+            help="Remove transcripts older than this many days."
+        )
+        parser.add_argument(
+            "--max-mb",
+            type=int,
+            default=settings.TRANSCRIPT_CACHE_MAX_BYTES // (1024 * 1024),
+            help="Evict least recently used transcripts until the cache fits."
+        )
+
+    def handle(self, *args, **options):
+        removed, freed = prune_transcripts(
+            max_age_days=options["max_age_days"],
+            max_bytes=options["max_mb"] * 1024 * 1024
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed {removed} transcript(s), freed {freed} bytes."
+        ))
@@ -0,0 +1,28 @@
+"""
+Management command that runs the local fake Gemini server.
+"""
+from django.core.management.base import BaseCommand
+
+from quizzes.fake_gemini import FakeGeminiServer
+
+
+class Command(BaseCommand):
+    help = "Runs a local fake of the Gemini API for development and benchmarks (set GEMINI_BASE_URL to its URL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--port", type=int, default=8765, help="Port to listen on.")
+        parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each answer.")
+
+    def handle(self, *args, **options):
+        server = FakeGeminiServer(port=options["port"], latency=options["latency"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Fake Gemini server listening on {server.base_url}"
+        ))
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.httpd.server_close()
@@ -0,0 +1,42 @@
+"""
+Management command that runs the shared transcription server.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from quizzes.transcription_server import TranscriptionServer
+
+
+class Command(BaseCommand):
+    help = "Runs a long-lived process that owns the transcription model and serves workers over a local socket."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--address",
+            default=settings.TRANSCRIPTION_SERVER_ADDRESS,
+            help="Unix socket path (or Windows pipe name) to listen on."
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.TRANSCRIPTION_SERVER_CONCURRENCY,
+            help="How many transcriptions may run at the same time."
+        )
+
+    def handle(self, *args, **options):
+        if not options["address"]:
+            raise CommandError("Set TRANSCRIPTION_SERVER_ADDRESS or pass --address")
+
+        server = TranscriptionServer(options["address"], concurrency=options["concurrency"])
+        server.start()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Transcription server listening on {options['address']}"
+        ))
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
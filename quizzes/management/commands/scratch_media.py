@@ -0,0 +1,39 @@
+"""
+Management command that reports and reclaims pipeline media scratch space.
+"""
+from django.core.management.base import BaseCommand
+
+from quizzes.media import disk_usage, reclaim
+
+
+class Command(BaseCommand):
+    help = "Reports disk usage of pipeline media and optionally reclaims space."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reclaim",
+            action="store_true",
+            help="Remove stale job directories and evict retained audio above the quota."
+        )
+        parser.add_argument(
+            "--max-mb",
+            type=int,
+            default=None,
+            help="Quota to evict down to (defaults to MEDIA_SCRATCH_MAX_MB)."
+        )
+        parser.add_argument(
+            "--drop-retained",
+            action="store_true",
+            help="Remove all retained audio."
+        )
+
+    def handle(self, *args, **options):
+        if options["reclaim"] or options["drop_retained"]:
+            max_bytes = options["max_mb"] * 1024 * 1024 if options["max_mb"] is not None else None
+            freed = reclaim(max_bytes=max_bytes, drop_retained=options["drop_retained"])
+            self.stdout.write(self.style.SUCCESS(f"Freed {freed} bytes."))
+
+        usage = disk_usage()
+        self.stdout.write(f"Running jobs:   {usage['jobs']} bytes")
+        self.stdout.write(f"Retained audio: {usage['retained']} bytes ({usage['retained_videos']} videos)")
+        self.stdout.write(f"Quota:          {usage['quota']} bytes")
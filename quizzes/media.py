@@ -0,0 +1,190 @@
+"""
+Scratch space for pipeline media (downloaded audio, decoded PCM).
+Every job works in its own directory under MEDIA_SCRATCH_DIR, which is
+removed when the job finishes, whether it succeeded or failed. Optionally,
+downloaded audio is retained per video for re-transcription, within a
+global disk quota enforced by least-recently-used eviction.
+"""
+import os
+import time
+import shutil
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = "jobs"
+RETAINED_DIR = "retained"
+
+
+def _root() -> Path:
+    return Path(settings.MEDIA_SCRATCH_DIR)
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for dirpath, _dirnames, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+# ========== Per-job workspace ==========
+
+class Workspace:
+    """
+    A job's scratch directory. bytes_written is filled in when the job is done.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.bytes_written = 0
+        self._retained_bytes = 0
+
+    def file(self, name: str) -> str:
+        return str(self.path / name)
+
+    def retain(self, file_path: str, video_id: str) -> str:
+        """
+        Moves a downloaded audio file to the retained area, keyed by video ID.
+        """
+        target_dir = _root() / RETAINED_DIR / video_id
+        if target_dir.exists():
+            shutil.rmtree(target_dir, ignore_errors=True)
+        target_dir.mkdir(parents=True, exist_ok=True)
+
+        target = target_dir / os.path.basename(file_path)
+        self._retained_bytes += os.path.getsize(file_path)
+        shutil.move(file_path, target)
+        return str(target)
+
+
+@contextmanager
+def job_workspace(job_id: int):
+    """
+    Creates a scratch directory for one job and always removes it afterwards.
+    Enforces the disk quota once the job's files are gone.
+    """
+    path = _root() / JOBS_DIR / f"job-{job_id}"
+    path.mkdir(parents=True, exist_ok=True)
+    workspace = Workspace(path)
+
+    try:
+        yield workspace
+    finally:
+        workspace.bytes_written = _dir_size(path) + workspace._retained_bytes
+        shutil.rmtree(path, ignore_errors=True)
+        enforce_quota()
+
+
+# ========== Retained audio ==========
+
+def find_retained_audio(video_id: str) -> str | None:
+    """
+    Returns a retained audio file for the video, marking it as recently used.
+    """
+    target_dir = _root() / RETAINED_DIR / video_id
+
+    try:
+        name = next(iter(os.listdir(target_dir)))
+    except (OSError, StopIteration):
+        return None
+
+    # mtime is the LRU clock
+    os.utime(target_dir)
+    return str(target_dir / name)
+
+
+def _retained_entries() -> list:
+    """
+    Returns (mtime, size, path) for every retained video, oldest first.
+    """
+    retained = _root() / RETAINED_DIR
+    if not retained.exists():
+        return []
+
+    entries = [
+        (entry.stat().st_mtime, _dir_size(entry), entry)
+        for entry in retained.iterdir()
+        if entry.is_dir()
+    ]
+    return sorted(entries)
+
+
+def enforce_quota(max_bytes: int | None = None) -> int:
+    """
+    Evicts least recently used retained audio until the whole scratch area
+    fits into max_bytes. Directories of running jobs are never touched.
+
+    Returns:
+        int: Number of freed bytes.
+    """
+    if max_bytes is None:
+        max_bytes = settings.MEDIA_SCRATCH_MAX_BYTES
+
+    root = _root()
+    if not root.exists():
+        return 0
+
+    total = _dir_size(root)
+    freed = 0
+
+    for _mtime, size, path in _retained_entries():
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        freed += size
+
+    if total > max_bytes:
+        logger.warning(f"Media scratch area still uses {total} bytes (quota {max_bytes})")
+
+    return freed
+
+
+# ========== Reporting / reclaiming ==========
+
+def disk_usage() -> dict:
+    """
+    Returns bytes used by running job workspaces and by retained audio.
+    """
+    root = _root()
+    return {
+        "jobs": _dir_size(root / JOBS_DIR),
+        "retained": _dir_size(root / RETAINED_DIR),
+        "retained_videos": len(_retained_entries()),
+        "quota": settings.MEDIA_SCRATCH_MAX_BYTES,
+    }
+
+
+def reclaim(max_bytes: int | None = None, stale_after_seconds: int = 24 * 3600, drop_retained: bool = False) -> int:
+    """
+    Removes job workspaces left behind by crashed workers (older than
+    stale_after_seconds) and enforces the quota, or drops all retained audio.
+
+    Returns:
+        int: Number of freed bytes.
+    """
+    root = _root()
+    freed = 0
+
+    jobs_dir = root / JOBS_DIR
+    if jobs_dir.exists():
+        cutoff = time.time() - stale_after_seconds
+        for path in jobs_dir.iterdir():
+            if path.stat().st_mtime < cutoff:
+                freed += _dir_size(path)
+                shutil.rmtree(path, ignore_errors=True)
+
+    if drop_retained:
+        freed += _dir_size(root / RETAINED_DIR)
+        shutil.rmtree(root / RETAINED_DIR, ignore_errors=True)
+
+    return freed + enforce_quota(max_bytes)
@@ -0,0 +1,189 @@
+"""
+Pipeline instrumentation for Quizly.
+Stages of the AI pipeline (download, transcribe, build_prompt, generate,
+save) run inside timing spans. Every span updates in-process histograms,
+exported in the Prometheus text format at /api/metrics/, and writes one
+structured (JSON) log line, so no external metrics service is needed.
+
+Histograms live in process memory: each web/worker process exposes its own.
+"""
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000, 1_000_000_000)
+AUDIO_BUCKETS = (30, 60, 300, 600, 1200, 1800, 3600, 7200)
+
+
+# ========== Histograms ==========
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with labels, safe to update from many threads.
+    """
+
+    def __init__(self, name: str, help_text: str, buckets: tuple, label_names: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def _labels(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{value}"' for name, value in zip(self.label_names, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                bounds = [*self.buckets, "+Inf"]
+                counts = [*series["buckets"], series["count"]]
+                for bound, count in zip(bounds, counts):
+                    labels = self._labels(key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_sum{self._labels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{self._labels(key)} {series['count']}")
+
+        return lines
+
+
+STAGE_DURATION = Histogram(
+    "quizly_stage_duration_seconds",
+    "Duration of pipeline stages.",
+    DURATION_BUCKETS,
+    ("stage", "outcome")
+)
+
+# Numeric span attributes that are exported as histograms (labelled by stage)
+ATTRIBUTE_HISTOGRAMS = {
+    "audio_seconds": Histogram(
+        "quizly_audio_duration_seconds", "Duration of processed audio.", AUDIO_BUCKETS, ("stage",)
+    ),
+    "payload_bytes": Histogram(
+        "quizly_payload_bytes", "Size of media and JSON payloads handled by a stage.", SIZE_BUCKETS, ("stage",)
+    ),
+    "transcript_chars": Histogram(
+        "quizly_transcript_chars", "Length of transcripts and prompts in characters.", SIZE_BUCKETS, ("stage",)
+    ),
+    "transcript_tokens": Histogram(
+        "quizly_transcript_tokens", "Estimated transcript tokens before prompt budgeting.", SIZE_BUCKETS, ("stage",)
+    ),
+    "prompt_tokens": Histogram(
+        "quizly_gemini_prompt_tokens", "Prompt tokens reported by Gemini.", SIZE_BUCKETS, ("stage",)
+    ),
+    "output_tokens": Histogram(
+        "quizly_gemini_output_tokens", "Output tokens reported by Gemini.", SIZE_BUCKETS, ("stage",)
+    ),
+}
+
+REGISTRY = [STAGE_DURATION, *ATTRIBUTE_HISTOGRAMS.values()]
+
+
+def render_metrics() -> str:
+    """
+    Returns all histograms in the Prometheus text exposition format.
+    """
+    lines = []
+    for histogram in REGISTRY:
+        lines.extend(histogram.render())
+
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics() -> None:
+    for histogram in REGISTRY:
+        histogram.reset()
+
+
+# ========== Spans ==========
+
+_local = threading.local()
+
+
+class Span:
+    """
+    One timed pipeline stage. Attributes can be added while it runs.
+    """
+
+    def __init__(self, stage: str, attributes: dict):
+        self.stage = stage
+        self.attributes = dict(attributes)
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+
+@contextmanager
+def stage_span(stage: str, **attributes):
+    """
+    Times a pipeline stage, records its histograms and logs one JSON line.
+    Exceptions are recorded as outcome "error" and re-raised.
+    """
+    span = Span(stage, attributes)
+    stack = _local.__dict__.setdefault("stack", [])
+    stack.append(span)
+
+    outcome = "ok"
+    start = time.perf_counter()
+
+    try:
+        yield span
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        stack.pop()
+
+        STAGE_DURATION.observe(duration, stage=stage, outcome=outcome)
+        for name, value in span.attributes.items():
+            histogram = ATTRIBUTE_HISTOGRAMS.get(name)
+            if histogram is not None and isinstance(value, (int, float)):
+                histogram.observe(value, stage=stage)
+
+        logger.info(json.dumps({
+            "event": "pipeline_stage",
+            "stage": stage,
+            "outcome": outcome,
+            "duration_ms": round(duration * 1000, 1),
+            **span.attributes
+        }, default=str))
+
+
+def annotate(**attributes) -> None:
+    """
+    Adds attributes to the innermost running span, if any. Lets helpers deep
+    in the pipeline (e.g. the Gemini call) report token counts.
+    """
+    stack = getattr(_local, "stack", None)
+    if stack:
+        stack[-1].set(**attributes)
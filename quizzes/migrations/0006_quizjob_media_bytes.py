@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0005_quiz_owner_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizjob',
+            name='media_bytes',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0.1 on 2026-10-18 19:42
+
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_video_ids(apps, schema_editor):
+    """
+    Fills video_id for finished jobs. Jobs still marked as running keep an
+    empty id, so rows left behind by crashed workers cannot clash with the
+    single-flight constraint.
+    """
+    QuizJob = apps.get_model("quizzes", "QuizJob")
+    finished = QuizJob.objects.filter(status__in=["done", "failed"], video_id="")
+
+    for job in finished.iterator():
+        match = re.search(r"(?:v=|youtu\.be/)([\w-]{11})", job.video_url)
+        if match:
+            job.video_id = match.group(1)
+            job.save(update_fields=["video_id"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0006_quizjob_media_bytes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizjob',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='quizjob',
+            name='leader',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='followers', to='quizzes.quizjob'),
+        ),
+        migrations.AddField(
+            model_name='quizjob',
+            name='video_id',
+            field=models.CharField(blank=True, db_index=True, max_length=11),
+        ),
+        migrations.RunPython(backfill_video_ids, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='quizjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('leader__isnull', True), ('status__in', ['queued', 'downloading', 'transcribing', 'generating', 'saving']), models.Q(('video_id', ''), _negated=True)), fields=('video_id',), name='unique_active_job_per_video'),
+        ),
+        migrations.AddConstraint(
+            model_name='quizjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('idempotency_key', ''), _negated=True), fields=('owner', 'idempotency_key'), name='unique_job_idempotency_key'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-18 19:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0007_quizjob_single_flight'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizjob',
+            name='batch',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='quizjob',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='quizjob',
+            index=models.Index(fields=['status', 'started_at'], name='quizjob_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,125 @@
+# Generated by Django 6.0.1 on 2026-10-18 19:59
+
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+BATCH_SIZE = 2000
+
+
+def backfill_video_ids(apps, schema_editor):
+    """
+    Fills Quiz.video_id from the stored video URLs.
+    """
+    Quiz = apps.get_model("quizzes", "Quiz")
+    batch = []
+
+    for quiz in Quiz.objects.filter(video_id="").only("id", "video_url").iterator(chunk_size=BATCH_SIZE):
+        match = re.search(r"(?:v=|youtu\.be/)([\w-]{11})", quiz.video_url)
+        if match:
+            quiz.video_id = match.group(1)
+            batch.append(quiz)
+
+        if len(batch) >= BATCH_SIZE:
+            Quiz.objects.bulk_update(batch, ["video_id"])
+            batch = []
+
+    Quiz.objects.bulk_update(batch, ["video_id"])
+
+
+def _number_rows(model, parent: str) -> None:
+    """
+    Numbers the rows of every parent 0, 1, 2, ... in id (= insertion) order.
+    Rows at position 0 already have the default and are not written.
+    """
+    batch = []
+    last_parent = None
+    position = 0
+
+    rows = model.objects.order_by(parent, "id").only("id", parent).iterator(chunk_size=BATCH_SIZE)
+    for row in rows:
+        parent_id = getattr(row, parent)
+        position = position + 1 if parent_id == last_parent else 0
+        last_parent = parent_id
+
+        if position:
+            row.position = position
+            batch.append(row)
+
+        if len(batch) >= BATCH_SIZE:
+            model.objects.bulk_update(batch, ["position"])
+            batch = []
+
+    model.objects.bulk_update(batch, ["position"])
+
+
+def backfill_positions(apps, schema_editor):
+    _number_rows(apps.get_model("quizzes", "Question"), "quiz_id")
+    _number_rows(apps.get_model("quizzes", "QuestionOption"), "question_id")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0008_quizjob_admission'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='position',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='questionoption',
+            name='position',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='video_id',
+            field=models.CharField(blank=True, max_length=11),
+        ),
+        migrations.RunPython(backfill_video_ids, migrations.RunPython.noop),
+        migrations.RunPython(backfill_positions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['video_id', 'owner'], name='quiz_video_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='question',
+            constraint=models.UniqueConstraint(fields=('quiz', 'position'), name='unique_question_position'),
+        ),
+        migrations.AddConstraint(
+            model_name='questionoption',
+            constraint=models.UniqueConstraint(fields=('question', 'position'), name='unique_option_position'),
+        ),
+        # The composite indexes cover lookups by owner / parent
+        migrations.AlterField(
+            model_name='quiz',
+            name='owner',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='quiz',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='questions', to='quizzes.quiz'),
+        ),
+        migrations.AlterField(
+            model_name='questionoption',
+            name='question',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='question_options', to='quizzes.question'),
+        ),
+        migrations.AlterModelOptions(
+            name='question',
+            options={'ordering': ['position']},
+        ),
+        migrations.AlterModelOptions(
+            name='questionoption',
+            options={'ordering': ['position']},
+        ),
+    ]
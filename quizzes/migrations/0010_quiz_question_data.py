@@ -0,0 +1,37 @@
+# Generated by Django 6.0.1 on 2026-10-18 20:07
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_question_counts(apps, schema_editor):
+    """
+    Counts the existing question rows of every quiz in one UPDATE.
+    """
+    Quiz = apps.get_model("quizzes", "Quiz")
+    Question = apps.get_model("quizzes", "Question")
+
+    rows = Question.objects.filter(quiz=OuterRef("pk")).order_by().values("quiz").annotate(n=Count("id")).values("n")
+    Quiz.objects.update(question_count=Coalesce(Subquery(rows), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0009_quiz_schema_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='question_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='question_data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_question_counts, migrations.RunPython.noop),
+    ]
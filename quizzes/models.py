@@ -1,21 +1,70 @@
 """
 Models for the Quizly application.
-Defines the structure for Quizzes, Questions, and their respective Options.
+Defines the structure for Quizzes, Questions, and their respective Options,
+plus shared quiz templates and the bookkeeping for generation jobs and
+cached transcripts.
 """
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+class QuizTemplate(models.Model):
+    """
+    Shared, immutable quiz as generated by Gemini for one transcript.
+    Identified by a hash of transcript, prompt version and model name,
+    so identical generations are stored (and paid for) only once.
+    """
+    content_hash = models.CharField(max_length=64, unique=True)
+    prompt_version = models.CharField(max_length=20)
+    model_name = models.CharField(max_length=50)
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    questions = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.title
+
 
 class Quiz(models.Model):
     """
     Represents a single quiz created by a user.
     Linked to a video URL and contains multiple questions.
+    Questions either live in the quiz's own rows or, until the quiz is
+    edited, in the shared template it references.
+
+    With QUIZ_QUESTION_STORAGE=json the quiz's own questions are kept in
+    question_data instead of Question/QuestionOption rows: a list of
+    {"position", "question_title", "question_options", "answer"} in
+    position order. question_data is None for row-backed quizzes.
     """
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     video_url = models.URLField()
+    # YouTube video ID parsed from video_url
+    video_id = models.CharField(max_length=11, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Indexed by quiz_owner_created_idx
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    template = models.ForeignKey(
+        QuizTemplate,
+        related_name="quizzes",
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT
+    )
+    question_data = models.JSONField(null=True, blank=True)
+    # Number of the quiz's own questions (rows or question_data), not the template's
+    question_count = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Serves the paginated listing: filter(owner=...) ordered by (created_at, id)
+            models.Index(fields=["owner", "-created_at", "-id"], name="quiz_owner_created_idx"),
+            # Quizzes of a video, across users or for one owner
+            models.Index(fields=["video_id", "owner"], name="quiz_video_idx"),
+        ]
 
     def __str__(self):
         return self.title
@@ -25,16 +74,135 @@ class Question(models.Model):
     """
     Represents a specific question within a quiz.
     Each question has a title and a correct answer.
+    Questions are ordered by position within their quiz.
     """
-    quiz = models.ForeignKey(Quiz, related_name="questions", on_delete=models.CASCADE)
+    # Indexed by the (quiz, position) constraint
+    quiz = models.ForeignKey(Quiz, related_name="questions", on_delete=models.CASCADE, db_index=False)
+    position = models.PositiveSmallIntegerField(default=0)
     question_title = models.CharField(max_length=255)
     answer = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        ordering = ["position"]
+        constraints = [
+            models.UniqueConstraint(fields=["quiz", "position"], name="unique_question_position"),
+        ]
+
 class QuestionOption(models.Model):
     """
-    Represents multiple-choice options for a given question.
+    Represents multiple-choice options for a given question, in position order.
     """
-    question = models.ForeignKey(Question, related_name="question_options", on_delete=models.CASCADE)
-    option_text = models.CharField(max_length=255)
\ No newline at end of file
+    # Indexed by the (question, position) constraint
+    question = models.ForeignKey(
+        Question,
+        related_name="question_options",
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    position = models.PositiveSmallIntegerField(default=0)
+    option_text = models.CharField(max_length=255)
+
+    class Meta:
+        ordering = ["position"]
+        constraints = [
+            models.UniqueConstraint(fields=["question", "position"], name="unique_option_position"),
+        ]
+
+# Job statuses before done/failed (values of QuizJob.Status)
+ACTIVE_JOB_STATUSES = ["queued", "downloading", "transcribing", "generating", "saving"]
+
+
+class QuizJob(models.Model):
+    """
+    Tracks a background quiz generation run for a single YouTube URL.
+    The status follows the pipeline stages so clients can poll for progress.
+
+    Only one job per video runs the pipeline at a time (the "leader");
+    identical requests arriving meanwhile become followers that share the
+    leader's result instead of repeating the work.
+
+    Leaders wait in the queue until the dispatcher (see admission.py) hands
+    them to a worker; started_at records when that happened.
+    """
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        DOWNLOADING = "downloading", "Downloading"
+        TRANSCRIBING = "transcribing", "Transcribing"
+        GENERATING = "generating", "Generating"
+        SAVING = "saving", "Saving"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+
+    owner = models.ForeignKey(User, related_name="quiz_jobs", on_delete=models.CASCADE)
+    video_url = models.URLField()
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED)
+    quiz = models.ForeignKey(Quiz, related_name="jobs", null=True, blank=True, on_delete=models.SET_NULL)
+    error = models.TextField(blank=True)
+    media_bytes = models.PositiveBigIntegerField(default=0)
+    video_id = models.CharField(max_length=11, blank=True, db_index=True)
+    idempotency_key = models.CharField(max_length=255, blank=True)
+    leader = models.ForeignKey(
+        "self",
+        related_name="followers",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL
+    )
+    batch = models.BooleanField(default=False)
+    started_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Dispatcher: waiting and running jobs
+            models.Index(fields=["status", "started_at"], name="quizjob_queue_idx"),
+        ]
+        constraints = [
+            # Single flight: at most one running pipeline per video
+            models.UniqueConstraint(
+                fields=["video_id"],
+                condition=models.Q(leader__isnull=True, status__in=ACTIVE_JOB_STATUSES) & ~models.Q(video_id=""),
+                name="unique_active_job_per_video"
+            ),
+            models.UniqueConstraint(
+                fields=["owner", "idempotency_key"],
+                condition=~models.Q(idempotency_key=""),
+                name="unique_job_idempotency_key"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.video_url} ({self.status})"
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ACTIVE_JOB_STATUSES
+
+
+class Transcript(models.Model):
+    """
+    Cached Whisper transcript of a YouTube video.
+    The text itself lives in the on-disk transcript cache; this row holds the
+    cache key (video, Whisper model, language) and usage data for eviction.
+    """
+    video_id = models.CharField(max_length=11)
+    model_name = models.CharField(max_length=50)
+    language = models.CharField(max_length=16)
+    file_name = models.CharField(max_length=255)
+    size_bytes = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["video_id", "model_name", "language"],
+                name="unique_transcript_key"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.video_id} ({self.model_name}, {self.language})"
@@ -0,0 +1,340 @@
+"""
+Quiz persistence service for Quizly.
+Validates quiz payloads (as produced by Gemini or imported from elsewhere)
+and stores them with bulk inserts: one INSERT for the quiz, one for all
+questions and one for all options, instead of one per row. With
+QUIZ_QUESTION_STORAGE=json the questions go into the quiz's question_data
+column instead, and convert_to_json / convert_to_rows move existing quizzes
+between the two representations.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Quiz, Question, QuestionOption
+
+
+# What a generated quiz must contain (see build_prompt)
+QUIZ_QUESTION_COUNT = 10
+QUIZ_OPTION_COUNT = 4
+
+
+class QuizPayloadError(ValueError):
+    """
+    Raised when a quiz payload does not have the expected shape.
+    """
+
+
+# ========== Validation ==========
+
+def _check_text(value, field: str, max_length: int | None = 255) -> None:
+    if not isinstance(value, str) or not value.strip():
+        raise QuizPayloadError(f"'{field}' must be a non-empty string")
+
+    if max_length is not None and len(value) > max_length:
+        raise QuizPayloadError(f"'{field}' must be at most {max_length} characters")
+
+
+def question_errors(q) -> list:
+    """
+    Returns everything wrong with a generated question under the strict rules:
+    valid shape, exactly QUIZ_OPTION_COUNT distinct options, answer among them.
+    """
+    try:
+        validate_question(q)
+    except QuizPayloadError as e:
+        return [str(e).replace("questions[0].", "")]
+
+    errors = []
+    options = q["question_options"]
+
+    if len(options) != QUIZ_OPTION_COUNT:
+        errors.append(f"must have exactly {QUIZ_OPTION_COUNT} options, not {len(options)}")
+    if len(set(options)) != len(options):
+        errors.append("options must be distinct")
+    if q["answer"] not in options:
+        errors.append("answer must be exactly one of the options")
+
+    return errors
+
+
+def quiz_errors(data) -> dict:
+    """
+    Strict check of a generated quiz, collecting all problems instead of
+    stopping at the first one, so they can be repaired in one request.
+
+    Returns:
+        dict: {"quiz": [top-level problems], "questions": {index: [problems]},
+               "missing": number of questions still needed}. Empty lists/dicts
+               and missing == 0 mean the quiz is valid.
+    """
+    if not isinstance(data, dict):
+        return {"quiz": ["Quiz payload must be a JSON object"], "questions": {}, "missing": QUIZ_QUESTION_COUNT}
+
+    problems = {"quiz": [], "questions": {}, "missing": 0}
+
+    try:
+        _check_text(data.get("title"), "title")
+    except QuizPayloadError as e:
+        problems["quiz"].append(str(e))
+
+    if not isinstance(data.get("description", ""), str):
+        problems["quiz"].append("'description' must be a string")
+
+    questions = data.get("questions")
+    if not isinstance(questions, list):
+        questions = []
+
+    for i, q in enumerate(questions[:QUIZ_QUESTION_COUNT]):
+        errors = question_errors(q)
+        if errors:
+            problems["questions"][i] = errors
+
+    problems["missing"] = max(0, QUIZ_QUESTION_COUNT - len(questions))
+    return problems
+
+
+def is_valid_quiz(problems: dict) -> bool:
+    return not problems["quiz"] and not problems["questions"] and not problems["missing"]
+
+
+def validate_quiz_payload(data) -> dict:
+    """
+    Checks the payload shape before anything touches the database.
+
+    Expected shape:
+        {"title": str, "description": str,
+         "questions": [{"question_title": str,
+                        "question_options": [str, ...],
+                        "answer": str}, ...]}
+
+    Returns:
+        dict: The same payload, for call chaining.
+    """
+    if not isinstance(data, dict):
+        raise QuizPayloadError("Quiz payload must be a JSON object")
+
+    _check_text(data.get("title"), "title")
+
+    if not isinstance(data.get("description", ""), str):
+        raise QuizPayloadError("'description' must be a string")
+
+    questions = data.get("questions")
+    if not isinstance(questions, list) or not questions:
+        raise QuizPayloadError("'questions' must be a non-empty list")
+
+    for i, q in enumerate(questions):
+        validate_question(q, i)
+
+    return data
+
+
+def validate_question(q, index: int = 0) -> dict:
+    """
+    Checks a single question object, e.g. one parsed from a streamed response.
+    """
+    if not isinstance(q, dict):
+        raise QuizPayloadError(f"questions[{index}] must be an object")
+
+    _check_text(q.get("question_title"), f"questions[{index}].question_title")
+    _check_text(q.get("answer"), f"questions[{index}].answer")
+
+    options = q.get("question_options")
+    if not isinstance(options, list) or not options:
+        raise QuizPayloadError(f"questions[{index}].question_options must be a non-empty list")
+
+    for j, opt in enumerate(options):
+        _check_text(opt, f"questions[{index}].question_options[{j}]")
+
+    return q
+
+
+# ========== Bulk save ==========
+
+def _video_id(video_url: str) -> str:
+    # utils imports this module, so extract_video_id is imported on use
+    from .utils import extract_video_id
+
+    try:
+        return extract_video_id(video_url)
+    except ValueError:
+        return ""
+
+
+def initial_question_data() -> list | None:
+    """
+    question_data for a new quiz: an empty list when questions are stored as
+    JSON (QUIZ_QUESTION_STORAGE=json), None when they are stored as rows.
+    """
+    return [] if settings.QUIZ_QUESTION_STORAGE == "json" else None
+
+
+def _insert_question_rows(quiz: Quiz, questions: list, positions) -> None:
+    """
+    Bulk-inserts questions and their options as rows.
+    Uses the primary keys returned by the INSERT where the backend supports it
+    and falls back to a single SELECT otherwise.
+    """
+    created = Question.objects.bulk_create([
+        Question(
+            quiz=quiz,
+            position=position,
+            question_title=q["question_title"],
+            answer=q["answer"]
+        )
+        for position, q in zip(positions, questions)
+    ])
+
+    if not connection.features.can_return_rows_from_bulk_insert:
+        created = list(Question.objects.filter(quiz=quiz).order_by("id"))[-len(questions):]
+
+    QuestionOption.objects.bulk_create([
+        QuestionOption(question=question, position=position, option_text=opt)
+        for question, q in zip(created, questions)
+        for position, opt in enumerate(q["question_options"])
+    ])
+
+
+def _question_item(q: dict, position: int) -> dict:
+    return {
+        "position": position,
+        "question_title": q["question_title"],
+        "question_options": list(q["question_options"]),
+        "answer": q["answer"]
+    }
+
+
+def save_questions(quiz: Quiz, questions: list, positions: list | None = None) -> None:
+    """
+    Adds validated questions to an existing quiz, as rows (two INSERTs
+    and a count update) or into its question_data (one UPDATE), depending
+    on how the quiz stores its questions.
+    Questions are numbered 0, 1, 2, ... unless their positions are given
+    (questions saved one by one while streaming).
+    """
+    if not questions:
+        return
+
+    if positions is None:
+        positions = range(len(questions))
+
+    if quiz.question_data is None:
+        _insert_question_rows(quiz, questions, positions)
+    else:
+        items = quiz.question_data + [_question_item(q, p) for p, q in zip(positions, questions)]
+        quiz.question_data = sorted(items, key=lambda item: item["position"])
+
+    quiz.question_count += len(questions)
+    # updated_at versions cached quiz responses (api/response_cache.py)
+    quiz.save(update_fields=["question_data", "question_count", "updated_at"])
+
+
+def create_quiz_from_payload(data: dict, owner, video_url: str) -> Quiz:
+    """
+    Validates the payload and stores the quiz with all questions and options
+    in one short transaction (three INSERT statements, or one with JSON storage).
+    """
+    validate_quiz_payload(data)
+    question_data = initial_question_data()
+
+    if question_data is not None:
+        question_data = [_question_item(q, i) for i, q in enumerate(data["questions"])]
+
+    with transaction.atomic():
+        quiz = Quiz.objects.create(
+            title=data["title"],
+            description=data.get("description", ""),
+            video_url=video_url,
+            video_id=_video_id(video_url),
+            owner=owner,
+            question_data=question_data,
+            question_count=len(data["questions"])
+        )
+        if question_data is None:
+            _insert_question_rows(quiz, data["questions"], range(len(data["questions"])))
+
+    return quiz
+
+
+def _payload(q: dict) -> dict:
+    return {
+        "question_title": q["question_title"],
+        "question_options": q["question_options"],
+        "answer": q["answer"]
+    }
+
+
+def _row_payload(question: Question) -> dict:
+    return {
+        "question_title": question.question_title,
+        "question_options": [option.option_text for option in question.question_options.all()],
+        "answer": question.answer
+    }
+
+
+def question_payloads(quiz: Quiz) -> list:
+    """
+    Returns the quiz's questions in payload shape (question_title,
+    question_options, answer) and order, wherever they are stored.
+    """
+    if quiz.template_id is not None:
+        return [_payload(q) for q in quiz.template.questions]
+
+    if quiz.question_data is not None:
+        return [_payload(q) for q in quiz.question_data]
+
+    return [_row_payload(question) for question in quiz.questions.prefetch_related("question_options")]
+
+
+# ========== Storage conversion ==========
+
+def convert_to_json(quizzes) -> int:
+    """
+    Moves the question rows of the given row-backed quizzes into their
+    question_data and deletes the rows, in one transaction.
+    Template-backed quizzes only switch mode (their template stays shared).
+    Both conversions bump updated_at: the API representation changes.
+
+    Returns:
+        int: Number of converted quizzes.
+    """
+    quizzes = list(
+        quizzes.filter(question_data__isnull=True).prefetch_related("questions__question_options")
+    )
+
+    with transaction.atomic():
+        for quiz in quizzes:
+            quiz.question_data = [
+                _question_item(_row_payload(question), question.position)
+                for question in quiz.questions.all()
+            ]
+            quiz.question_count = len(quiz.question_data)
+            quiz.updated_at = timezone.now()
+
+        Quiz.objects.bulk_update(quizzes, ["question_data", "question_count", "updated_at"])
+        QuestionOption.objects.filter(question__quiz__in=quizzes).delete()
+        Question.objects.filter(quiz__in=quizzes).delete()
+
+    return len(quizzes)
+
+
+def convert_to_rows(quizzes) -> int:
+    """
+    Writes the question_data of the given JSON-backed quizzes back as
+    Question/QuestionOption rows, in one transaction.
+
+    Returns:
+        int: Number of converted quizzes.
+    """
+    quizzes = list(quizzes.filter(question_data__isnull=False))
+
+    with transaction.atomic():
+        for quiz in quizzes:
+            if quiz.question_data:
+                _insert_question_rows(quiz, quiz.question_data, [q["position"] for q in quiz.question_data])
+            quiz.question_data = None
+            quiz.updated_at = timezone.now()
+
+        Quiz.objects.bulk_update(quizzes, ["question_data", "updated_at"])
+
+    return len(quizzes)
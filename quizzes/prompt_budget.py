@@ -0,0 +1,151 @@
+"""
+Prompt budgeting for Quizly.
+Counts transcript tokens before anything is sent to Gemini. Transcripts
+within PROMPT_MAX_TRANSCRIPT_TOKENS go out as one prompt. Longer ones are
+split into chunks of about PROMPT_CHUNK_TOKENS that Gemini condenses into
+notes concurrently ("map"); the quiz is then generated from the notes
+("reduce").
+
+Tokens are counted with tiktoken (PROMPT_TOKEN_ENCODING). It is not
+Gemini's own tokenizer, but close enough for budgeting. When the encoding
+cannot be loaded (e.g. no network to fetch it), ~4 characters per token
+are assumed.
+"""
+import re
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .metrics import stage_span
+from .utils import build_prompt, build_summary_prompt, summarize_transcript_chunk
+
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+
+# At most this many map passes; each one shrinks the material ~4x
+MAX_MAP_ROUNDS = 3
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+# ========== Token counting ==========
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """
+    Returns the tiktoken encoding, or False when it is unavailable.
+    """
+    global _encoding
+
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(settings.PROMPT_TOKEN_ENCODING)
+            except Exception as e:
+                logger.warning(f"tiktoken encoding unavailable ({e}), estimating tokens from length")
+                _encoding = False
+
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+# ========== Chunking ==========
+
+def _pieces(text: str, max_tokens: int) -> list:
+    """
+    Splits text into sentences; sentences over the budget (transcripts
+    without punctuation) are split further into word groups.
+    """
+    pieces = []
+
+    for sentence in SENTENCE_END.split(text):
+        if count_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+
+        words = sentence.split()
+        step = max(1, max_tokens * CHARS_PER_TOKEN // 6)
+        pieces.extend(" ".join(words[i:i + step]) for i in range(0, len(words), step))
+
+    return [piece for piece in pieces if piece.strip()]
+
+
+def split_transcript(text: str, max_tokens: int) -> list:
+    """
+    Groups whole sentences into chunks of at most max_tokens each.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for piece in _pieces(text, max_tokens):
+        # +1 for the joining space
+        tokens = count_tokens(piece) + 1
+
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+
+        current.append(piece)
+        current_tokens += tokens
+
+    if current:
+        chunks.append(" ".join(current))
+
+    return chunks
+
+
+# ========== Map-reduce ==========
+
+def condense_transcript(transcript: str, chunk_tokens: int, workers: int) -> str:
+    """
+    "Map" step: condenses each chunk of the transcript in parallel and joins
+    the notes in their original order.
+    """
+    chunks = split_transcript(transcript, chunk_tokens)
+    prompts = [build_summary_prompt(chunk, i + 1, len(chunks)) for i, chunk in enumerate(chunks)]
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(prompts))) as pool:
+        notes = list(pool.map(summarize_transcript_chunk, prompts))
+
+    return "\n\n".join(notes)
+
+
+def build_quiz_prompt(transcript: str) -> str:
+    """
+    Returns the quiz generation prompt for a transcript of any length,
+    condensing long transcripts first so the prompt stays within budget.
+    """
+    budget = settings.PROMPT_MAX_TRANSCRIPT_TOKENS
+    tokens = count_tokens(transcript)
+
+    with stage_span("build_prompt", transcript_chars=len(transcript), transcript_tokens=tokens) as span:
+        material = transcript
+        rounds = 0
+
+        while tokens > budget and rounds < MAX_MAP_ROUNDS:
+            rounds += 1
+            material = condense_transcript(material, settings.PROMPT_CHUNK_TOKENS, settings.PROMPT_MAP_CONCURRENCY)
+            tokens = count_tokens(material)
+
+        if rounds:
+            logger.info(f"Condensed transcript in {rounds} map round(s) to {tokens} tokens")
+            material = f"(Condensed notes of a long transcript, in order)\n{material}"
+
+        span.set(map_rounds=rounds, prompt_tokens_estimate=tokens)
+        return build_prompt(material)
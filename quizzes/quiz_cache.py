@@ -0,0 +1,100 @@
+"""
+Generated-quiz cache for Quizly.
+Gemini output is stored once per (transcript, prompt version, model) as an
+immutable QuizTemplate. Users' quizzes reference the template and only get
+their own Question/QuestionOption rows when they are edited (copy-on-write).
+"""
+import hashlib
+import logging
+
+from django.db import IntegrityError, transaction
+
+from .metrics import stage_span
+from .models import Quiz, QuizTemplate
+from .persistence import save_questions
+from .prompt_budget import build_quiz_prompt
+from .quiz_repair import ensure_valid_quiz
+from .utils import (
+    GEMINI_MODEL_NAME,
+    PROMPT_VERSION,
+    generate_quiz_json
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+def quiz_cache_key(transcript: str) -> str:
+    """
+    Returns the content hash identifying a generated quiz.
+    """
+    content = f"{PROMPT_VERSION}\n{GEMINI_MODEL_NAME}\n{transcript}"
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def find_template(transcript: str) -> QuizTemplate | None:
+    """
+    Returns the cached template for the transcript, if there is one.
+    """
+    return QuizTemplate.objects.filter(content_hash=quiz_cache_key(transcript)).first()
+
+
+def store_template(transcript: str, quiz_data: dict) -> QuizTemplate:
+    """
+    Stores a validated generation as the template for the transcript.
+    """
+    content_hash = quiz_cache_key(transcript)
+
+    try:
+        with transaction.atomic():
+            return QuizTemplate.objects.create(
+                content_hash=content_hash,
+                prompt_version=PROMPT_VERSION,
+                model_name=GEMINI_MODEL_NAME,
+                title=quiz_data["title"],
+                description=quiz_data.get("description", ""),
+                questions=quiz_data["questions"]
+            )
+    except IntegrityError:
+        # Another worker stored the same generation in the meantime.
+        return QuizTemplate.objects.get(content_hash=content_hash)
+
+
+def get_or_generate_template(transcript: str) -> QuizTemplate:
+    """
+    Returns the cached template for the transcript, calling Gemini on a miss.
+    """
+    template = find_template(transcript)
+    if template is not None:
+        return template
+
+    prompt = build_quiz_prompt(transcript)
+
+    with stage_span("generate", transcript_chars=len(transcript)):
+        try:
+            quiz_data = generate_quiz_json(prompt)
+        except ValueError as e:
+            logger.warning(f"Gemini reply is not valid JSON: {e}")
+            quiz_data = None
+
+        quiz_data = ensure_valid_quiz(quiz_data, prompt)
+
+    return store_template(transcript, quiz_data)
+
+
+def detach_template(quiz: Quiz) -> None:
+    """
+    Copies the template's questions into the quiz's own rows (copy-on-write)
+    and drops the reference, so edits never touch the shared template.
+    """
+    if quiz.template_id is None:
+        return
+
+    with transaction.atomic():
+        save_questions(quiz, quiz.template.questions)
+
+        quiz.template = None
+        quiz.save(update_fields=["template", "updated_at"])
+
+    # Drop questions prefetched while the quiz was still template-backed
+    quiz.refresh_from_db()
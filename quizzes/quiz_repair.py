@@ -0,0 +1,85 @@
+"""
+Repair step for generated quizzes.
+A generated quiz is checked strictly (10 questions, 4 distinct options,
+answer among the options). Instead of failing the job, and wasting the
+download and transcription before it, the invalid parts are asked for
+again in one small request. A reply that is not JSON at all is generated
+once more. If the quiz is still invalid after that single repair, the job
+fails with a clear message.
+"""
+import logging
+
+from .persistence import (
+    QUIZ_QUESTION_COUNT,
+    QuizPayloadError,
+    is_valid_quiz,
+    quiz_errors,
+    validate_quiz_payload
+)
+from .utils import REPAIR_RESPONSE_SCHEMA, build_repair_prompt, generate_quiz_json
+
+
+logger = logging.getLogger(__name__)
+
+
+def apply_repair(quiz_data: dict, problems: dict, repair: dict) -> dict:
+    """
+    Merges a repair reply into the quiz: replaces the listed fields and
+    questions and appends new questions up to the required count.
+    """
+    repaired = dict(quiz_data)
+    questions = list(quiz_data.get("questions") or [])[:QUIZ_QUESTION_COUNT]
+
+    for field in ["title", "description"]:
+        if any(f"'{field}'" in problem for problem in problems["quiz"]) and repair.get(field):
+            repaired[field] = repair[field]
+
+    for q in repair.get("questions") or []:
+        if not isinstance(q, dict):
+            continue
+
+        index = q.pop("index", -1)
+        if index in problems["questions"]:
+            questions[index] = q
+        elif len(questions) < QUIZ_QUESTION_COUNT:
+            questions.append(q)
+
+    repaired["questions"] = questions
+    return repaired
+
+
+def ensure_valid_quiz(quiz_data: dict | None, prompt: str) -> dict:
+    """
+    Returns a strictly valid quiz, repairing it with at most one extra
+    Gemini request. quiz_data is None when the reply could not be parsed.
+
+    Raises:
+        QuizPayloadError: if the quiz is still invalid after the repair.
+    """
+    if isinstance(quiz_data, dict) and isinstance(quiz_data.get("questions"), list):
+        # Surplus questions need no repair request
+        quiz_data = {**quiz_data, "questions": quiz_data["questions"][:QUIZ_QUESTION_COUNT]}
+
+    problems = quiz_errors(quiz_data)
+    if is_valid_quiz(problems):
+        return quiz_data
+
+    try:
+        if not isinstance(quiz_data, dict):
+            logger.warning("Gemini reply was not a quiz object, generating once more")
+            quiz_data = generate_quiz_json(prompt)
+        else:
+            logger.warning(f"Repairing generated quiz: {problems}")
+            repair = generate_quiz_json(
+                build_repair_prompt(quiz_data, problems, prompt),
+                schema=REPAIR_RESPONSE_SCHEMA
+            )
+            quiz_data = apply_repair(quiz_data, problems, repair if isinstance(repair, dict) else {})
+    except ValueError as e:
+        raise QuizPayloadError(f"Quiz repair failed: {e}")
+
+    problems = quiz_errors(quiz_data)
+    if not is_valid_quiz(problems):
+        raise QuizPayloadError(f"Generated quiz is invalid after repair: {problems}")
+
+    return validate_quiz_payload(quiz_data)
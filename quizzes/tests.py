@@ -1,13 +1,107 @@
+import os
+import io
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from multiprocessing.connection import Listener
+from unittest.mock import patch
+
+import numpy as np
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.management import call_command
 from django.urls import reverse
+from django.db import connection
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+
+from quizzes.admission import claim_next_job, running_jobs
+from quizzes.api import async_views
+from quizzes.fake_gemini import FakeGeminiServer, sample_quiz
+from quizzes.jobs import (
+    dispatch_jobs,
+    dispatch_own_jobs_only,
+    dispatch_tick,
+    reset_dispatcher,
+    reset_stage_slots,
+    run_quiz_job,
+    stage_slot,
+    submit_quiz_job
+)
+from quizzes.json_stream import QuizStreamParser
+from quizzes.llm import GeminiClient, LLMError, reset_gemini_client
+from quizzes.media import disk_usage, enforce_quota, find_retained_audio, job_workspace
+from quizzes.metrics import annotate, render_metrics, reset_metrics, stage_span
+from quizzes.models import Question, Quiz, QuizJob, QuizTemplate, Transcript
+from quizzes.prompt_budget import build_quiz_prompt, count_tokens, split_transcript
+from quizzes.persistence import QuizPayloadError, create_quiz_from_payload, quiz_errors
+from quizzes.quiz_repair import ensure_valid_quiz
+from quizzes.transcription import (
+    SAMPLE_RATE,
+    DummyBackend,
+    build_backend,
+    get_chunk_pool,
+    reset_chunk_pool,
+    split_fixed,
+    split_on_silence,
+    stitch_transcripts,
+    transcribe_chunked,
+    transcribe_in_process
+)
+from quizzes.transcription_server import TranscriptionServer, request_transcription
+from quizzes.utils import generate_quiz_json, read_pcm, stream_audio, stream_quiz_json, transcribe_audio
+from quizzes.transcripts import get_cached_transcript, prune_transcripts, store_transcript
+
+
+VIDEO_URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+QUIZ_DATA = {
+    "title": "Generated quiz",
+    "description": "desc",
+    "questions": [
+        {
+            "question_title": f"Question {i}",
+            "question_options": ["A", "B", "C", "D"],
+            "answer": "A"
+        }
+        for i in range(10)
+    ]
+}
+
+def use_temp_cache_dirs(test_case):
+    """
+    Points the transcript cache and media scratch space at a throwaway
+    directory for one test.
+    """
+    cache_dir = tempfile.mkdtemp()
+    override = override_settings(
+        TRANSCRIPT_CACHE_DIR=os.path.join(cache_dir, "transcripts"),
+        MEDIA_SCRATCH_DIR=os.path.join(cache_dir, "media")
+    )
+    override.enable()
+    test_case.addCleanup(override.disable)
+    test_case.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
 
-from quizzes.models import Quiz
 
 class QuizTests(APITestCase):
 
     def setUp(self):
+        use_temp_cache_dirs(self)
+        # Fresh rate limit buckets and quiz responses
+        cache.clear()
+        caches["quiz_responses"].clear()
+
         self.user = User.objects.create_user(
             username="testuser",
             password="testpass123"
@@ -20,16 +114,394 @@ class QuizTests(APITestCase):
             format="json"
         )
 
-    def test_create_quiz(self):
+    def test_create_quiz_returns_queued_job(self):
+        with patch("quizzes.jobs.enqueue_quiz_job") as enqueue:
+            response = self.client.post(
+                "/api/createQuiz/",
+                {"url": "https://youtu.be/dQw4w9WgXcQ"},
+                format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], "queued")
+        self.assertEqual(response.data["video_url"], VIDEO_URL)
+        enqueue.assert_called_once()
+        self.assertEqual(Quiz.objects.count(), 0)
+
+    @override_settings(QUIZ_JOBS_EAGER=True)
+    @patch("quizzes.quiz_cache.generate_quiz_json", return_value=QUIZ_DATA)
+    @patch("quizzes.jobs.transcribe_audio", return_value="transcript")
+    @patch("quizzes.jobs.download_audio", return_value="/tmp/audio.mp3")
+    def test_create_quiz(self, *mocks):
         response = self.client.post(
             "/api/createQuiz/",
-            {"url": "https://www.youtube.com/watch?v=abc123"},
+            {"url": VIDEO_URL},
             format="json"
         )
 
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], "done")
         self.assertEqual(Quiz.objects.count(), 1)
-        self.assertEqual(response.data["video_url"], "https://www.youtube.com/watch?v=abc123")
+
+        quiz = Quiz.objects.get()
+        self.assertEqual(response.data["quiz"], quiz.id)
+        self.assertEqual(quiz.video_url, VIDEO_URL)
+        self.assertEqual(quiz.title, "Generated quiz")
+
+        job_response = self.client.get(f"/api/jobs/{response.data['id']}/")
+
+        self.assertEqual(job_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(job_response.data["quiz"], quiz.id)
+
+        detail_response = self.client.get(f"/api/quizzes/{quiz.id}/")
+
+        self.assertEqual(len(detail_response.json()["questions"]), 10)
+        self.assertEqual(detail_response.json()["questions"][0]["question_options"], ["A", "B", "C", "D"])
+
+    @override_settings(QUIZ_JOBS_EAGER=True)
+    @patch("quizzes.quiz_cache.generate_quiz_json", return_value=QUIZ_DATA)
+    @patch("quizzes.jobs.transcribe_audio", return_value="transcript")
+    @patch("quizzes.jobs.download_audio", return_value="/tmp/audio.mp3")
+    def test_same_video_shares_generated_quiz(self, download, transcribe, generate):
+        other_user = User.objects.create_user(
+            username="other",
+            password="pass123"
+        )
+        QuizJob.objects.create(video_url=VIDEO_URL, owner=other_user)
+        run_quiz_job(QuizJob.objects.get().id)
+
+        self.client.post("/api/createQuiz/", {"url": VIDEO_URL}, format="json")
+
+        generate.assert_called_once()
+        self.assertEqual(QuizTemplate.objects.count(), 1)
+        self.assertEqual(Quiz.objects.filter(template__isnull=False).count(), 2)
+        self.assertEqual(Question.objects.count(), 0)
+
+    @override_settings(QUIZ_JOBS_EAGER=True)
+    @patch("quizzes.jobs.download_audio", side_effect=RuntimeError("Failed to download audio"))
+    def test_create_quiz_failed_job(self, download):
+        response = self.client.post(
+            "/api/createQuiz/",
+            {"url": VIDEO_URL},
+            format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], "failed")
+        self.assertEqual(response.data["error"], "Failed to download audio")
+        self.assertEqual(Quiz.objects.count(), 0)
+
+    @override_settings(QUIZ_JOBS_EAGER=True)
+    @patch("quizzes.quiz_cache.generate_quiz_json", return_value=QUIZ_DATA)
+    @patch("quizzes.jobs.transcribe_audio")
+    @patch("quizzes.jobs.download_audio")
+    def test_create_quiz_uses_cached_transcript(self, download, transcribe, generate):
+        store_transcript("dQw4w9WgXcQ", "base", None, "cached transcript")
+
+        response = self.client.post(
+            "/api/createQuiz/",
+            {"url": VIDEO_URL},
+            format="json"
+        )
+
+        self.assertEqual(response.data["status"], "done")
+        download.assert_not_called()
+        transcribe.assert_not_called()
+        self.assertIn("cached transcript", generate.call_args.args[0])
+
+    @override_settings(QUIZ_JOBS_EAGER=True, AUDIO_INGEST_MODE="stream")
+    @patch("quizzes.quiz_cache.generate_quiz_json", return_value=QUIZ_DATA)
+    @patch("quizzes.jobs.transcribe_audio", return_value="transcript")
+    @patch("quizzes.jobs.download_audio")
+    @patch("quizzes.jobs.stream_audio", return_value=np.zeros(SAMPLE_RATE, dtype=np.float32))
+    def test_create_quiz_streams_audio_without_mp3(self, stream, download, transcribe, generate):
+        response = self.client.post("/api/createQuiz/", {"url": VIDEO_URL}, format="json")
+
+        self.assertEqual(response.data["status"], "done")
+        stream.assert_called_once_with(VIDEO_URL, mmap_path=None)
+        download.assert_not_called()
+        self.assertIs(transcribe.call_args.args[0], stream.return_value)
+
+    @override_settings(QUIZ_JOBS_EAGER=True, MEDIA_KEEP_AUDIO=True)
+    @patch("quizzes.quiz_cache.generate_quiz_json", return_value=QUIZ_DATA)
+    @patch("quizzes.jobs.transcribe_audio", return_value="transcript")
+    @patch("quizzes.jobs.download_audio")
+    def test_create_quiz_retains_audio_and_reports_bytes(self, download, transcribe, generate):
+        def fake_download(url, dest_dir):
+            path = os.path.join(dest_dir, "audio.mp3")
+            with open(path, "wb") as f:
+                f.write(b"x" * 1000)
+            return path
+        download.side_effect = fake_download
+
+        response = self.client.post("/api/createQuiz/", {"url": VIDEO_URL}, format="json")
+
+        self.assertEqual(response.data["status"], "done")
+        self.assertEqual(response.data["media_bytes"], 1000)
+        self.assertEqual(disk_usage()["jobs"], 0)
+        self.assertTrue(find_retained_audio("dQw4w9WgXcQ").endswith("audio.mp3"))
+
+    @override_settings(QUIZ_JOBS_EAGER=True)
+    @patch("quizzes.quiz_cache.generate_quiz_json", return_value=QUIZ_DATA)
+    @patch("quizzes.jobs.transcribe_audio", return_value="transcript")
+    @patch("quizzes.jobs.download_audio", return_value="/tmp/audio.mp3")
+    def test_metrics_record_pipeline_stages(self, download, transcribe, generate):
+        reset_metrics()
+        self.client.post("/api/createQuiz/", {"url": VIDEO_URL}, format="json")
+        self.client.logout()
+
+        response = self.client.get("/api/metrics/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        for stage in ["download", "transcribe", "build_prompt", "generate", "save"]:
+            self.assertIn(f'quizly_stage_duration_seconds_count{{stage="{stage}",outcome="ok"}} 1', body)
+        self.assertIn('quizly_transcript_chars_sum{stage="transcribe"} 10', body)
+        self.assertIn('quizly_transcript_chars_sum{stage="generate"} 10', body)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_require_token_when_configured(self):
+        self.assertEqual(self.client.get("/api/metrics/").status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.get("/api/metrics/", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def fake_stream(self, fail_after=None, extra=0):
+        def stream(prompt):
+            yield "title", QUIZ_DATA["title"]
+            questions = QUIZ_DATA["questions"] + [QUIZ_DATA["questions"][0]] * extra
+            for i, question in enumerate(questions):
+                if i == fail_after:
+                    raise RuntimeError("Gemini stream interrupted")
+                yield "question", question
+            return QUIZ_DATA
+        return stream
+
+    def read_events(self, job_id):
+        response = self.client.get(f"/api/jobs/{job_id}/events/", HTTP_ACCEPT="text/event-stream")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+
+        body = b"".join(response.streaming_content).decode()
+        events = []
+        for block in body.split("\n\n"):
+            if block.startswith("event: "):
+                name, data = block.split("\n")
+                events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+        return events
+
+    @override_settings(QUIZ_JOBS_EAGER=True, GEMINI_STREAMING=True)
+    @patch("quizzes.jobs.transcribe_audio", return_value="transcript")
+    @patch("quizzes.jobs.download_audio", return_value="/tmp/audio.mp3")
+    def test_streaming_job_saves_questions_and_pushes_events(self, download, transcribe):
+        reset_metrics()
+        with patch("quizzes.jobs.stream_quiz_json", side_effect=self.fake_stream()):
+            job_id = self.client.post("/api/createQuiz/", {"url": VIDEO_URL}, format="json").data["id"]
+
+        job = QuizJob.objects.get(id=job_id)
+        self.assertEqual(job.status, QuizJob.Status.DONE)
+        self.assertIsNone(job.quiz.template)
+        self.assertEqual(job.quiz.questions.count(), 10)
+        self.assertEqual(QuizTemplate.objects.count(), 1)
+
+        events = self.read_events(job_id)
+        self.assertEqual(events[0], ("status", {"status": "done"}))
+        questions = [data for name, data in events if name == "question"]
+        self.assertEqual(len(questions), 10)
+        self.assertEqual(questions[0]["question_options"], ["A", "B", "C", "D"])
+        self.assertEqual(events[-1], ("done", {"quiz": job.quiz_id}))
+        # The transcript, not the prompt built around it
+        self.assertIn('quizly_transcript_chars_sum{stage="generate"} 10', render_metrics())
+
+    @override_settings(QUIZ_JOBS_EAGER=True, GEMINI_STREAMING=True)
+    @patch("quizzes.jobs.transcribe_audio", return_value="transcript")
+    @patch("quizzes.jobs.download_audio", return_value="/tmp/audio.mp3")
+    def test_streaming_job_ignores_questions_beyond_the_limit(self, download, transcribe):
+        with patch("quizzes.jobs.stream_quiz_json", side_effect=self.fake_stream(extra=1)):
+            job_id = self.client.post("/api/createQuiz/", {"url": VIDEO_URL}, format="json").data["id"]
+
+        quiz = QuizJob.objects.get(id=job_id).quiz
+        self.assertEqual(quiz.questions.count(), 10)
+        self.assertEqual(quiz.question_count, 10)
+        self.assertEqual(len(QuizTemplate.objects.get().questions), 10)
+
+    @override_settings(QUIZ_JOBS_EAGER=True, GEMINI_STREAMING=True, QUIZ_QUESTION_STORAGE="json")
+    @patch("quizzes.jobs.transcribe_audio", return_value="transcript")
+    @patch("quizzes.jobs.download_audio", return_value="/tmp/audio.mp3")
+    def test_streaming_job_with_json_storage(self, download, transcribe):
+        with patch("quizzes.jobs.stream_quiz_json", side_effect=self.fake_stream()):
+            job_id = self.client.post("/api/createQuiz/", {"url": VIDEO_URL}, format="json").data["id"]
+
+        quiz = QuizJob.objects.get(id=job_id).quiz
+        self.assertEqual(quiz.question_count, 10)
+        self.assertEqual([q["position"] for q in quiz.question_data], list(range(10)))
+        self.assertFalse(Question.objects.exists())
+
+        questions = [data for name, data in self.read_events(job_id) if name == "question"]
+        self.assertEqual([q["question_title"] for q in questions], [q["question_title"] for q in QUIZ_DATA["questions"]])
+
+    @override_settings(QUIZ_JOBS_EAGER=True, GEMINI_STREAMING=True)
+    @patch("quizzes.jobs.transcribe_audio", return_value="transcript")
+    @patch("quizzes.jobs.download_audio", return_value="/tmp/audio.mp3")
+    def test_failed_stream_removes_partial_quiz(self, download, transcribe):
+        with patch("quizzes.jobs.stream_quiz_json", side_effect=self.fake_stream(fail_after=3)):
+            job_id = self.client.post("/api/createQuiz/", {"url": VIDEO_URL}, format="json").data["id"]
+
+        self.assertEqual(Quiz.objects.count(), 0)
+        self.assertEqual(
+            self.read_events(job_id)[-1],
+            ("failed", {"error": "Gemini stream interrupted"})
+        )
+
+    def test_identical_requests_share_one_pipeline_run(self):
+        other = User.objects.create_user(username="other", password="pass123")
+
+        with patch("quizzes.jobs.enqueue_quiz_job") as enqueue:
+            first = self.client.post("/api/createQuiz/", {"url": VIDEO_URL}, format="json")
+            again = self.client.post("/api/createQuiz/", {"url": "https://youtu.be/dQw4w9WgXcQ"}, format="json")
+
+            self.client.force_authenticate(other)
+            follower = self.client.post("/api/createQuiz/", {"url": VIDEO_URL}, format="json")
+
+        enqueue.assert_called_once()
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.data["id"], first.data["id"])
+        self.assertEqual(follower.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(QuizJob.objects.get(id=follower.data["id"]).leader_id, first.data["id"])
+
+        with patch("quizzes.quiz_cache.generate_quiz_json", return_value=QUIZ_DATA), \
+                patch("quizzes.jobs.transcribe_audio", return_value="transcript"), \
+                patch("quizzes.jobs.download_audio", return_value="/tmp/audio.mp3") as download:
+            run_quiz_job(first.data["id"])
+
+        download.assert_called_once()
+        job = QuizJob.objects.get(id=follower.data["id"])
+        self.assertEqual(job.status, QuizJob.Status.DONE)
+        self.assertEqual(job.quiz.owner, other)
+        self.assertEqual(job.quiz.template, QuizJob.objects.get(id=first.data["id"]).quiz.template)
+
+    def test_follower_fails_with_leader(self):
+        leader = QuizJob.objects.create(owner=self.user, video_url=VIDEO_URL, video_id="dQw4w9WgXcQ")
+        other = User.objects.create_user(username="other", password="pass123")
+        self.client.force_authenticate(other)
+
+        follower_id = self.client.post("/api/createQuiz/", {"url": VIDEO_URL}, format="json").data["id"]
+        with patch("quizzes.jobs.download_audio", side_effect=RuntimeError("Failed to download audio")):
+            run_quiz_job(leader.id)
+
+        follower = QuizJob.objects.get(id=follower_id)
+        self.assertEqual(follower.status, QuizJob.Status.FAILED)
+        self.assertEqual(follower.error, "Failed to download audio")
+
+    @override_settings(QUIZ_JOB_STALE_SECONDS=60)
+    def test_stale_leader_is_replaced(self):
+        stale = QuizJob.objects.create(
+            owner=self.user, video_url=VIDEO_URL, video_id="dQw4w9WgXcQ", started_at=timezone.now()
+        )
+        QuizJob.objects.filter(id=stale.id).update(updated_at=timezone.now() - timedelta(hours=1))
+        other = User.objects.create_user(username="other", password="pass123")
+        self.client.force_authenticate(other)
+
+        with patch("quizzes.jobs.enqueue_quiz_job") as enqueue:
+            response = self.client.post("/api/createQuiz/", {"url": VIDEO_URL}, format="json")
+
+        enqueue.assert_called_once()
+        self.assertIsNone(QuizJob.objects.get(id=response.data["id"]).leader)
+        self.assertEqual(QuizJob.objects.get(id=stale.id).status, QuizJob.Status.FAILED)
+
+    def test_idempotency_key_returns_same_job(self):
+        with patch("quizzes.jobs.enqueue_quiz_job"):
+            first = self.client.post("/api/createQuiz/", {"url": VIDEO_URL}, format="json", HTTP_IDEMPOTENCY_KEY="abc")
+            QuizJob.objects.filter(id=first.data["id"]).update(status=QuizJob.Status.DONE)
+            retry = self.client.post("/api/createQuiz/", {"url": VIDEO_URL}, format="json", HTTP_IDEMPOTENCY_KEY="abc")
+            reused = self.client.post(
+                "/api/createQuiz/",
+                {"url": "https://www.youtube.com/watch?v=aaaaaaaaaaa"},
+                format="json",
+                HTTP_IDEMPOTENCY_KEY="abc"
+            )
+
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.data["id"], first.data["id"])
+        self.assertEqual(reused.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(QuizJob.objects.count(), 1)
+
+    def test_batch_dedupes_videos_and_expands_playlists(self):
+        playlist = ["https://www.youtube.com/watch?v=aaaaaaaaaaa", VIDEO_URL]
+
+        with patch("quizzes.batch.list_playlist_videos", return_value=playlist), \
+                patch("quizzes.jobs.enqueue_quiz_job") as enqueue:
+            response = self.client.post(
+                "/api/createQuizBatch/",
+                {"urls": ["https://youtu.be/dQw4w9WgXcQ", "not a url"], "playlists": ["https://www.youtube.com/playlist?list=PL1"]},
+                format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        results = [(item["video_id"], item["result"]) for item in response.data["items"]]
+        self.assertEqual(results, [
+            ("dQw4w9WgXcQ", "created"),
+            ("", "invalid"),
+            ("aaaaaaaaaaa", "created"),
+            ("dQw4w9WgXcQ", "duplicate"),
+        ])
+        items = response.data["items"]
+        self.assertEqual(items[3]["job"]["id"], items[0]["job"]["id"])
+        self.assertEqual(enqueue.call_count, 2)
+        self.assertTrue(all(call.args[0].batch for call in enqueue.call_args_list))
+
+    @override_settings(QUIZ_BATCH_MAX_ITEMS=1)
+    def test_batch_over_limit_is_rejected(self):
+        with patch("quizzes.jobs.enqueue_quiz_job") as enqueue:
+            response = self.client.post(
+                "/api/createQuizBatch/",
+                {"urls": [VIDEO_URL, "https://www.youtube.com/watch?v=aaaaaaaaaaa"]},
+                format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        enqueue.assert_not_called()
+        self.assertFalse(QuizJob.objects.exists())
+
+    @override_settings(QUIZ_CREATE_BURST=2, QUIZ_CREATE_RATE_PER_MINUTE=1)
+    def test_create_quiz_is_rate_limited(self):
+        with patch("quizzes.jobs.enqueue_quiz_job"):
+            responses = [
+                self.client.post("/api/createQuiz/", {"url": VIDEO_URL}, format="json")
+                for _ in range(3)
+            ]
+
+        self.assertEqual([r.status_code for r in responses[:2]], [status.HTTP_202_ACCEPTED, status.HTTP_200_OK])
+        self.assertEqual(responses[2].status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(responses[2]["Retry-After"]), 0)
+
+    @override_settings(QUIZ_MAX_QUEUED_JOBS=1, QUIZ_QUEUE_RETRY_AFTER_SECONDS=30)
+    def test_full_queue_rejects_new_work(self):
+        other = User.objects.create_user(username="other", password="pass123")
+        QuizJob.objects.create(owner=other, video_url=VIDEO_URL, video_id="dQw4w9WgXcQ")
+
+        with patch("quizzes.jobs.enqueue_quiz_job") as enqueue:
+            rejected = self.client.post(
+                "/api/createQuiz/", {"url": "https://www.youtube.com/watch?v=aaaaaaaaaaa"}, format="json"
+            )
+            # Following a queued job adds no work, so it is still admitted
+            follower = self.client.post("/api/createQuiz/", {"url": VIDEO_URL}, format="json")
+
+        self.assertEqual(rejected.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(rejected["Retry-After"], "30")
+        self.assertEqual(follower.status_code, status.HTTP_202_ACCEPTED)
+        enqueue.assert_not_called()
+
+    def test_job_forbidden_for_other_user(self):
+        other_user = User.objects.create_user(
+            username="other",
+            password="pass123"
+        )
+        job = QuizJob.objects.create(video_url=VIDEO_URL, owner=other_user)
+
+        response = self.client.get(f"/api/jobs/{job.id}/")
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
     def test_quiz_detail(self):
         quiz = Quiz.objects.create(
@@ -42,7 +514,109 @@ class QuizTests(APITestCase):
         response = self.client.get(f"/api/quizzes/{quiz.id}/")
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data["title"], "Quiz Detail")
+        self.assertEqual(response.json()["title"], "Quiz Detail")
+
+    def test_quiz_detail_is_cached_and_revalidated(self):
+        quiz = create_quiz_from_payload(QUIZ_DATA, self.user, VIDEO_URL)
+        url = f"/api/quizzes/{quiz.id}/"
+
+        first = self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            cached = self.client.get(url)
+        # user lookup + quiz version, no questions or options
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual(cached.content, first.content)
+
+        revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        since = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(revalidated.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(revalidated.content, b"")
+        self.assertEqual(revalidated["ETag"], first["ETag"])
+        self.assertEqual(since.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        patched = self.client.patch(url, {"title": "Renamed"}, format="json")
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(changed.json()["title"], "Renamed")
+        self.assertEqual(changed["ETag"], patched["ETag"])
+        self.assertNotEqual(changed["ETag"], first["ETag"])
+
+    def test_list_quizzes_query_count_is_constant(self):
+        def count_list_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get("/api/quizzes/")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(ctx.captured_queries)
+
+        create_quiz_from_payload(QUIZ_DATA, self.user, VIDEO_URL)
+        queries_for_one = count_list_queries()
+
+        for _ in range(5):
+            create_quiz_from_payload(QUIZ_DATA, self.user, VIDEO_URL)
+        template = QuizTemplate.objects.create(
+            content_hash="b" * 64,
+            prompt_version="1",
+            model_name="gemini-2.5-flash",
+            title="Shared",
+            questions=QUIZ_DATA["questions"]
+        )
+        Quiz.objects.create(title="Shared", video_url=VIDEO_URL, owner=self.user, template=template)
+
+        # user lookup + quizzes with templates + questions + options
+        self.assertEqual(queries_for_one, 4)
+        self.assertEqual(count_list_queries(), queries_for_one)
+
+    def test_list_quizzes_summary(self):
+        create_quiz_from_payload(QUIZ_DATA, self.user, VIDEO_URL)
+
+        response = self.client.get("/api/quizzes/?view=summary")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["question_count"], 10)
+        self.assertNotIn("questions", response.data["results"][0])
+
+    def test_list_quizzes_summary_expanded_with_questions(self):
+        create_quiz_from_payload(QUIZ_DATA, self.user, VIDEO_URL)
+
+        response = self.client.get("/api/quizzes/?view=summary&expand=questions")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = response.data["results"][0]
+        self.assertEqual(result["question_count"], 10)
+        self.assertEqual(len(result["questions"]), 10)
+
+    def test_list_quizzes_cursor_pagination(self):
+        for _ in range(3):
+            create_quiz_from_payload(QUIZ_DATA, self.user, VIDEO_URL)
+        newest_first = list(Quiz.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+
+        first_page = self.client.get("/api/quizzes/?page_size=2")
+        second_page = self.client.get(first_page.data["next"])
+
+        self.assertEqual([q["id"] for q in first_page.data["results"]], newest_first[:2])
+        self.assertEqual([q["id"] for q in second_page.data["results"]], newest_first[2:])
+        self.assertIsNone(second_page.data["next"])
+
+    def test_list_quizzes_field_selection(self):
+        create_quiz_from_payload(QUIZ_DATA, self.user, VIDEO_URL)
+
+        response = self.client.get("/api/quizzes/?fields=id,title")
+        expanded = self.client.get("/api/quizzes/?fields=id&expand=questions")
+        invalid = self.client.get("/api/quizzes/?fields=id,secret")
+
+        self.assertEqual(set(response.data["results"][0]), {"id", "title"})
+        self.assertEqual(set(expanded.data["results"][0]), {"id", "questions"})
+        self.assertEqual(len(expanded.data["results"][0]["questions"]), 10)
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_quizzes_filtered_by_video(self):
+        create_quiz_from_payload(QUIZ_DATA, self.user, VIDEO_URL)
+        create_quiz_from_payload(QUIZ_DATA, self.user, "https://youtu.be/aaaaaaaaaaa")
+
+        response = self.client.get("/api/quizzes/?video_id=aaaaaaaaaaa")
+
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["video_url"], "https://youtu.be/aaaaaaaaaaa")
 
     def test_quiz_forbidden_for_other_user(self):
         other_user = User.objects.create_user(
@@ -61,6 +635,61 @@ class QuizTests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+    def test_patch_video_url_updates_video_id(self):
+        quiz = create_quiz_from_payload(QUIZ_DATA, self.user, VIDEO_URL)
+
+        response = self.client.patch(
+            f"/api/quizzes/{quiz.id}/",
+            {"video_url": "https://youtu.be/aaaaaaaaaaa"},
+            format="json"
+        )
+        invalid = self.client.patch(
+            f"/api/quizzes/{quiz.id}/",
+            {"video_url": "https://example.com/lecture"},
+            format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["video_url"], "https://www.youtube.com/watch?v=aaaaaaaaaaa")
+        self.assertEqual(Quiz.objects.get(id=quiz.id).video_id, "aaaaaaaaaaa")
+        self.assertEqual(self.client.get("/api/quizzes/?video_id=aaaaaaaaaaa").data["results"][0]["id"], quiz.id)
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Quiz.objects.get(id=quiz.id).video_id, "aaaaaaaaaaa")
+
+    def test_patch_quiz_copies_template_questions(self):
+        template = QuizTemplate.objects.create(
+            content_hash="a" * 64,
+            prompt_version="1",
+            model_name="gemini-2.5-flash",
+            title="Generated quiz",
+            description="desc",
+            questions=QUIZ_DATA["questions"]
+        )
+        quiz = Quiz.objects.create(
+            title=template.title,
+            description=template.description,
+            video_url=VIDEO_URL,
+            owner=self.user,
+            template=template
+        )
+        before = self.client.get(f"/api/quizzes/{quiz.id}/")
+
+        response = self.client.patch(
+            f"/api/quizzes/{quiz.id}/",
+            {"title": "My title"},
+            format="json"
+        )
+
+        quiz.refresh_from_db()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["title"], "My title")
+        self.assertIsNone(quiz.template)
+        self.assertEqual(quiz.questions.count(), 10)
+        # Ids are positions, before and after the copy
+        self.assertEqual([q["id"] for q in before.json()["questions"]], list(range(10)))
+        self.assertEqual(response.data["questions"], before.json()["questions"])
+        self.assertEqual(QuizTemplate.objects.get().title, "Generated quiz")
+
     def test_delete_quiz(self):
         quiz = Quiz.objects.create(
             title="To delete",
@@ -73,3 +702,856 @@ class QuizTests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Quiz.objects.count(), 0)
+
+
+class TranscriptCacheTests(TestCase):
+
+    def setUp(self):
+        use_temp_cache_dirs(self)
+
+    def test_store_and_get_transcript(self):
+        store_transcript("dQw4w9WgXcQ", "base", None, "hello world")
+
+        self.assertEqual(get_cached_transcript("dQw4w9WgXcQ", "base", None), "hello world")
+        self.assertIsNone(get_cached_transcript("dQw4w9WgXcQ", "small", None))
+        self.assertIsNone(get_cached_transcript("dQw4w9WgXcQ", "base", "de"))
+
+    def test_expired_transcript_is_a_miss(self):
+        store_transcript("dQw4w9WgXcQ", "base", None, "hello world")
+        Transcript.objects.update(created_at=timezone.now() - timedelta(days=365))
+
+        self.assertIsNone(get_cached_transcript("dQw4w9WgXcQ", "base", None))
+        self.assertEqual(Transcript.objects.count(), 0)
+
+    def test_prune_evicts_least_recently_used(self):
+        store_transcript("aaaaaaaaaaa", "base", None, "x" * 100)
+        store_transcript("bbbbbbbbbbb", "base", None, "y" * 100)
+        get_cached_transcript("aaaaaaaaaaa", "base", None)
+
+        removed, freed = prune_transcripts(max_bytes=150)
+
+        self.assertEqual((removed, freed), (1, 100))
+        self.assertTrue(Transcript.objects.filter(video_id="aaaaaaaaaaa").exists())
+
+
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="asyncuser", password="pass123")
+        self.quiz = create_quiz_from_payload(QUIZ_DATA, self.user, VIDEO_URL)
+        self.job = QuizJob.objects.create(
+            owner=self.user, video_url=VIDEO_URL, quiz=self.quiz, status=QuizJob.Status.DONE
+        )
+        self.factory = AsyncRequestFactory()
+
+    def request(self, path, user=None, method="get"):
+        request = getattr(self.factory, method)(path)
+        request.COOKIES["access_token"] = str(AccessToken.for_user(user or self.user))
+        return request
+
+    async def test_job_status_and_quiz_read(self):
+        response = await async_views.job_status(self.request(f"/api/jobs/{self.job.id}/"), job_id=self.job.id)
+        self.assertEqual(json.loads(response.content)["quiz"], self.quiz.id)
+
+        response = await async_views.quiz_detail(self.request(f"/api/quizzes/{self.quiz.id}/"), quiz_id=self.quiz.id)
+        body = json.loads(response.content)
+        self.assertEqual(len(body["questions"]), 10)
+        self.assertEqual(body["questions"][0]["question_options"], QUIZ_DATA["questions"][0]["question_options"])
+
+    async def test_quiz_read_answers_conditional_requests(self):
+        response = await async_views.quiz_detail(self.request(f"/api/quizzes/{self.quiz.id}/"), quiz_id=self.quiz.id)
+
+        request = self.request(f"/api/quizzes/{self.quiz.id}/")
+        request.META["HTTP_IF_NONE_MATCH"] = response["ETag"]
+        revalidated = await async_views.quiz_detail(request, quiz_id=self.quiz.id)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(revalidated.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(revalidated["Last-Modified"], response["Last-Modified"])
+
+    @override_settings(QUIZ_QUESTION_STORAGE="json")
+    async def test_quiz_read_of_unconverted_quiz_in_json_mode(self):
+        # self.quiz still has question rows, which are not prefetched in json mode
+        await caches["quiz_responses"].aclear()
+        response = await async_views.quiz_detail(self.request(f"/api/quizzes/{self.quiz.id}/"), quiz_id=self.quiz.id)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(json.loads(response.content)["questions"]), 10)
+
+    async def test_requires_owner_and_token(self):
+        other = await User.objects.acreate(username="other")
+
+        response = await async_views.job_status(self.request("/", user=other), job_id=self.job.id)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = await async_views.job_status(self.factory.get("/"), job_id=self.job.id)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_job_events_stream(self):
+        response = await async_views.job_events(self.request("/"), job_id=self.job.id)
+        body = "".join([chunk.decode() async for chunk in response.streaming_content])
+
+        self.assertTrue(body.startswith('event: status\ndata: {"status": "done"}'))
+        self.assertEqual(body.count("event: question"), 10)
+        self.assertTrue(body.endswith(f'event: done\ndata: {{"quiz": {self.quiz.id}}}\n\n'))
+
+    async def test_quiz_writes_use_sync_view(self):
+        request = self.request(f"/api/quizzes/{self.quiz.id}/", method="delete")
+        response = await async_views.quiz_detail(request, quiz_id=self.quiz.id)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(await Quiz.objects.filter(id=self.quiz.id).aexists())
+
+
+class QuizPersistenceTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass123")
+
+    def test_create_quiz_from_payload_uses_bulk_inserts(self):
+        # SAVEPOINT + quiz INSERT + questions INSERT + options INSERT + RELEASE
+        with self.assertNumQueries(5):
+            quiz = create_quiz_from_payload(QUIZ_DATA, self.user, VIDEO_URL)
+
+        self.assertEqual(quiz.questions.count(), 10)
+        first = quiz.questions.order_by("id").first()
+        self.assertEqual(
+            list(first.question_options.values_list("option_text", flat=True)),
+            ["A", "B", "C", "D"]
+        )
+
+    def test_questions_and_options_keep_their_position(self):
+        payload = {**QUIZ_DATA, "questions": list(reversed(QUIZ_DATA["questions"]))}
+
+        quiz = create_quiz_from_payload(payload, self.user, VIDEO_URL)
+
+        self.assertEqual(quiz.video_id, "dQw4w9WgXcQ")
+        questions = list(quiz.questions.all())
+        self.assertEqual([q.question_title for q in questions], [q["question_title"] for q in payload["questions"]])
+        self.assertEqual([q.position for q in questions], list(range(10)))
+        self.assertEqual(
+            list(questions[0].question_options.values_list("position", "option_text")),
+            [(0, "A"), (1, "B"), (2, "C"), (3, "D")]
+        )
+
+    def test_invalid_payload_is_rejected_before_saving(self):
+        payload = {**QUIZ_DATA, "questions": [{"question_title": "Q", "answer": "A"}]}
+
+        with self.assertNumQueries(0):
+            with self.assertRaises(QuizPayloadError):
+                create_quiz_from_payload(payload, self.user, VIDEO_URL)
+
+
+@override_settings(QUIZ_QUESTION_STORAGE="json")
+class JsonQuestionStorageTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass123")
+        self.client.force_authenticate(self.user)
+
+    def test_quiz_is_read_without_question_queries(self):
+        quiz = create_quiz_from_payload(QUIZ_DATA, self.user, VIDEO_URL)
+        create_quiz_from_payload(QUIZ_DATA, self.user, VIDEO_URL)
+
+        detail = self.client.get(f"/api/quizzes/{quiz.id}/")
+        summary = self.client.get("/api/quizzes/?view=summary")
+        with CaptureQueriesContext(connection) as ctx:
+            listing = self.client.get("/api/quizzes/")
+
+        # quizzes with templates, nothing else
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(len(listing.data["results"][0]["questions"]), 10)
+        self.assertEqual(detail.json()["questions"][0], {
+            "id": 0, "question_title": "Question 0", "question_options": ["A", "B", "C", "D"], "answer": "A"
+        })
+        self.assertEqual(summary.data["results"][0]["question_count"], 10)
+        self.assertFalse(Question.objects.exists())
+
+    def test_convert_between_rows_and_json(self):
+        with override_settings(QUIZ_QUESTION_STORAGE="rows"):
+            quiz = create_quiz_from_payload(QUIZ_DATA, self.user, VIDEO_URL)
+            as_rows = self.client.get(f"/api/quizzes/{quiz.id}/").json()["questions"]
+
+        call_command("convert_quiz_storage", "--to", "json", stdout=io.StringIO())
+        quiz.refresh_from_db()
+        as_json = self.client.get(f"/api/quizzes/{quiz.id}/").json()["questions"]
+
+        self.assertFalse(Question.objects.exists())
+        self.assertEqual(quiz.question_count, 10)
+        self.assertEqual(as_json, as_rows)
+
+        call_command("convert_quiz_storage", "--to", "rows", stdout=io.StringIO())
+        quiz.refresh_from_db()
+
+        self.assertIsNone(quiz.question_data)
+        self.assertEqual(list(quiz.questions.values_list("position", flat=True)), list(range(10)))
+        self.assertEqual(list(quiz.questions.first().question_options.values_list("option_text", flat=True)), ["A", "B", "C", "D"])
+
+
+class ChunkedTranscriptionTests(SimpleTestCase):
+
+    def test_split_fixed_with_overlap(self):
+        audio = np.zeros(10 * SAMPLE_RATE, dtype=np.float32)
+
+        chunks = split_fixed(audio, chunk_seconds=4, overlap_seconds=1)
+
+        self.assertEqual([len(c) / SAMPLE_RATE for c in chunks], [4, 5, 3])
+
+    def test_split_on_silence_cuts_at_quiet_point(self):
+        audio = np.ones(20 * SAMPLE_RATE, dtype=np.float32)
+        audio[int(10.5 * SAMPLE_RATE):int(10.7 * SAMPLE_RATE)] = 0
+
+        chunks = split_on_silence(audio, chunk_seconds=10)
+
+        self.assertEqual(len(chunks), 2)
+        self.assertAlmostEqual(len(chunks[0]) / SAMPLE_RATE, 10.6, delta=0.1)
+        self.assertEqual(sum(len(c) for c in chunks), len(audio))
+
+    def test_stitch_removes_overlapping_words(self):
+        text = stitch_transcripts([
+            " Welcome to the lecture on sorting.",
+            "on sorting. Today we cover merge sort.",
+            "No overlap here."
+        ])
+
+        self.assertEqual(text, "Welcome to the lecture on sorting. Today we cover merge sort. No overlap here.")
+
+    def test_chunked_transcriptions_share_one_pool(self):
+        self.addCleanup(reset_chunk_pool)
+        audio = np.zeros(4 * SAMPLE_RATE, dtype=np.float32)
+
+        def transcribe():
+            return transcribe_chunked(audio, "quizzes.transcription.DummyBackend", "base", chunk_seconds=2, workers=2)
+
+        first = transcribe()
+        pool = get_chunk_pool("quizzes.transcription.DummyBackend", "base", workers=2)
+        second = transcribe()
+
+        # The workers (and their models) outlive a single transcription
+        self.assertIs(get_chunk_pool("quizzes.transcription.DummyBackend", "base", workers=2), pool)
+        self.assertEqual(first, second)
+        self.assertEqual(first, "This is a placeholder transcript.")
+
+
+class TranscriptionBackendTests(SimpleTestCase):
+
+    def test_build_backend_from_dotted_path(self):
+        backend = build_backend("quizzes.transcription.DummyBackend", "small", compute_type="int8", threads=2)
+
+        self.assertIsInstance(backend, DummyBackend)
+        self.assertEqual(backend.cache_name("small", "int8"), "dummy-small-int8")
+        self.assertEqual(backend.threads, 2)
+        self.assertTrue(backend.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32)))
+
+
+class LazyLoadingTests(SimpleTestCase):
+
+    def test_loading_urls_does_not_import_models(self):
+        # Runs in a fresh interpreter, other tests may have imported these already
+        code = (
+            "import sys, django; django.setup(); import quizzes.api.urls; "
+            "print(sorted(m for m in ('torch', 'whisper', 'google.genai') if m in sys.modules))"
+        )
+
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "quizly_backend.settings"}
+        )
+
+        self.assertEqual(result.stdout.strip(), "[]")
+
+
+class TranscriptionServerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        self.address = os.path.join(self.tmp_dir, "transcription.sock")
+
+    @patch("quizzes.transcription_server.transcribe_in_process", return_value="served text")
+    def test_client_receives_text_from_server(self, transcribe):
+        server = TranscriptionServer(self.address)
+        server.start(warm_up=False)
+        self.addCleanup(server.close)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        text = request_transcription(self.address, "/tmp/audio.mp3", language="en")
+
+        self.assertEqual(text, "served text")
+        transcribe.assert_called_once_with("/tmp/audio.mp3", language="en")
+
+    @patch("quizzes.utils.transcribe_in_process", return_value="local text")
+    def test_falls_back_to_in_process_when_server_is_down(self, transcribe):
+        with override_settings(TRANSCRIPTION_SERVER_ADDRESS=self.address):
+            self.assertEqual(transcribe_audio("/tmp/audio.mp3"), "local text")
+
+        with override_settings(TRANSCRIPTION_SERVER_ADDRESS=self.address, TRANSCRIPTION_SERVER_FALLBACK=False):
+            with self.assertRaises(RuntimeError):
+                transcribe_audio("/tmp/audio.mp3")
+
+    @patch("quizzes.utils.transcribe_in_process", return_value="local text")
+    def test_falls_back_when_server_dies_mid_request(self, transcribe):
+        listener = Listener(self.address, authkey=settings.TRANSCRIPTION_SERVER_AUTHKEY.encode("utf-8"))
+        self.addCleanup(listener.close)
+
+        def crash():
+            # Takes the request, then goes away without replying
+            with listener.accept() as conn:
+                conn.recv()
+
+        threading.Thread(target=crash, daemon=True).start()
+
+        with override_settings(TRANSCRIPTION_SERVER_ADDRESS=self.address):
+            self.assertEqual(transcribe_audio("/tmp/audio.mp3"), "local text")
+
+
+class AudioStreamingTests(SimpleTestCase):
+
+    def test_read_pcm_into_memory_and_memory_mapped_file(self):
+        samples = np.linspace(-1, 1, 1000, dtype=np.float32)
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, ignore_errors=True)
+
+        in_memory = read_pcm(io.BytesIO(samples.tobytes()))
+        mapped = read_pcm(io.BytesIO(samples.tobytes()), mmap_path=os.path.join(tmp_dir, "audio.f32"))
+
+        np.testing.assert_array_equal(in_memory, samples)
+        np.testing.assert_array_equal(mapped, samples)
+        self.assertIsInstance(mapped, np.memmap)
+
+    def fake_pipeline(self, ytdlp_script: str, ffmpeg_script: str):
+        """
+        Patches Popen so stream_audio runs the given Python scripts in place
+        of yt-dlp and ffmpeg; returns the started processes.
+        """
+        started = []
+        scripts = iter([ytdlp_script, ffmpeg_script])
+        popen = subprocess.Popen
+
+        def fake_popen(cmd, **kwargs):
+            started.append(popen([sys.executable, "-c", next(scripts)], **kwargs))
+            return started[-1]
+
+        patcher = patch("quizzes.utils.subprocess.Popen", side_effect=fake_popen)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return started
+
+    def test_stream_audio_survives_noisy_stderr(self):
+        # Far more than a pipe buffer: with stderr on a pipe, ffmpeg blocks writing it
+        started = self.fake_pipeline(
+            "import sys; sys.stderr.write('w' * 200000); sys.stdout.buffer.write(bytes(16))",
+            "import sys; sys.stderr.write('e' * 200000 + 'decode failed');"
+            "sys.stdout.buffer.write(sys.stdin.buffer.read()); sys.exit(1)"
+        )
+
+        with self.assertRaises(RuntimeError):
+            stream_audio(VIDEO_URL)
+
+        self.assertEqual([process.returncode for process in started], [0, 1])
+
+    def test_stream_audio_kills_processes_on_failure(self):
+        started = self.fake_pipeline(
+            "import time; time.sleep(60)",
+            "import sys; sys.stdin.buffer.read()"
+        )
+
+        with patch("quizzes.utils.read_pcm", side_effect=OSError("disk full")):
+            with self.assertRaises(RuntimeError):
+                stream_audio(VIDEO_URL)
+
+        self.assertEqual(len(started), 2)
+        self.assertTrue(all(process.returncode is not None for process in started))
+
+
+@override_settings(QUIZ_MAX_RUNNING_JOBS=3, QUIZ_MAX_RUNNING_JOBS_PER_USER=2)
+class DispatcherTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username="alice", password="pass123")
+        self.bob = User.objects.create_user(username="bob", password="pass123")
+
+    def queue(self, owner, count: int) -> list:
+        return [
+            QuizJob.objects.create(owner=owner, video_url=VIDEO_URL, video_id=f"{owner.username[0]}{i:010d}").id
+            for i in range(count)
+        ]
+
+    def test_users_take_turns_within_limits(self):
+        alice_jobs = self.queue(self.alice, 3)
+        bob_jobs = self.queue(self.bob, 2)
+
+        order = []
+        while (job := claim_next_job()) is not None:
+            order.append(job.id)
+
+        # Bob is not stuck behind Alice's backlog; the global cap stops at 3
+        self.assertEqual(order, [alice_jobs[0], bob_jobs[0], alice_jobs[1]])
+
+        QuizJob.objects.filter(id=bob_jobs[0]).update(status=QuizJob.Status.DONE)
+        self.assertEqual(claim_next_job().id, bob_jobs[1])
+
+        # Alice's third job waits for one of her own slots, even with a free global one
+        QuizJob.objects.filter(id=bob_jobs[1]).update(status=QuizJob.Status.DONE)
+        self.assertIsNone(claim_next_job())
+
+        QuizJob.objects.filter(id=alice_jobs[0]).update(status=QuizJob.Status.DONE)
+        self.assertEqual(claim_next_job().id, alice_jobs[2])
+
+    def test_command_dispatcher_claims_only_its_own_jobs(self):
+        reset_dispatcher()
+        self.addCleanup(reset_dispatcher)
+        api_job = self.queue(self.alice, 1)[0]
+
+        dispatch_own_jobs_only()
+        own_job, _created = submit_quiz_job(self.bob, VIDEO_URL, batch=True)
+
+        with patch("quizzes.jobs.get_executor"), patch("quizzes.jobs.get_batch_executor") as batch_executor:
+            dispatch_jobs()
+
+        batch_executor.return_value.submit.assert_called_once()
+        self.assertEqual(list(running_jobs().values_list("id", flat=True)), [own_job.id])
+        self.assertIsNone(QuizJob.objects.get(id=api_job).started_at)
+
+    def test_job_is_released_when_the_pool_is_shut_down(self):
+        reset_dispatcher()
+        self.addCleanup(reset_dispatcher)
+        job_id = self.queue(self.alice, 1)[0]
+
+        with patch("quizzes.jobs.get_executor") as executor:
+            executor.return_value.submit.side_effect = RuntimeError("cannot schedule new futures after shutdown")
+            dispatch_jobs()
+
+        self.assertIsNone(QuizJob.objects.get(id=job_id).started_at)
+        self.assertFalse(running_jobs().exists())
+
+    @override_settings(QUIZ_JOB_WORKERS=2)
+    def test_tick_keeps_own_jobs_alive_and_requeues_lost_ones(self):
+        reset_dispatcher()
+        self.addCleanup(reset_dispatcher)
+        long_ago = timezone.now() - timedelta(hours=1)
+
+        # A job running in this process, last updated a while ago
+        own = self.queue(self.alice, 1)[0]
+        with patch("quizzes.jobs.get_executor"):
+            dispatch_jobs()
+        QuizJob.objects.filter(id=own).update(status=QuizJob.Status.TRANSCRIBING, updated_at=long_ago)
+
+        # A job claimed by a process that died while streaming its quiz
+        partial = Quiz.objects.create(title="Partial", video_url=VIDEO_URL, owner=self.bob)
+        lost = QuizJob.objects.create(
+            owner=self.bob, video_url=VIDEO_URL, video_id="bbbbbbbbbbb",
+            status=QuizJob.Status.GENERATING, quiz=partial, started_at=long_ago
+        )
+        QuizJob.objects.filter(id=lost.id).update(updated_at=long_ago)
+
+        with patch("quizzes.jobs.get_executor") as executor:
+            dispatch_tick()
+
+        self.assertGreater(QuizJob.objects.get(id=own).updated_at, long_ago)
+        self.assertEqual(QuizJob.objects.get(id=own).status, QuizJob.Status.TRANSCRIBING)
+
+        # The lost job went back to the queue and was started again right away
+        lost.refresh_from_db()
+        self.assertEqual(lost.status, QuizJob.Status.QUEUED)
+        self.assertIsNone(lost.quiz)
+        self.assertGreater(lost.started_at, long_ago)
+        self.assertFalse(Quiz.objects.filter(id=partial.id).exists())
+        executor.return_value.submit.assert_called_once()
+        self.assertEqual(executor.return_value.submit.call_args.args[1:], (lost.id, False))
+
+    @override_settings(QUIZ_MAX_RUNNING_JOBS=8, QUIZ_MAX_RUNNING_BATCH_JOBS_PER_USER=3)
+    def test_batch_jobs_have_their_own_per_user_limit(self):
+        interactive = self.queue(self.alice, 1)
+        batch = [
+            QuizJob.objects.create(owner=self.alice, video_url=VIDEO_URL, video_id=f"b{i:010d}", batch=True).id
+            for i in range(4)
+        ]
+
+        claimed = {claim_next_job(batch=True).id for _ in range(3)}
+
+        # More than QUIZ_MAX_RUNNING_JOBS_PER_USER batch jobs run at once...
+        self.assertEqual(claimed, set(batch[:3]))
+        self.assertIsNone(claim_next_job(batch=True))
+        # ...and they do not use up the user's interactive slots
+        self.assertEqual(claim_next_job(batch=False).id, interactive[0])
+
+    @override_settings(QUIZ_JOB_WORKERS=1)
+    def test_dispatch_claims_only_for_idle_threads(self):
+        reset_dispatcher()
+        self.addCleanup(reset_dispatcher)
+        jobs = self.queue(self.alice, 1) + self.queue(self.bob, 2)
+
+        with patch("quizzes.jobs.get_executor") as executor:
+            dispatch_jobs()
+
+        # One worker thread: one claim, the rest stay in the database queue
+        executor.return_value.submit.assert_called_once()
+        self.assertEqual(list(running_jobs().values_list("id", flat=True)), jobs[:1])
+        self.assertEqual(QuizJob.objects.filter(started_at__isnull=True).count(), 2)
+
+    def test_long_wait_does_not_make_claimed_job_stale(self):
+        job_id = self.queue(self.alice, 1)[0]
+        QuizJob.objects.filter(id=job_id).update(updated_at=timezone.now() - timedelta(days=1))
+
+        self.assertEqual(claim_next_job().id, job_id)
+        self.assertEqual(list(running_jobs().values_list("id", flat=True)), [job_id])
+
+
+@override_settings(QUIZ_DOWNLOAD_CONCURRENCY=2, QUIZ_TRANSCRIBE_CONCURRENCY=1)
+class StageSlotTests(SimpleTestCase):
+
+    def setUp(self):
+        reset_stage_slots()
+        self.addCleanup(reset_stage_slots)
+
+    def peak_concurrency(self, stages: list) -> dict:
+        """
+        Runs one thread per entry, each holding a slot of that stage briefly.
+        """
+        lock = threading.Lock()
+        running = {stage: 0 for stage in stages}
+        peak = dict(running)
+
+        def work(stage):
+            with stage_slot(stage):
+                with lock:
+                    running[stage] += 1
+                    peak[stage] = max(peak[stage], running[stage])
+                time.sleep(0.05)
+                with lock:
+                    running[stage] -= 1
+
+        threads = [threading.Thread(target=work, args=(stage,)) for stage in stages]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return peak
+
+    def test_each_stage_has_its_own_limit(self):
+        peak = self.peak_concurrency(["download"] * 4 + ["transcribe"] * 3)
+
+        # Downloads overlap with the transcription, each within its own limit
+        self.assertEqual(peak, {"download": 2, "transcribe": 1})
+
+
+class MediaScratchTests(SimpleTestCase):
+
+    def setUp(self):
+        use_temp_cache_dirs(self)
+
+    def test_workspace_is_removed_on_failure(self):
+        with self.assertRaises(RuntimeError):
+            with job_workspace(1) as workspace:
+                with open(workspace.file("audio.mp3"), "wb") as f:
+                    f.write(b"x" * 10)
+                raise RuntimeError("Whisper transcription failed")
+
+        self.assertEqual(workspace.bytes_written, 10)
+        self.assertFalse(workspace.path.exists())
+
+    def test_quota_evicts_least_recently_used_audio(self):
+        for job_id, video_id in enumerate(["aaaaaaaaaaa", "bbbbbbbbbbb"]):
+            with job_workspace(job_id) as workspace:
+                path = workspace.file("audio.mp3")
+                with open(path, "wb") as f:
+                    f.write(b"x" * 100)
+                workspace.retain(path, video_id)
+
+        older = os.path.dirname(find_retained_audio("bbbbbbbbbbb"))
+        os.utime(older, (0, 0))
+
+        freed = enforce_quota(max_bytes=150)
+
+        self.assertEqual(freed, 100)
+        self.assertIsNone(find_retained_audio("bbbbbbbbbbb"))
+        self.assertIsNotNone(find_retained_audio("aaaaaaaaaaa"))
+
+
+class PipelineMetricsTests(SimpleTestCase):
+
+    def setUp(self):
+        reset_metrics()
+
+    def test_span_records_failures_and_logs_json(self):
+        with self.assertLogs("quizzes.metrics", level="INFO") as logs:
+            with self.assertRaises(RuntimeError):
+                with stage_span("generate", job_id=7):
+                    annotate(prompt_tokens=1500, output_tokens=800)
+                    raise RuntimeError("Gemini unavailable")
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["stage"], "generate")
+        self.assertEqual(record["outcome"], "error")
+        self.assertEqual(record["prompt_tokens"], 1500)
+
+        body = render_metrics()
+        self.assertIn('quizly_stage_duration_seconds_count{stage="generate",outcome="error"} 1', body)
+        self.assertIn('quizly_gemini_prompt_tokens_bucket{stage="generate",le="10000"} 1', body)
+        self.assertIn('quizly_gemini_prompt_tokens_bucket{stage="generate",le="1000"} 0', body)
+        self.assertIn('quizly_gemini_output_tokens_bucket{stage="generate",le="+Inf"} 1', body)
+
+    @patch("quizzes.transcription.get_transcription_backend", return_value=DummyBackend())
+    @patch("quizzes.transcription.load_audio", return_value=np.zeros(90 * SAMPLE_RATE, dtype=np.float32))
+    def test_transcribe_span_records_audio_seconds_of_files(self, load_audio, backend):
+        with stage_span("transcribe") as in_process:
+            transcribe_in_process("/tmp/audio.mp3")
+
+        address = os.path.join(tempfile.mkdtemp(), "transcription.sock")
+        self.addCleanup(shutil.rmtree, os.path.dirname(address), ignore_errors=True)
+        server = TranscriptionServer(address)
+        server.start(warm_up=False)
+        self.addCleanup(server.close)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        with stage_span("transcribe") as served:
+            request_transcription(address, "/tmp/audio.mp3")
+
+        self.assertEqual(in_process.attributes["audio_seconds"], 90.0)
+        self.assertEqual(served.attributes["audio_seconds"], 90.0)
+
+
+class GeminiClientTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server = FakeGeminiServer().start()
+        self.addCleanup(self.server.stop)
+
+    def build_client(self, **options):
+        options.setdefault("retry_base_delay", 0.01)
+        client = GeminiClient("test-key", base_url=self.server.base_url, **options)
+        self.addCleanup(client.close)
+        return client
+
+    def test_reuses_connections(self):
+        client = self.build_client()
+
+        for _ in range(5):
+            client.generate_content(model="gemini-2.5-flash", contents="prompt")
+
+        self.assertEqual(len(self.server.requests), 5)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_retries_rate_limits_and_server_errors(self):
+        self.server.fail_next(429)
+        self.server.fail_next(503)
+        client = self.build_client()
+
+        response = client.generate_content(model="gemini-2.5-flash", contents="prompt")
+
+        self.assertEqual(json.loads(response.text), sample_quiz())
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_gives_up_after_max_retries(self):
+        self.server.fail_next(503, count=3)
+        client = self.build_client(max_retries=2)
+
+        with self.assertRaises(LLMError):
+            client.generate_content(model="gemini-2.5-flash", contents="prompt")
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_does_not_retry_client_errors(self):
+        from google.genai import errors
+
+        self.server.fail_next(400)
+        client = self.build_client()
+
+        with self.assertRaises(errors.ClientError):
+            client.generate_content(model="gemini-2.5-flash", contents="prompt")
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_limits_concurrent_requests(self):
+        self.server.latency = 0.1
+        client = self.build_client(max_concurrency=2)
+
+        threads = [
+            threading.Thread(target=client.generate_content, kwargs={"model": "gemini-2.5-flash", "contents": "p"})
+            for _ in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.server.requests), 6)
+        self.assertEqual(self.server.max_in_flight, 2)
+
+    def test_streams_quiz_after_retrying_unavailable(self):
+        self.server.fail_next(503)
+        self.server.chunk_size = 20
+
+        with override_settings(GEMINI_BASE_URL=self.server.base_url, GEMINI_RETRY_BASE_DELAY=0.01):
+            reset_gemini_client()
+            self.addCleanup(reset_gemini_client)
+
+            stream = stream_quiz_json("prompt")
+            events = []
+            while True:
+                try:
+                    events.append(next(stream))
+                except StopIteration as done:
+                    quiz_data = done.value
+                    break
+
+        self.assertEqual(quiz_data, sample_quiz())
+        self.assertEqual(events[0], ("title", "Sample Quiz"))
+        self.assertEqual([v for e, v in events if e == "question"], sample_quiz()["questions"])
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_generate_quiz_json_uses_shared_client(self):
+        with override_settings(GEMINI_BASE_URL=self.server.base_url):
+            reset_gemini_client()
+            self.addCleanup(reset_gemini_client)
+
+            self.assertEqual(generate_quiz_json("prompt"), sample_quiz())
+            generate_quiz_json("prompt")
+
+        self.assertEqual(self.server.connections, 1)
+
+
+class QuizStreamParserTests(SimpleTestCase):
+
+    def test_emits_questions_at_any_chunk_boundary(self):
+        data = dict(QUIZ_DATA, title='Escaped "quotes" and {braces}')
+        text = "```json\n" + json.dumps(data, indent=2) + "\n```"
+
+        for size in [1, 7, 64]:
+            parser = QuizStreamParser()
+            events = []
+            for i in range(0, len(text), size):
+                events.extend(parser.feed(text[i:i + size]))
+
+            self.assertEqual(events[0], ("title", data["title"]))
+            self.assertEqual([v for e, v in events if e == "question"], data["questions"])
+            self.assertEqual(parser.result(), data)
+
+    def test_reports_question_before_payload_is_complete(self):
+        text = json.dumps(QUIZ_DATA)
+        first_end = text.index("}") + 1
+
+        events = QuizStreamParser().feed(text[:first_end])
+
+        self.assertEqual(events[-1], ("question", QUIZ_DATA["questions"][0]))
+
+    def test_incomplete_payload_raises(self):
+        parser = QuizStreamParser()
+        parser.feed(json.dumps(QUIZ_DATA)[:-10])
+
+        with self.assertRaises(ValueError):
+            parser.result()
+
+
+class PromptBudgetTests(SimpleTestCase):
+
+    def test_short_transcript_is_sent_as_one_prompt(self):
+        with patch("quizzes.prompt_budget.summarize_transcript_chunk") as summarize:
+            prompt = build_quiz_prompt("A short lecture about cells.")
+
+        summarize.assert_not_called()
+        self.assertIn("A short lecture about cells.", prompt)
+
+    def test_split_keeps_sentences_within_budget(self):
+        transcript = " ".join(f"Sentence number {i} is here." for i in range(200))
+
+        chunks = split_transcript(transcript, 100)
+
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(count_tokens(chunk) <= 100 for chunk in chunks))
+        self.assertEqual(" ".join(chunks), transcript)
+
+    @override_settings(PROMPT_MAX_TRANSCRIPT_TOKENS=200, PROMPT_CHUNK_TOKENS=100, PROMPT_MAP_CONCURRENCY=4)
+    def test_long_transcript_is_condensed_concurrently(self):
+        transcript = " ".join(f"Sentence number {i} is here." for i in range(200))
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def summarize(prompt):
+            with lock:
+                running.append(prompt)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(prompt)
+            part = prompt.split("part ")[1].split(" of")[0]
+            return f"notes {part}"
+
+        with patch("quizzes.prompt_budget.summarize_transcript_chunk", side_effect=summarize) as mocked:
+            prompt = build_quiz_prompt(transcript)
+
+        parts = mocked.call_count
+        self.assertGreater(parts, 1)
+        self.assertGreaterEqual(max(peak), 2)
+        self.assertNotIn("Sentence number", prompt)
+        self.assertIn("\n\n".join(f"notes {i}" for i in range(1, parts + 1)), prompt)
+
+
+class QuizRepairTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server = FakeGeminiServer().start()
+        self.addCleanup(self.server.stop)
+
+        override = override_settings(GEMINI_BASE_URL=self.server.base_url, GEMINI_RETRY_BASE_DELAY=0.01)
+        override.enable()
+        self.addCleanup(override.disable)
+        reset_gemini_client()
+        self.addCleanup(reset_gemini_client)
+
+    def broken_quiz(self):
+        quiz = json.loads(json.dumps(QUIZ_DATA))
+        quiz["questions"][3]["answer"] = "E"
+        quiz["questions"][5]["question_options"] = ["A", "A", "B"]
+        del quiz["questions"][9]
+        return quiz
+
+    def test_strict_check_collects_all_problems(self):
+        problems = quiz_errors(self.broken_quiz())
+
+        self.assertEqual(problems["missing"], 1)
+        self.assertEqual(problems["questions"][3], ["answer must be exactly one of the options"])
+        self.assertEqual(problems["questions"][5], [
+            "must have exactly 4 options, not 3",
+            "options must be distinct"
+        ])
+
+    def test_repairs_only_invalid_questions_in_one_request(self):
+        fixed = {"question_title": "Fixed?", "question_options": ["A", "B", "C", "D"], "answer": "B"}
+        self.server.queue_response(json.dumps({"questions": [
+            {**fixed, "index": 3},
+            {**fixed, "index": 5},
+            {**fixed, "question_title": "New?", "index": -1}
+        ]}))
+
+        quiz = ensure_valid_quiz(self.broken_quiz(), "original prompt")
+
+        self.assertEqual(len(quiz["questions"]), 10)
+        self.assertEqual(quiz["questions"][3]["question_title"], "Fixed?")
+        self.assertEqual(quiz["questions"][9]["question_title"], "New?")
+        self.assertEqual(quiz["questions"][0], QUIZ_DATA["questions"][0])
+
+        self.assertEqual(len(self.server.requests), 1)
+        request = self.server.requests[0]
+        self.assertEqual(request["generationConfig"]["responseMimeType"], "application/json")
+        repair_prompt = request["contents"][0]["parts"][0]["text"]
+        self.assertIn("question 3", repair_prompt)
+        self.assertNotIn("question 0:", repair_prompt)
+        self.assertIn("original prompt", repair_prompt)
+
+    def test_fails_when_repair_is_still_invalid(self):
+        self.server.queue_response(json.dumps({"questions": []}))
+
+        with self.assertRaises(QuizPayloadError):
+            ensure_valid_quiz(self.broken_quiz(), "original prompt")
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_unparseable_reply_is_generated_once_more(self):
+        quiz = ensure_valid_quiz(None, "original prompt")
+
+        self.assertEqual(quiz, sample_quiz())
+        self.assertEqual(self.server.requests[0]["contents"][0]["parts"][0]["text"], "original prompt")
@@ -0,0 +1,117 @@
+"""
+Shared transcription server for Quizly.
+One long-lived process (manage.py run_transcription_server) owns the
+transcription model and serves all web/job workers over a local socket,
+so model memory no longer grows with the number of workers.
+
+Requests and replies are small dicts sent over an authenticated
+multiprocessing connection:
+    request: {"audio": <file path or decoded 16 kHz array>, "language": str | None}
+    reply:   {"text": str, "audio_seconds": float | None} or {"error": str}
+"""
+import os
+import logging
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .metrics import annotate, stage_span
+from .transcription import get_transcription_backend, transcribe_in_process
+
+
+logger = logging.getLogger(__name__)
+
+
+def _authkey() -> bytes:
+    authkey = settings.TRANSCRIPTION_SERVER_AUTHKEY
+    if not authkey:
+        raise ImproperlyConfigured("TRANSCRIPTION_SERVER_AUTHKEY must not be empty")
+
+    return authkey.encode("utf-8")
+
+
+# ========== Client ==========
+
+def request_transcription(address: str, audio, language: str | None = None) -> str:
+    """
+    Sends one transcription request to the server and waits for the text.
+    Raises OSError/ConnectionError when the server is not reachable, and
+    EOFError when it closes the connection before replying.
+    """
+    with Client(address, authkey=_authkey()) as conn:
+        conn.send({"audio": audio, "language": language})
+        reply = conn.recv()
+
+    if "error" in reply:
+        raise RuntimeError(f"Transcription server error: {reply['error']}")
+
+    if reply.get("audio_seconds") is not None:
+        annotate(audio_seconds=reply["audio_seconds"])
+
+    return reply["text"]
+
+
+# ========== Server ==========
+
+class TranscriptionServer:
+    """
+    Accepts connections on a Unix socket (or Windows named pipe) and
+    transcribes with the process-wide backend. Each connection is handled
+    in its own thread; `concurrency` limits how many run the model at once.
+    """
+
+    def __init__(self, address: str, concurrency: int = 1):
+        self.address = address
+        self.listener = None
+        self._slots = threading.Semaphore(concurrency)
+
+    def start(self, warm_up: bool = True) -> None:
+        """
+        Loads the model and binds the socket. A stale socket file left by a
+        crashed server is removed first.
+        """
+        if warm_up:
+            get_transcription_backend()
+
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+
+        self.listener = Listener(self.address, authkey=_authkey())
+        logger.info(f"Transcription server listening on {self.address}")
+
+    def serve_forever(self) -> None:
+        while True:
+            try:
+                conn = self.listener.accept()
+            except AuthenticationError:
+                logger.warning("Rejected transcription client with a wrong authkey")
+                continue
+            except OSError:
+                # Listener was closed
+                break
+
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn) -> None:
+        with conn:
+            try:
+                request = conn.recv()
+
+                with self._slots, stage_span("transcribe", served=True) as span:
+                    text = transcribe_in_process(request["audio"], language=request.get("language"))
+
+                # Lets the client record the audio length on its own span
+                conn.send({"text": text, "audio_seconds": span.attributes.get("audio_seconds")})
+
+            except (EOFError, OSError):
+                logger.warning("Transcription client disconnected")
+            except Exception as e:
+                logger.error(f"Transcription request failed: {e}")
+                conn.send({"error": str(e)})
+
+    def close(self) -> None:
+        if self.listener is not None:
+            self.listener.close()
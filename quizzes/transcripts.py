@@ -0,0 +1,149 @@
+"""
+Transcript cache for Quizly.
+Stores Whisper transcripts on disk, keyed by (video ID, Whisper model, language),
+so popular videos are downloaded and transcribed only once.
+Old and least recently used entries are evicted by age and total size.
+"""
+import os
+import logging
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Transcript
+
+
+logger = logging.getLogger(__name__)
+
+AUTO_LANGUAGE = "auto"
+
+
+def _cache_dir() -> Path:
+    return Path(settings.TRANSCRIPT_CACHE_DIR)
+
+
+def _file_name(video_id: str, model_name: str, language: str) -> str:
+    return os.path.join(video_id, f"{model_name}-{language}.txt")
+
+
+def _is_expired(entry: Transcript) -> bool:
+    max_age = timedelta(days=settings.TRANSCRIPT_CACHE_MAX_AGE_DAYS)
+    return entry.created_at < timezone.now() - max_age
+
+
+def _delete_entry(entry: Transcript) -> None:
+    """
+    Removes a cache entry together with its file on disk.
+    """
+    path = _cache_dir() / entry.file_name
+
+    try:
+        path.unlink()
+        path.parent.rmdir()
+    except OSError:
+        pass
+
+    entry.delete()
+
+
+# ========== Lookup ==========
+
+def get_cached_transcript(video_id: str, model_name: str, language: str | None) -> str | None:
+    """
+    Returns the cached transcript text, or None on a miss.
+    Expired entries and entries whose file has gone missing count as misses.
+    """
+    entry = Transcript.objects.filter(
+        video_id=video_id,
+        model_name=model_name,
+        language=language or AUTO_LANGUAGE
+    ).first()
+
+    if entry is None:
+        return None
+
+    if _is_expired(entry):
+        _delete_entry(entry)
+        return None
+
+    try:
+        text = (_cache_dir() / entry.file_name).read_text(encoding="utf-8")
+    except OSError:
+        logger.warning(f"Transcript file missing for {entry}, dropping cache entry")
+        entry.delete()
+        return None
+
+    Transcript.objects.filter(id=entry.id).update(last_used_at=timezone.now())
+    return text
+
+
+# ========== Store ==========
+
+def store_transcript(video_id: str, model_name: str, language: str | None, text: str) -> Transcript:
+    """
+    Writes the transcript to disk and records it in the cache index.
+    The file is written to a temp name first so readers never see partial text.
+    """
+    language = language or AUTO_LANGUAGE
+    file_name = _file_name(video_id, model_name, language)
+    path = _cache_dir() / file_name
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    data = text.encode("utf-8")
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+    entry, _ = Transcript.objects.update_or_create(
+        video_id=video_id,
+        model_name=model_name,
+        language=language,
+        defaults={
+            "file_name": file_name,
+            "size_bytes": len(data),
+            "last_used_at": timezone.now(),
+        }
+    )
+
+    prune_transcripts()
+    return entry
+
+
+# ========== Eviction ==========
+
+def prune_transcripts(max_age_days: int | None = None, max_bytes: int | None = None) -> tuple[int, int]:
+    """
+    Evicts entries older than max_age_days, then the least recently used
+    entries until the cache fits into max_bytes.
+
+    Returns:
+        tuple: (number of removed entries, number of freed bytes)
+    """
+    if max_age_days is None:
+        max_age_days = settings.TRANSCRIPT_CACHE_MAX_AGE_DAYS
+    if max_bytes is None:
+        max_bytes = settings.TRANSCRIPT_CACHE_MAX_BYTES
+
+    removed = 0
+    freed = 0
+
+    cutoff = timezone.now() - timedelta(days=max_age_days)
+    for entry in Transcript.objects.filter(created_at__lt=cutoff):
+        freed += entry.size_bytes
+        removed += 1
+        _delete_entry(entry)
+
+    total = Transcript.objects.aggregate(total=Sum("size_bytes"))["total"] or 0
+    if total > max_bytes:
+        for entry in Transcript.objects.order_by("last_used_at"):
+            if total <= max_bytes:
+                break
+            total -= entry.size_bytes
+            freed += entry.size_bytes
+            removed += 1
+            _delete_entry(entry)
+
+    return removed, freed
@@ -1,19 +1,32 @@
 """
 AI Engine for Quizly.
 Handles the full pipeline:
-1. YouTube audio extraction (yt-dlp)
-2. Speech-to-Text transcription (OpenAI Whisper)
+1. YouTube audio extraction (yt-dlp, as an mp3 file or streamed straight to PCM)
+2. Speech-to-Text transcription (OpenAI Whisper or another configured backend)
 3. Quiz generation (Google Gemini Flash 2.5)
 """
 import os
 import re
+import sys
 import json
+import shutil
 import tempfile
 import logging
+import subprocess
 
-import yt_dlp
-import whisper
-from google import genai
+import numpy as np
+from django.conf import settings
+
+from .json_stream import QuizStreamParser
+from .llm import get_gemini_client
+from .metrics import annotate
+from .persistence import QUIZ_OPTION_COUNT, QUIZ_QUESTION_COUNT
+from .transcription import SAMPLE_RATE, get_transcription_backend, transcribe_in_process
+from .transcription_server import request_transcription
+
+
+# Chunk size used when copying decoded PCM to a memory-mapped file
+PCM_READ_BYTES = 1024 * 1024
 
 
 # ================= LOGGING =================
@@ -21,25 +34,33 @@ from google import genai
 logger = logging.getLogger(__name__)
 
 
-# ================= LOAD MODELS ONLY ONCE =================
+# ================= LOAD MODELS ONLY ONCE (LAZILY) =================
+# The Whisper model (VERY heavy, pulls in torch) and the Gemini client are
+# created on first use, so web processes that never transcribe never load them.
+# get_transcription_backend() (see transcription.py) and get_gemini_client()
+# (see llm.py, pooled connections and retries) cache them per process.
 
-# Whisper model (VERY heavy -> load once)
-whisper_model = whisper.load_model("base")
+GEMINI_MODEL_NAME = "gemini-2.5-flash"
 
-# Gemini client
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-if not GEMINI_API_KEY:
-    raise ValueError("Missing GEMINI_API_KEY in environment variables")
+def warm_up() -> None:
+    """
+    Loads the transcription model and the Gemini client ahead of time.
+    Call it from worker process start-up hooks (e.g. gunicorn post_fork)
+    so the first job does not pay the loading cost.
+    """
+    get_transcription_backend()
+    get_gemini_client()
 
-gemini_client = genai.Client(api_key=GEMINI_API_KEY)
+# Bump whenever build_prompt changes, so cached quizzes are regenerated.
+PROMPT_VERSION = "1"
 
 
 # ========== 1. Normalize YouTube URL ==========
 
-def normalize_youtube_url(url: str) -> str:
+def extract_video_id(url: str) -> str:
     """
-    Extracts YouTube video ID and returns normalized watch URL.
+    Extracts the 11-character YouTube video ID from a watch or short URL.
     """
 
     match = re.search(r"(?:v=|youtu\.be/)([\w-]{11})", url)
@@ -47,20 +68,60 @@ def normalize_youtube_url(url: str) -> str:
     if not match:
         raise ValueError("Invalid YouTube URL")
 
-    video_id = match.group(1)
+    return match.group(1)
+
+
+def normalize_youtube_url(url: str) -> str:
+    """
+    Extracts YouTube video ID and returns normalized watch URL.
+    """
+
+    video_id = extract_video_id(url)
 
     return f"https://www.youtube.com/watch?v={video_id}"
 
 
+def list_playlist_videos(url: str) -> list:
+    """
+    Returns the watch URLs of all videos in a YouTube playlist.
+    Only the playlist page is read (flat extraction), nothing is downloaded.
+    """
+
+    import yt_dlp
+
+    ydl_opts = {
+        "quiet": True,
+        "extract_flat": "in_playlist",
+        "skip_download": True
+    }
+
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+
+    except Exception as e:
+        logger.error(f"Playlist lookup failed: {e}")
+        raise RuntimeError("Failed to read playlist")
+
+    return [
+        f"https://www.youtube.com/watch?v={entry['id']}"
+        for entry in info.get("entries") or []
+        if entry and entry.get("id")
+    ]
+
+
 # ========== 2. Download audio using yt_dlp ==========
 
-def download_audio(url: str) -> str:
+def download_audio(url: str, dest_dir: str | None = None) -> str:
     """
-    Downloads YouTube audio and returns path to temp mp3 file.
+    Downloads YouTube audio and returns path to the mp3 file.
+    The file is written to dest_dir (a job workspace) or a new temp directory.
     """
 
+    import yt_dlp
+
     try:
-        tmp_dir = tempfile.mkdtemp()
+        tmp_dir = dest_dir or tempfile.mkdtemp()
         tmp_filename = os.path.join(tmp_dir, "audio")
 
         ydl_opts = {
@@ -84,16 +145,113 @@ def download_audio(url: str) -> str:
         raise RuntimeError("Failed to download audio")
 
 
-# ========== 3. Transcribe using Whisper ==========
+# ========== 2b. Stream audio straight to PCM (no mp3) ==========
 
-def transcribe_audio(audio_path: str) -> str:
+def read_pcm(stream, mmap_path: str | None = None) -> np.ndarray:
     """
-    Transcribes audio file to text using Whisper.
+    Reads raw float32 PCM from a binary stream into memory, or into a
+    memory-mapped file when mmap_path is given (keeps long lectures off the heap).
     """
+    if mmap_path is None:
+        return np.frombuffer(stream.read(), dtype=np.float32)
+
+    with open(mmap_path, "wb") as f:
+        shutil.copyfileobj(stream, f, PCM_READ_BYTES)
+
+    if os.path.getsize(mmap_path) == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    return np.memmap(mmap_path, dtype=np.float32, mode="r")
+
+
+def stream_audio(url: str, mmap_path: str | None = None) -> np.ndarray:
+    """
+    Pipes the yt-dlp audio stream directly into ffmpeg, which decodes it to
+    16 kHz mono float32 PCM, the format the transcriber works on.
+    Skips the mp3 encode and the second decode of download_audio().
+
+    Returns:
+        np.ndarray: Audio samples (in memory, or memory-mapped from mmap_path).
+    """
+    ytdlp_cmd = [
+        sys.executable, "-m", "yt_dlp",
+        "--format", "bestaudio/best",
+        "--no-playlist",
+        "--quiet",
+        "--output", "-",
+        url
+    ]
+    ffmpeg_cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-f", "f32le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "pipe:1"
+    ]
+
+    processes = []
 
     try:
-        result = whisper_model.transcribe(audio_path)
-        return result["text"]
+        # stderr goes to files: a chatty child blocked on a full stderr pipe would
+        # stall the whole pipeline while we wait for PCM on ffmpeg's stdout
+        with tempfile.TemporaryFile() as ytdlp_errors, tempfile.TemporaryFile() as ffmpeg_errors:
+            try:
+                ytdlp = subprocess.Popen(ytdlp_cmd, stdout=subprocess.PIPE, stderr=ytdlp_errors)
+                processes.append(ytdlp)
+                ffmpeg = subprocess.Popen(ffmpeg_cmd, stdin=ytdlp.stdout, stdout=subprocess.PIPE, stderr=ffmpeg_errors)
+                processes.append(ffmpeg)
+                # Only ffmpeg reads yt-dlp's output now
+                ytdlp.stdout.close()
+
+                audio = read_pcm(ffmpeg.stdout, mmap_path)
+                ffmpeg.wait()
+                ytdlp.wait()
+            finally:
+                # Stops and reaps both children when anything above failed
+                # (no-op for processes that already exited)
+                for process in processes:
+                    process.kill()
+                    process.wait()
+                    process.stdout.close()
+
+            if ytdlp.returncode != 0 or ffmpeg.returncode != 0:
+                ytdlp_errors.seek(0)
+                ffmpeg_errors.seek(0)
+                errors = (ytdlp_errors.read() + ffmpeg_errors.read()).decode(errors="replace")
+                raise RuntimeError(errors.strip() or "yt-dlp/ffmpeg exited with an error")
+
+        return audio
+
+    except Exception as e:
+        logger.error(f"Audio streaming failed: {e}")
+        raise RuntimeError("Failed to download audio")
+
+
+# ========== 3. Transcribe (Whisper or configured backend) ==========
+
+def transcribe_audio(audio_path: str | np.ndarray, language: str | None = None) -> str:
+    """
+    Transcribes audio to text using the configured backend (Whisper by default).
+    Accepts a file path or already decoded 16 kHz audio (see stream_audio).
+    Language is auto-detected unless given explicitly (e.g. "en").
+
+    With TRANSCRIPTION_SERVER_ADDRESS set, the work is sent to the shared
+    transcription server (manage.py run_transcription_server), which owns the
+    model; otherwise, or as a fallback, the model runs in this process.
+    """
+
+    try:
+        address = settings.TRANSCRIPTION_SERVER_ADDRESS
+
+        if address:
+            try:
+                return request_transcription(address, audio_path, language=language)
+            # EOFError: the server went away before replying
+            except (ConnectionError, OSError, EOFError) as e:
+                if not settings.TRANSCRIPTION_SERVER_FALLBACK:
+                    raise
+                logger.warning(f"Transcription server unavailable ({e}), transcribing in-process")
+
+        return transcribe_in_process(audio_path, language=language)
 
     except Exception as e:
         logger.error(f"Transcription failed: {e}")
@@ -102,6 +260,56 @@ def transcribe_audio(audio_path: str) -> str:
 
 # ========== 4. Build Gemini Prompt ==========
 
+QUESTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "question_title": {"type": "string"},
+        "question_options": {
+            "type": "array",
+            "items": {"type": "string"},
+            "minItems": QUIZ_OPTION_COUNT,
+            "maxItems": QUIZ_OPTION_COUNT
+        },
+        "answer": {"type": "string"}
+    },
+    "required": ["question_title", "question_options", "answer"]
+}
+
+# Sent as the response schema in JSON mode (GEMINI_JSON_MODE)
+QUIZ_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "description": {"type": "string"},
+        "questions": {
+            "type": "array",
+            "items": QUESTION_SCHEMA,
+            "minItems": QUIZ_QUESTION_COUNT,
+            "maxItems": QUIZ_QUESTION_COUNT
+        }
+    },
+    "required": ["title", "description", "questions"]
+}
+
+# Repair replies: replacement fields plus questions tagged with the index
+# they replace (-1 for added questions)
+REPAIR_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "description": {"type": "string"},
+        "questions": {
+            "type": "array",
+            "items": {
+                **QUESTION_SCHEMA,
+                "properties": {**QUESTION_SCHEMA["properties"], "index": {"type": "integer"}}
+            }
+        }
+    },
+    "required": ["questions"]
+}
+
+
 def build_prompt(transcript: str) -> str:
     """
     Builds prompt for Gemini quiz generation.
@@ -138,29 +346,152 @@ Transcript:
 """
 
 
-# ========== 5. Ask Gemini ==========
+def build_summary_prompt(chunk: str, part: int, parts: int) -> str:
+    """
+    Builds the "map" prompt that condenses one part of a long transcript
+    into notes, from which the quiz is generated afterwards.
+    """
 
-def generate_quiz_json(prompt: str) -> dict:
+    return f"""
+The following text is part {part} of {parts} of a video transcript.
+Condense it into concise notes for writing quiz questions later.
+
+REQUIREMENTS:
+- Keep every key fact, definition, name, number and example
+- Keep the original order
+- Plain text bullet points only
+- Do NOT add information that is not in the text
+- At most a quarter of the original length
+
+Transcript part:
+{chunk}
+"""
+
+
+def build_repair_prompt(quiz_data: dict, problems: dict, source_prompt: str) -> str:
     """
-    Sends the prompt to Gemini-2.5-flash and parses the response.
-    Cleans markdown code blocks if the model includes them accidentally.
+    Builds a prompt that asks only for the invalid parts of a generated quiz.
+    The source material is included only when new questions are needed.
+    """
+    questions = quiz_data.get("questions") or []
+    lines = [f"- {problem}" for problem in problems["quiz"]]
+
+    for index, errors in problems["questions"].items():
+        lines.append(f"- question {index}: {json.dumps(questions[index])} -> {'; '.join(errors)}")
+
+    valid_titles = [
+        q["question_title"] for i, q in enumerate(questions)
+        if i not in problems["questions"] and isinstance(q, dict) and "question_title" in q
+    ]
+
+    prompt = f"""
+A generated quiz has these problems:
+{chr(10).join(lines)}
+
+Fix ONLY these parts and return valid JSON:
+- "title" / "description": only if they are listed above
+- "questions": one corrected object per listed question, with its "index"
+- Each question must have exactly {QUIZ_OPTION_COUNT} distinct options
+- "answer" must be exactly one of the options
+- Do NOT repeat these existing questions: {json.dumps(valid_titles)}
+"""
 
-    Returns:
-        dict: Parsed quiz data ready for database insertion.
+    if problems["missing"]:
+        prompt += f"""- Also add {problems["missing"]} new questions with "index": -1, based on the source below
+
+Source:
+{source_prompt}
+"""
+
+    return prompt
+
+
+def generation_config(schema: dict):
     """
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("Missing GEMINI_API_KEY in environment variables")
+    JSON mode: asks Gemini for application/json constrained by the schema.
+    Returns None (plain text) when GEMINI_JSON_MODE is off.
+    """
+    if not settings.GEMINI_JSON_MODE:
+        return None
+
+    from google.genai import types
+
+    return types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_json_schema=schema
+    )
+
 
-    client = genai.Client(api_key=api_key)
+# ========== 5. Ask Gemini ==========
 
-    response = client.models.generate_content(
-       model="gemini-2.5-flash",
+def summarize_transcript_chunk(prompt: str) -> str:
+    """
+    Sends a "map" prompt to Gemini and returns the condensed notes.
+    """
+    response = get_gemini_client().generate_content(
+        model=GEMINI_MODEL_NAME,
         contents=prompt
     )
 
+    return (response.text or "").strip()
+
+
+def generate_quiz_json(prompt: str, schema: dict = QUIZ_RESPONSE_SCHEMA) -> dict:
+    """
+    Sends the prompt to Gemini-2.5-flash (in JSON mode with the quiz schema)
+    and parses the response.
+    Cleans markdown code blocks if the model includes them accidentally.
+
+    Returns:
+        dict: Parsed quiz data, to be checked with quiz_errors() before saving.
+    """
+    response = get_gemini_client().generate_content(
+        model=GEMINI_MODEL_NAME,
+        contents=prompt,
+        config=generation_config(schema)
+    )
+
     raw_text = response.text
+    usage = getattr(response, "usage_metadata", None)
+    annotate(
+        prompt_tokens=getattr(usage, "prompt_token_count", None),
+        output_tokens=getattr(usage, "candidates_token_count", None),
+        payload_bytes=len(raw_text.encode("utf-8"))
+    )
+
     raw_text = raw_text.replace("```json", "").replace("```", "").strip()
 
     return json.loads(raw_text)
 
+
+def stream_quiz_json(prompt: str):
+    """
+    Streams the quiz from Gemini and parses it while it arrives.
+
+    Yields:
+        tuple: ("title", str), ("description", str) and one ("question", dict)
+        per question, as soon as each is complete.
+
+    Returns:
+        dict: The complete quiz data (as the generator's return value).
+    """
+    parser = QuizStreamParser()
+    usage = None
+
+    chunks = get_gemini_client().generate_content_stream(
+        model=GEMINI_MODEL_NAME,
+        contents=prompt,
+        config=generation_config(QUIZ_RESPONSE_SCHEMA)
+    )
+
+    for chunk in chunks:
+        usage = getattr(chunk, "usage_metadata", None) or usage
+        yield from parser.feed(chunk.text or "")
+
+    annotate(
+        prompt_tokens=getattr(usage, "prompt_token_count", None),
+        output_tokens=getattr(usage, "candidates_token_count", None),
+        payload_bytes=len(parser.buffer.encode("utf-8"))
+    )
+
+    return parser.result()